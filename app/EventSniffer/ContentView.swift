@@ -109,13 +109,13 @@ struct ContentView: View {
         self.lastProcessedText = text
         
         print("--- (MANUAL) NEW TEXT DETECTED, SENDING TO ML... ---")
-        await processText(text)
+        await processText(text, manual: true)
     }
     
     // --- THIS FUNCTION IS NOW FULLY REPLACED ---
-    func processText(_ text: String) async {
+    func processText(_ text: String, manual: Bool = false) async {
         
-        let entities = await mlConnector.parseText(text)
+        let entities = await mlConnector.parseText(text, manual: manual)
         
         if entities.isEmpty {
             print("ML Model found no entities.")
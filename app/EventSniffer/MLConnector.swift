@@ -17,9 +17,22 @@ struct Entity: Decodable, Identifiable {
 }
 
 // --- 2. Define the "Shape" of the Request Body ---
-// We need to send: {"text": "the scanned text..."}
+// We need to send: {"text": "the scanned text...", "priority": "auto", ...}
+// "priority" puts manual scans ahead of auto-scans in the server's queue,
+// "stream_id" lets a newer scan of the active window cancel an older one
+// that is still waiting, and "deadline_ms" drops a scan that couldn't start
+// in time (by then the timer has already sent a newer one).
 struct ParseRequest: Encodable {
     let text: String
+    let priority: String
+    let streamId: String
+    let deadlineMs: Int
+
+    enum CodingKeys: String, CodingKey {
+        case text, priority
+        case streamId = "stream_id"
+        case deadlineMs = "deadline_ms"
+    }
 }
 
 
@@ -33,7 +46,8 @@ class MLConnector {
     
     // This is the main function we'll call from our ContentView
     // It's marked 'async' because networking takes time.
-    func parseText(_ text: String) async -> [Entity] {
+    // Manual scans ("Scan Active Window Now") get the priority lane and more time.
+    func parseText(_ text: String, manual: Bool = false) async -> [Entity] {
         
         // 1. Prepare the request
         var request = URLRequest(url: parseURL)
@@ -42,7 +56,12 @@ class MLConnector {
         request.addValue("application/json", forHTTPHeaderField: "Content-Type")
         
         // 2. Encode our text into a JSON object
-        let requestBody = ParseRequest(text: text)
+        let requestBody = ParseRequest(
+            text: text,
+            priority: manual ? "manual" : "auto",
+            streamId: "active-window",
+            deadlineMs: manual ? 10_000 : 3_000 // auto: the timer fires again after 3s
+        )
         do {
             request.httpBody = try JSONEncoder().encode(requestBody)
         } catch {
@@ -56,7 +75,13 @@ class MLConnector {
             
             // Basic error checking
             if let httpResponse = response as? HTTPURLResponse, httpResponse.statusCode != 200 {
-                print("HTTP Error: status code \(httpResponse.statusCode)")
+                switch httpResponse.statusCode {
+                case 409, 503, 504:
+                    // Superseded by a newer scan, server overloaded, or too late: skip this one
+                    print("Scan dropped by the server (status \(httpResponse.statusCode))")
+                default:
+                    print("HTTP Error: status code \(httpResponse.statusCode)")
+                }
                 return []
             }
             
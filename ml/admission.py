@@ -0,0 +1,173 @@
+"""
+Admission control for scan requests
+The app's auto-scan timer fires every few seconds whether or not the last scan
+has been answered, so with a slow model, requests pile up and answers about
+window contents the user has already left arrive late. This puts a bounded,
+two-lane queue in front of the model:
+
+- at most `max_running` requests run the model at once; the rest wait, manual
+  scans ahead of auto-scans, first come first served within a lane
+- when `max_queue` are already waiting, a new auto-scan is shed straight away
+  (a manual scan evicts the oldest waiting auto-scan instead, if there is one)
+- a request that has waited past its deadline is dropped without running
+- a newer request on the same stream (e.g. the same window) cancels an older
+  one that is still waiting: only the latest contents matter. An auto-scan
+  never cancels a waiting manual scan, though; a manual scan cancels either
+
+Requests that are already running are never interrupted.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from metrics import REGISTRY
+
+PRIORITIES = ("manual", "auto")
+
+ADMISSIONS = REGISTRY.counter(
+    "eventsniffer_admission_total", "Model requests by lane and outcome", ["priority", "outcome"])
+ADMISSION_WAIT = REGISTRY.histogram(
+    "eventsniffer_admission_wait_seconds", "Time spent waiting for a model slot", ["priority"])
+
+
+class Rejected(Exception):
+    """A request that was not run; `reason` is shed, deadline or superseded"""
+
+    STATUS = {"shed": 503, "deadline": 504, "superseded": 409}
+    MESSAGES = {
+        "shed": "Server is overloaded, try again",
+        "deadline": "Deadline passed before the request could run",
+        "superseded": "Superseded by a newer request on the same stream",
+    }
+
+    def __init__(self, reason: str):
+        super().__init__(self.MESSAGES[reason])
+        self.reason = reason
+        self.status = self.STATUS[reason]
+
+
+class _Ticket:
+    __slots__ = ("priority", "deadline", "stream", "granted", "reason", "event", "enqueued_at")
+
+    def __init__(self, priority: str, deadline: Optional[float], stream: Optional[str]):
+        self.priority = priority
+        self.deadline = deadline
+        self.stream = stream
+        self.granted = False
+        self.reason = None  # set when the ticket is dropped while waiting
+        self.event = threading.Event()
+        self.enqueued_at = time.monotonic()
+
+
+class AdmissionController:
+    """
+    Call acquire(priority, deadline, stream) before running the model and
+    release() after. `deadline` is a time.monotonic() value (None: wait as
+    long as it takes), `stream` any hashable id (None: never superseded).
+    acquire() raises Rejected when the request is dropped instead.
+    """
+
+    def __init__(self, max_running: int = 1, max_queue: int = 64):
+        self.max_running = max_running
+        self.max_queue = max_queue
+
+        self._lock = threading.Lock()
+        self._running = 0
+        self._lanes = {priority: deque() for priority in PRIORITIES}
+        self._streams = {}  # (stream, priority) -> its waiting ticket
+        self.counts = {priority: {"admitted": 0, "shed": 0, "deadline": 0, "superseded": 0}
+                       for priority in PRIORITIES}
+
+    def acquire(self, priority: str = "auto", deadline: Optional[float] = None, stream: Optional[str] = None):
+        """Block until this request may run the model; pair with release()"""
+        if priority not in self._lanes:
+            raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+        ticket = _Ticket(priority, deadline, stream)
+        with self._lock:
+            if stream is not None:
+                # Only a request in the same lane or a lower one is superseded
+                for lane in PRIORITIES[PRIORITIES.index(priority):]:
+                    if (stream, lane) in self._streams:
+                        self._drop(self._streams[(stream, lane)], "superseded")
+            if self._running < self.max_running and not self._ahead_of(priority):
+                self._running += 1
+                self._count(priority, "admitted", 0.0)
+                return
+            if self._waiting() >= self.max_queue:
+                victim = self._lanes["auto"][0] if priority == "manual" and self._lanes["auto"] else None
+                if victim is None:
+                    self._count(priority, "shed")
+                    raise Rejected("shed")
+                self._drop(victim, "shed")
+            self._lanes[priority].append(ticket)
+            if stream is not None:
+                self._streams[(stream, priority)] = ticket
+
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+        ticket.event.wait(timeout)
+        with self._lock:
+            if not ticket.granted and ticket.reason is None:
+                self._drop(ticket, "deadline")
+        if not ticket.granted:
+            raise Rejected(ticket.reason)
+
+    def release(self):
+        with self._lock:
+            self._running -= 1
+            self._grant()
+
+    def _ahead_of(self, priority: str) -> bool:
+        """Is anyone already waiting who would go first?"""
+        if priority == "manual":
+            return bool(self._lanes["manual"])
+        return self._waiting() > 0
+
+    def _waiting(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def _grant(self):
+        """Hand free slots to the next live tickets, dropping expired ones on the way"""
+        now = time.monotonic()
+        for priority in PRIORITIES:
+            lane = self._lanes[priority]
+            while lane and self._running < self.max_running:
+                ticket = lane[0]
+                if ticket.deadline is not None and now >= ticket.deadline:
+                    self._drop(ticket, "deadline")
+                    continue
+                lane.popleft()
+                self._forget_stream(ticket)
+                ticket.granted = True
+                self._running += 1
+                self._count(priority, "admitted", now - ticket.enqueued_at)
+                ticket.event.set()
+
+    def _drop(self, ticket: _Ticket, reason: str):
+        self._lanes[ticket.priority].remove(ticket)
+        self._forget_stream(ticket)
+        ticket.reason = reason
+        self._count(ticket.priority, reason, time.monotonic() - ticket.enqueued_at)
+        ticket.event.set()
+
+    def _forget_stream(self, ticket: _Ticket):
+        key = (ticket.stream, ticket.priority)
+        if ticket.stream is not None and self._streams.get(key) is ticket:
+            del self._streams[key]
+
+    def _count(self, priority: str, outcome: str, waited: Optional[float] = None):
+        self.counts[priority][outcome] += 1
+        ADMISSIONS.inc(priority=priority, outcome=outcome)
+        if waited is not None:
+            ADMISSION_WAIT.observe(waited, priority=priority)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_running": self.max_running,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "waiting": {priority: len(lane) for priority, lane in self._lanes.items()},
+                "counts": {priority: dict(c) for priority, c in self.counts.items()},
+            }
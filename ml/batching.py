@@ -0,0 +1,206 @@
+"""
+Micro-batching request coalescer
+Holds concurrent single-text requests for a few milliseconds and runs them
+through the model as one batch, then fans the results back out
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list (q in 0-100)"""
+    if not sorted_values:
+        return 0.0
+    rank = int(round(q / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+class _PendingRequest:
+    __slots__ = ("text", "future", "enqueued_at")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Coalesces single requests into batches.
+
+    A batch is flushed when it holds `max_batch` texts or when the oldest
+    waiting request has waited `max_wait_ms`, whichever comes first.
+    `process_batch` takes a list of texts and returns one result per text,
+    in order (e.g. a wrapper around nlp.pipe). If it raises, the batch's
+    texts are retried one by one, so only the requests that fail on their
+    own get the exception.
+    """
+
+    def __init__(self, process_batch: Callable[[List[str]], List[Any]],
+                 max_wait_ms: float = 5.0, max_batch: int = 32,
+                 latency_window: int = 2048):
+        self.process_batch = process_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max_batch
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        # Per-request latency accounting, in milliseconds
+        self._stats_lock = threading.Lock()
+        self._wait_ms = deque(maxlen=latency_window)
+        self._total_ms = deque(maxlen=latency_window)
+        self._batch_sizes = deque(maxlen=latency_window)
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.batch_retries = 0
+
+    def submit(self, text: str) -> Future:
+        """Queue one text; the returned Future resolves to its result"""
+        self._ensure_started()
+        pending = _PendingRequest(text)
+        self._queue.put(pending)
+        return pending.future
+
+    def parse(self, text: str, timeout: float = None) -> Any:
+        """Queue one text and block until its batch has been processed"""
+        return self.submit(text).result(timeout)
+
+    def parse_many(self, texts: List[str], timeout: float = None) -> List[Any]:
+        """Queue several texts at once (they can share a batch) and wait for all of them"""
+        futures = [self.submit(text) for text in texts]
+        return [future.result(timeout) for future in futures]
+
+    def close(self):
+        """Stop the worker thread once everything already queued has been processed"""
+        self._queue.put(None)
+
+    def stop(self, timeout: float = None):
+        """close() and wait for the worker thread to exit; a later submit() starts a new one"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self.close()
+        thread.join(timeout)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        # Started lazily so a batcher created before a fork still gets
+        # its own worker thread in the child process
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="micro-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect_batch(self) -> List[_PendingRequest]:
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = batch[0].enqueued_at + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if pending is None:
+                self._queue.put(None)  # finish this batch, then stop
+                break
+            batch.append(pending)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if not batch:
+                return
+            started_at = time.perf_counter()
+            try:
+                results = self.process_batch([p.text for p in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    self._fail(batch[0], e)
+                    continue
+                # One bad text shouldn't fail everyone it was batched with:
+                # rerun them one at a time so only the culprit gets the error
+                with self._stats_lock:
+                    self.batch_retries += 1
+                for pending in batch:
+                    self._run_one(pending)
+                continue
+
+            finished_at = time.perf_counter()
+            for pending, result in zip(batch, results):
+                pending.future.set_result(result)
+            self._record(batch, started_at, finished_at)
+
+    def _run_one(self, pending: _PendingRequest):
+        started_at = time.perf_counter()
+        try:
+            result = self.process_batch([pending.text])[0]
+        except Exception as e:
+            self._fail(pending, e)
+            return
+        pending.future.set_result(result)
+        self._record([pending], started_at, time.perf_counter())
+
+    def _fail(self, pending: _PendingRequest, error: Exception):
+        pending.future.set_exception(error)
+        with self._stats_lock:
+            self.errors += 1
+
+    def _record(self, batch: List[_PendingRequest], started_at: float, finished_at: float):
+        with self._stats_lock:
+            self.requests += len(batch)
+            self.batches += 1
+            self._batch_sizes.append(len(batch))
+            for pending in batch:
+                self._wait_ms.append((started_at - pending.enqueued_at) * 1000)
+                self._total_ms.append((finished_at - pending.enqueued_at) * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        """Latency percentiles over the most recent requests"""
+        with self._stats_lock:
+            wait_ms = sorted(self._wait_ms)
+            total_ms = sorted(self._total_ms)
+            sizes = list(self._batch_sizes)
+            counters = {
+                "requests": self.requests,
+                "batches": self.batches,
+                "errors": self.errors,
+                "batch_retries": self.batch_retries,
+            }
+
+        return {
+            **counters,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_batch": self.max_batch,
+            "queue_depth": self.queue_depth(),
+            "avg_batch_size": (sum(sizes) / len(sizes)) if sizes else 0.0,
+            "queue_wait_ms": {
+                "p50": percentile(wait_ms, 50),
+                "p95": percentile(wait_ms, 95),
+                "p99": percentile(wait_ms, 99),
+            },
+            "latency_ms": {
+                "p50": percentile(total_ms, 50),
+                "p95": percentile(total_ms, 95),
+                "p99": percentile(total_ms, 99),
+            },
+        }
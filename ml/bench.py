@@ -0,0 +1,464 @@
+"""
+Load-testing and latency benchmark for the ML server
+Starts server.py locally (or targets a running one with --url), drives /parse,
+/parse_batch, /parse_stream and the Unix socket listener (local_socket.py) at
+each concurrency level, samples the server's RSS while it runs, and saves
+everything as JSON so runs can be compared across commits and model directories.
+
+Inputs are a mix of chat-sized texts from training_data_v2.SIMPLE_DATA and
+synthetic whole-window dumps (what readTextFromFocusedWindow sends on auto-scan).
+The pool repeats texts, so the main "no-cache" scenario runs the server with
+the parse cache off (memory and disk), and every request reaches the model.
+/parse is then run again with the cache on, reported as the "cache" scenario.
+
+Usage:
+    python bench.py
+    python bench.py --model-dir model_output_v2 --concurrency 1,8,32 --duration 20
+    python bench.py --endpoints parse,parse_stream --mix chat:0.5,window:0.5 --out before.json
+    python bench.py --env EVENTSNIFFER_COALESCE_MS=5 --out coalesce.json
+    python bench.py --endpoints parse,socket --pipeline 4      # HTTP vs Unix socket
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from batching import percentile
+from local_socket import LocalClient
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+ML_DIR = Path(__file__).resolve().parent
+
+# Lines a real window dump is padded with around the actual messages
+FILLER_LINES = [
+    "Reply", "Forward", "Mark as unread", "Inbox (42)", "Search mail", "Settings",
+    "You're all caught up", "Show quoted text", "Sent from my iPhone", "Unsubscribe",
+    "Thanks!", "sounds good", "lol", "ok will do", "can you send me the doc?",
+    "Re: Q3 planning", "Load more messages", "Today", "Yesterday", "Jump to present",
+]
+
+
+# ---------------------------------------------------------------- inputs
+
+def chat_texts() -> List[str]:
+    from training_data_v2 import SIMPLE_DATA
+    return [text for text, _ in SIMPLE_DATA]
+
+
+def window_dump(rng: random.Random, chats: List[str], n_chars: int) -> str:
+    """Synthetic window text: UI chrome and chatter with real messages mixed in"""
+    lines, size = [], 0
+    while size < n_chars:
+        line = rng.choice(chats) if rng.random() < 0.3 else rng.choice(FILLER_LINES)
+        lines.append(line)
+        size += len(line) + 1
+        if rng.random() < 0.1:
+            lines.append("")
+    return "\n".join(lines)[:n_chars]
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """'chat:0.8,window:0.2' -> [("chat", 0.8), ("window", 0.2)]"""
+    mix = []
+    for part in spec.split(","):
+        kind, _, weight = part.partition(":")
+        if kind not in ("chat", "window"):
+            raise ValueError(f"Unknown input kind '{kind}' (use chat or window)")
+        mix.append((kind, float(weight or 1)))
+    return mix
+
+
+class InputPool:
+    """Pre-generated, seeded inputs so every run sends the same texts"""
+
+    def __init__(self, mix: List[Tuple[str, float]], window_chars: List[int], seed: int, size: int = 500):
+        rng = random.Random(seed)
+        chats = chat_texts()
+        kinds = [kind for kind, _ in mix]
+        weights = [weight for _, weight in mix]
+        self.texts = []
+        for _ in range(size):
+            if rng.choices(kinds, weights)[0] == "chat":
+                self.texts.append(rng.choice(chats))
+            else:
+                self.texts.append(window_dump(rng, chats, rng.choice(window_chars)))
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def take(self, n: int = 1) -> List[str]:
+        with self._lock:
+            start = self._next
+            self._next = (self._next + n) % len(self.texts)
+        return [self.texts[(start + i) % len(self.texts)] for i in range(n)]
+
+    def describe(self) -> Dict[str, Any]:
+        lengths = sorted(len(t) for t in self.texts)
+        return {
+            "texts": len(lengths),
+            "chars_p50": percentile(lengths, 50),
+            "chars_p95": percentile(lengths, 95),
+            "chars_max": lengths[-1] if lengths else 0,
+        }
+
+
+# ---------------------------------------------------------------- server
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Every request reaches the model: no parse cache in memory or on disk
+NO_CACHE_ENV = {"EVENTSNIFFER_CACHE_SIZE": "0", "EVENTSNIFFER_DISK_CACHE": ""}
+
+
+def socket_path(port: int) -> str:
+    return f"/tmp/eventsniffer-bench-{port}.sock"
+
+
+def start_server(model_dir: str, port: int, env: Dict[str, str], ready_timeout: float):
+    """Run server.py on `port` and wait for /readyz; returns (process, seconds to ready)"""
+    server_env = dict(os.environ, **env)
+    server_env["EVENTSNIFFER_MODEL_DIR"] = str(Path(model_dir).resolve())
+    server_env["EVENTSNIFFER_PORT"] = str(port)
+    log = open(ML_DIR / "bench_server.log", "w")
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(ML_DIR / "server.py")],
+        cwd=str(ML_DIR), env=server_env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+    url = f"http://127.0.0.1:{port}/readyz"
+    while time.perf_counter() - started < ready_timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"server.py exited with {process.returncode}, see bench_server.log")
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return process, time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            pass
+        time.sleep(0.1)
+
+    process.terminate()
+    raise RuntimeError(f"server.py not ready after {ready_timeout}s, see bench_server.log")
+
+
+class RssSampler:
+    """Samples server RSS (including any forked workers) on a background thread"""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.phase = "idle"
+        self._started = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _rss_mb(self):
+        process = psutil.Process(self.pid)
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            total += child.memory_info().rss
+        return total / (1024 * 1024)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                rss = self._rss_mb()
+            except psutil.Error:
+                return
+            self.samples.append({
+                "t": round(time.perf_counter() - self._started, 2),
+                "rss_mb": round(rss, 1),
+                "phase": self.phase,
+            })
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if psutil is not None:
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+# ---------------------------------------------------------------- load
+
+def _post(url: str, body: Dict[str, Any], timeout: float) -> bytes:
+    request = urllib.request.Request(
+        url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as resp:
+        return resp.read()
+
+
+_socket_clients = threading.local()
+
+
+def _socket_client(path: str, timeout: float) -> LocalClient:
+    """One persistent connection per client thread, like the app would keep"""
+    client = getattr(_socket_clients, "client", None)
+    if client is None or client.path != path:
+        client = _socket_clients.client = LocalClient(path, timeout=timeout)
+    return client
+
+
+def make_request(base_url: str, endpoint: str, pool: InputPool, batch_texts: int, timeout: float,
+                 socket_file: str = None, pipeline: int = 1) -> int:
+    """Send one request (for "socket", `pipeline` requests at once); returns how many texts it carried"""
+    if endpoint == "parse":
+        _post(f"{base_url}/parse", {"text": pool.take()[0]}, timeout)
+        return 1
+    if endpoint == "parse_batch":
+        texts = pool.take(batch_texts)
+        json.loads(_post(f"{base_url}/parse_batch", {"texts": texts}, timeout))
+        return len(texts)
+    if endpoint == "parse_stream":
+        body = _post(f"{base_url}/parse_stream", {"text": pool.take()[0]}, timeout)
+        summary = json.loads(body.decode().strip().splitlines()[-1])
+        if not summary.get("done"):
+            raise ValueError("stream ended without a summary line")
+        return 1
+    if endpoint == "socket":
+        texts = pool.take(pipeline)
+        try:
+            responses = _socket_client(socket_file, timeout).parse_many(texts)
+        except OSError:
+            _socket_clients.client = None  # reconnect on the next request
+            raise
+        failed = [r["code"] for r in responses if r["code"] != 200]
+        if failed:
+            raise ValueError(f"socket code {failed[0]}")
+        return len(texts)
+    raise ValueError(f"Unknown endpoint '{endpoint}'")
+
+
+def run_level(base_url: str, endpoint: str, concurrency: int, pool: InputPool,
+              duration: float, batch_texts: int, timeout: float, socket_file: str = None,
+              pipeline: int = 1) -> Dict[str, Any]:
+    """Closed-loop load: `concurrency` clients each send back-to-back requests for `duration` seconds"""
+    latencies, errors = [], {}
+    texts_done = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                n_texts = make_request(base_url, endpoint, pool, batch_texts, timeout, socket_file, pipeline)
+            except Exception as e:
+                reason = f"HTTP {e.code}" if isinstance(e, urllib.error.HTTPError) else type(e).__name__
+                with lock:
+                    errors[reason] = errors.get(reason, 0) + 1
+                continue
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                texts_done[0] += n_texts
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    n_errors = sum(errors.values())
+    total = len(latencies) + n_errors
+    to_ms = 1000.0
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "seconds": wall,
+        "requests": total,
+        "errors": errors,
+        "error_rate": (n_errors / total) if total else 0.0,
+        "throughput_rps": len(latencies) / wall,
+        "throughput_texts_per_s": texts_done[0] / wall,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * to_ms,
+            "p95": percentile(latencies, 95) * to_ms,
+            "p99": percentile(latencies, 99) * to_ms,
+            "mean": (sum(latencies) / len(latencies) * to_ms) if latencies else 0.0,
+            "max": (latencies[-1] * to_ms) if latencies else 0.0,
+        },
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=str(ML_DIR),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_summary(results: List[Dict[str, Any]]):
+    print("\n📊 BENCHMARK RESULTS")
+    print(f"   {'scenario':10} {'endpoint':13} {'conc':>4} {'req/s':>8} {'texts/s':>9} "
+          f"{'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+    for row in results:
+        latency = row["latency_ms"]
+        print(f"   {row['scenario']:10} {row['endpoint']:13} {row['concurrency']:>4} {row['throughput_rps']:>8.1f} "
+              f"{row['throughput_texts_per_s']:>9.1f} {latency['p50']:>6.1f}ms {latency['p95']:>6.1f}ms "
+              f"{latency['p99']:>6.1f}ms {row['error_rate']:>6.1%}")
+
+
+def run_scenario(scenario: str, server_env: Dict[str, str], endpoints: List[str], levels: List[int],
+                 pool: InputPool, args) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], float]:
+    """Start a server with `server_env` (or use --url) and run every endpoint at every level"""
+    process, ready_seconds = None, None
+    if args.url:
+        base_url, pid, socket_file = args.url.rstrip("/"), args.pid, args.socket
+    else:
+        port = free_port()
+        server_env = dict(server_env)
+        if "socket" in endpoints:
+            server_env.setdefault("EVENTSNIFFER_SOCKET", socket_path(port))
+        print(f"🚀 [{scenario}] Starting server.py with {args.model_dir} on port {port}...")
+        process, ready_seconds = start_server(args.model_dir, port, server_env, ready_timeout=300)
+        base_url, pid = f"http://127.0.0.1:{port}", process.pid
+        socket_file = server_env.get("EVENTSNIFFER_SOCKET")
+        print(f"✅ Server ready in {ready_seconds:.2f}s")
+
+    sampler = RssSampler(pid) if pid else None
+    if sampler:
+        sampler.start()
+    elif psutil is None:
+        print("⚠️  psutil not installed, RSS won't be sampled")
+
+    results = []
+    try:
+        for endpoint in endpoints:
+            if sampler:
+                sampler.phase = f"{endpoint}:warmup"
+            for _ in range(args.warmup):
+                try:
+                    make_request(base_url, endpoint, pool, args.batch_texts, args.timeout,
+                                 socket_file, args.pipeline)
+                except Exception:
+                    pass
+            for concurrency in levels:
+                if sampler:
+                    sampler.phase = f"{endpoint}:c{concurrency}"
+                print(f"   [{scenario}] {endpoint} x{concurrency} for {args.duration:.0f}s...")
+                row = run_level(base_url, endpoint, concurrency, pool, args.duration,
+                                args.batch_texts, args.timeout, socket_file, args.pipeline)
+                results.append(dict(row, scenario=scenario))
+    finally:
+        if sampler:
+            sampler.stop()
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+    return results, sampler.samples if sampler else [], ready_seconds
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the EventSniffer ML server")
+    arg_parser.add_argument("--model-dir", default="model_output")
+    arg_parser.add_argument("--url", default=None,
+                            help="Benchmark an already running server instead of starting one")
+    arg_parser.add_argument("--pid", type=int, default=None,
+                            help="With --url: pid to sample RSS from")
+    arg_parser.add_argument("--endpoints", default="parse,parse_batch,parse_stream",
+                            help="Any of parse, parse_batch, parse_stream, socket")
+    arg_parser.add_argument("--concurrency", default="1,4,16",
+                            help="Comma-separated client counts, one run per level")
+    arg_parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+    arg_parser.add_argument("--warmup", type=int, default=20, help="Requests sent before each endpoint")
+    arg_parser.add_argument("--mix", default="chat:0.8,window:0.2",
+                            help="Input mix, e.g. chat:0.8,window:0.2")
+    arg_parser.add_argument("--window-chars", default="2000,10000,50000",
+                            help="Sizes of synthetic window dumps")
+    arg_parser.add_argument("--batch-texts", type=int, default=32, help="Texts per /parse_batch request")
+    arg_parser.add_argument("--pipeline", type=int, default=1,
+                            help="Requests a socket client sends before reading the answers")
+    arg_parser.add_argument("--socket", default=None,
+                            help="With --url: the server's EVENTSNIFFER_SOCKET path")
+    arg_parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout (seconds)")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--env", action="append", default=[],
+                            help="KEY=VALUE passed to server.py (repeatable)")
+    arg_parser.add_argument("--cache-endpoints", default="parse",
+                            help="Endpoints to run again with the parse cache on, as the 'cache' scenario "
+                                 "('' to skip)")
+    arg_parser.add_argument("--out", default=None, help="JSON output path")
+    args = arg_parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    levels = [int(c) for c in args.concurrency.split(",")]
+    user_env = dict(kv.split("=", 1) for kv in args.env)
+    pool = InputPool(parse_mix(args.mix), [int(n) for n in args.window_chars.split(",")], args.seed)
+    print(f"🔍 Inputs: {pool.describe()}")
+
+    if args.url:
+        print("⚠️  --url: the server's own cache settings apply, so repeated texts may be cache hits")
+        scenarios = [("as-running", None, endpoints)]
+    else:
+        # The pool repeats texts, so with the parse cache on most requests would
+        # never reach the model: measure the model with caching off, and the
+        # cache as its own scenario
+        scenarios = [("no-cache", dict(NO_CACHE_ENV, **user_env), endpoints)]
+        cache_endpoints = [e.strip() for e in args.cache_endpoints.split(",") if e.strip()]
+        if cache_endpoints:
+            scenarios.append(("cache", user_env, cache_endpoints))
+
+    results, rss_samples, ready = [], {}, {}
+    for scenario, server_env, scenario_endpoints in scenarios:
+        rows, samples, ready[scenario] = run_scenario(scenario, server_env, scenario_endpoints,
+                                                      levels, pool, args)
+        results.extend(rows)
+        rss_samples[scenario] = samples
+
+    print_summary(results)
+    for scenario, samples in rss_samples.items():
+        rss = [sample["rss_mb"] for sample in samples]
+        if rss:
+            print(f"   Server RSS ({scenario}): start {rss[0]:.0f}MB, peak {max(rss):.0f}MB, end {rss[-1]:.0f}MB")
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "model_dir": None if args.url else str(Path(args.model_dir).resolve()),
+        "url": args.url,
+        "server_env": {scenario: env for scenario, env, _ in scenarios},
+        "ready_seconds": ready,
+        "config": vars(args),
+        "inputs": pool.describe(),
+        "results": results,
+        "rss": rss_samples,
+    }
+    out = args.out or f"bench_{report['commit']}_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Saved results to '{out}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Chunking for very large window dumps
+Splits text into bounded chunks at paragraph, then sentence, then word
+boundaries. Chunks are plain slices of the original text, so an entity's
+absolute offset is just chunk offset + offset inside the chunk.
+"""
+
+import re
+from typing import Iterator, List, Tuple
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n")
+
+
+def _pieces(text: str, start: int, end: int, max_chars: int, breakers) -> Iterator[Tuple[int, int]]:
+    """(start, end) spans no longer than max_chars, cut at the coarsest boundary that works"""
+    if end - start <= max_chars:
+        yield start, end
+        return
+
+    if not breakers:
+        # No boundary left: cut at the last whitespace before the limit, or hard
+        while end - start > max_chars:
+            cut = start + max_chars
+            space = text.rfind(" ", start + 1, cut)
+            if space > start:
+                cut = space
+            yield start, cut
+            start = cut
+        yield start, end
+        return
+
+    breaker, rest = breakers[0], breakers[1:]
+    piece_start = start
+    for match in breaker.finditer(text, start, end):
+        yield from _pieces(text, piece_start, match.start(), max_chars, rest)
+        piece_start = match.start()
+    yield from _pieces(text, piece_start, end, max_chars, rest)
+
+
+def split_chunks(text: str, max_chars: int = 2000) -> List[Tuple[int, str]]:
+    """
+    (offset, chunk) pairs covering `text`, each at most max_chars long.
+    Neighbouring short pieces are merged up to the limit so a chat log of
+    one-liners doesn't become thousands of tiny docs. Whitespace-only chunks
+    are dropped.
+    """
+    chunks = []
+    chunk_start = chunk_end = 0
+    for start, end in _pieces(text, 0, len(text), max_chars, [PARAGRAPH_BREAK, SENTENCE_BREAK]):
+        if end - chunk_start > max_chars and chunk_end > chunk_start:
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = start
+        chunk_end = end
+    if chunk_end > chunk_start:
+        chunks.append((chunk_start, chunk_end))
+
+    return [(start, text[start:end]) for start, end in chunks if text[start:end].strip()]
@@ -0,0 +1,121 @@
+"""
+Half-precision static vectors for lean serving models
+Keeps the vector table as float16 (half the memory of spaCy's float32 table)
+and upcasts only the rows a batch actually looks up.
+
+Models exported with `export_model.py --half` reference this in their config
+as "eventsniffer.Float16Vectors.v1", so import this module before spacy.load.
+"""
+
+from pathlib import Path
+from typing import Callable, Union
+
+import numpy
+import srsly
+from spacy.attrs import ORTH
+from spacy.util import registry
+from spacy.vectors import BaseVectors
+
+VECTORS_REGISTRY_NAME = "eventsniffer.Float16Vectors.v1"
+
+
+class Float16Vectors(BaseVectors):
+    """Read-only key -> row lookup into a float16 table"""
+
+    def __init__(self, *, strings=None, data=None, key2row=None, name=None):
+        super().__init__(strings=strings)
+        self.strings = strings
+        self.name = name
+        self.mode = "default"
+        self.attr = ORTH
+        self.data = data if data is not None else numpy.zeros((0, 0), dtype="float16")
+        self.key2row = dict(key2row) if key2row else {}
+
+    @classmethod
+    def from_vectors(cls, vectors) -> "Float16Vectors":
+        """Convert a regular spacy.vectors.Vectors table"""
+        return cls(
+            strings=vectors.strings,
+            data=numpy.ascontiguousarray(vectors.data, dtype="float16"),
+            key2row=vectors.key2row,
+            name=vectors.name,
+        )
+
+    def _key(self, key):
+        if isinstance(key, str):
+            return self.strings[key] if self.strings is not None else hash(key)
+        return key
+
+    def __getitem__(self, key):
+        return self.data[self.key2row[self._key(key)]].astype("float32")
+
+    def __contains__(self, key):
+        return self._key(key) in self.key2row
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __iter__(self):
+        return iter(self.key2row)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def size(self):
+        return self.data.size
+
+    @property
+    def vectors_length(self):
+        return self.data.shape[1]
+
+    @property
+    def n_keys(self):
+        return len(self.key2row)
+
+    def is_full(self):
+        return True
+
+    def get_batch(self, keys):
+        """float32 rows for a batch of keys; unknown keys get zero vectors"""
+        rows = numpy.fromiter((self.key2row.get(int(k), -1) for k in keys), dtype="int64", count=len(keys))
+        batch = self.data[numpy.maximum(rows, 0)].astype("float32")
+        batch[rows < 0] = 0
+        return batch
+
+    def add(self, key, *, vector=None):
+        raise NotImplementedError("Float16Vectors are read-only")
+
+    def to_disk(self, path: Union[str, Path], **kwargs):
+        path = Path(path)
+        numpy.save(path / "vectors_f16.npy", self.data)
+        srsly.write_msgpack(path / "key2row_f16", {int(k): int(v) for k, v in self.key2row.items()})
+
+    def from_disk(self, path: Union[str, Path], **kwargs):
+        path = Path(path)
+        if (path / "vectors_f16.npy").exists():
+            self.data = numpy.load(path / "vectors_f16.npy")
+            self.key2row = {int(k): int(v) for k, v in srsly.read_msgpack(path / "key2row_f16").items()}
+        return self
+
+    def to_bytes(self, **kwargs):
+        return srsly.msgpack_dumps({
+            "data": self.data.tobytes(),
+            "shape": list(self.data.shape),
+            "key2row": {int(k): int(v) for k, v in self.key2row.items()},
+        })
+
+    def from_bytes(self, data: bytes, **kwargs):
+        msg = srsly.msgpack_loads(data)
+        self.data = numpy.frombuffer(msg["data"], dtype="float16").reshape(msg["shape"]).copy()
+        self.key2row = {int(k): int(v) for k, v in msg["key2row"].items()}
+        return self
+
+
+@registry.vectors(VECTORS_REGISTRY_NAME)
+def create_float16_vectors() -> Callable:
+    def vectors_factory(vocab) -> Float16Vectors:
+        return Float16Vectors(strings=vocab.strings)
+
+    return vectors_factory
@@ -0,0 +1,186 @@
+"""
+Cached DocBin corpus build
+Converts a training-data module's SIMPLE_DATA into sharded .spacy files with
+train/dev splits, under a directory named after a hash of the annotated data
+and the tokenizer. Unchanged data reuses the existing build, and training
+streams docs from the shards instead of holding every Example in memory.
+
+Usage:
+    python corpus.py                                  # training_data_v2, en_core_web_lg tokenizer
+    python corpus.py --data training_data --base blank:en
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import random
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+import spacy
+from spacy.tokens import Doc, DocBin
+from spacy.training import Example
+
+# Bump when the on-disk layout or the conversion below changes
+CORPUS_FORMAT = 1
+CORPUS_ROOT = Path(__file__).resolve().parent / "corpus"
+
+
+def load_base(base: str):
+    """'blank:en' for a blank pipeline, otherwise a model name or path"""
+    if base.startswith("blank:"):
+        return spacy.blank(base.split(":", 1)[1])
+    return spacy.load(base)
+
+
+def is_dev(text: str, dev_fraction: float) -> bool:
+    """Split by a hash of the text, so examples keep their split as the data grows"""
+    bucket = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "big")
+    return bucket % 10000 < dev_fraction * 10000
+
+
+def corpus_hash(train_data: List[Tuple[str, Dict]], nlp, dev_fraction: float, shard_size: int) -> str:
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        "format": CORPUS_FORMAT,
+        "spacy": spacy.__version__,
+        "lang": nlp.lang,
+        "dev_fraction": dev_fraction,
+        "shard_size": shard_size,
+    }, sort_keys=True).encode())
+    digest.update(nlp.tokenizer.to_bytes(exclude=["vocab"]))
+    for text, annotations in train_data:
+        digest.update(json.dumps([text, sorted(annotations.get("entities", []))]).encode())
+    return digest.hexdigest()
+
+
+def make_doc(nlp, text: str, entities: List[Tuple[int, int, str]]) -> Doc:
+    """Tokenized doc with gold entities; raises ValueError on misaligned or overlapping spans"""
+    doc = nlp.make_doc(text)
+    spans = []
+    for start, end, label in entities:
+        span = doc.char_span(start, end, label=label)
+        if span is None:
+            raise ValueError(f"'{text[start:end]}' ({start}-{end}) doesn't line up with token boundaries")
+        spans.append(span)
+    doc.ents = spans  # raises ValueError on overlaps
+    return doc
+
+
+def _write_shards(docs: List[Doc], out_dir: Path, shard_size: int) -> int:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    n_shards = 0
+    for n_shards, start in enumerate(range(0, len(docs), shard_size), start=1):
+        shard = DocBin(docs=docs[start:start + shard_size], store_user_data=False)
+        shard.to_disk(out_dir / f"{n_shards - 1:04d}.spacy")
+    return n_shards
+
+
+def build_corpus(data_module: str = "training_data_v2", nlp=None, base: str = "en_core_web_lg",
+                 dev_fraction: float = 0.2, shard_size: int = 1000, root: Path = CORPUS_ROOT,
+                 force: bool = False) -> Path:
+    """
+    Build (or reuse) the corpus for `data_module` and return its directory:
+        corpus/<module>-<hash>/{train,dev}/0000.spacy ... + manifest.json
+    """
+    if nlp is None:
+        nlp = load_base(base)
+    else:
+        base = f"{nlp.lang}_{nlp.meta.get('name', 'pipeline')}"
+    train_data = importlib.import_module(data_module).get_training_data()
+    key = corpus_hash(train_data, nlp, dev_fraction, shard_size)
+    corpus_dir = Path(root) / f"{data_module}-{key[:16]}"
+
+    if (corpus_dir / "manifest.json").exists() and not force:
+        print(f"✅ Corpus up to date: {corpus_dir}")
+        return corpus_dir
+
+    print(f"🔨 Building corpus from {data_module} ({len(train_data)} examples)...")
+    splits = {"train": [], "dev": []}
+    labels = set()
+    skipped = []
+    for text, annotations in train_data:
+        try:
+            doc = make_doc(nlp, text, annotations.get("entities", []))
+        except ValueError as e:
+            skipped.append({"text": text[:80], "error": str(e)})
+            print(f"⚠️  Skipping: '{text[:50]}...' - {e}")
+            continue
+        labels.update(ent.label_ for ent in doc.ents)
+        splits["dev" if is_dev(text, dev_fraction) else "train"].append(doc)
+
+    # Write next to the final location, then rename, so a crashed build never
+    # leaves a half-written corpus that looks complete
+    Path(root).mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".building-", dir=root))
+    try:
+        manifest = {
+            "hash": key,
+            "source": data_module,
+            "base": base,
+            "labels": sorted(labels),
+            "skipped": skipped,
+            "splits": {},
+        }
+        for name, docs in splits.items():
+            manifest["splits"][name] = {
+                "docs": len(docs),
+                "shards": _write_shards(docs, tmp_dir / name, shard_size),
+            }
+        (tmp_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+        if corpus_dir.exists():
+            shutil.rmtree(corpus_dir)
+        tmp_dir.rename(corpus_dir)
+    finally:
+        if tmp_dir.exists():
+            shutil.rmtree(tmp_dir)
+
+    print(f"✅ Corpus saved to '{corpus_dir}' "
+          f"(train {len(splits['train'])}, dev {len(splits['dev'])}, skipped {len(skipped)})")
+    return corpus_dir
+
+
+def read_manifest(corpus_dir: Path) -> Dict:
+    return json.loads((Path(corpus_dir) / "manifest.json").read_text())
+
+
+def iter_docs(corpus_dir: Path, split: str, vocab, shuffle: bool = False,
+              rng: random.Random = None) -> Iterator[Doc]:
+    """Stream docs shard by shard; shuffling is shard order + within one shard"""
+    shards = sorted((Path(corpus_dir) / split).glob("*.spacy"))
+    rng = rng or random.Random()
+    if shuffle:
+        rng.shuffle(shards)
+    for shard in shards:
+        docs = list(DocBin().from_disk(shard).get_docs(vocab))
+        if shuffle:
+            rng.shuffle(docs)
+        yield from docs
+
+
+def iter_examples(nlp, corpus_dir: Path, split: str, shuffle: bool = False,
+                  rng: random.Random = None) -> Iterator[Example]:
+    """Training Examples (fresh predicted doc + gold doc) streamed from the shards"""
+    for gold in iter_docs(corpus_dir, split, nlp.vocab, shuffle=shuffle, rng=rng):
+        yield Example(nlp.make_doc(gold.text), gold)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Build the cached DocBin training corpus")
+    arg_parser.add_argument("--data", default="training_data_v2", help="Training-data module")
+    arg_parser.add_argument("--base", default="en_core_web_lg",
+                            help="Model whose tokenizer to use ('blank:en' for a blank pipeline)")
+    arg_parser.add_argument("--dev-fraction", type=float, default=0.2)
+    arg_parser.add_argument("--shard-size", type=int, default=1000)
+    arg_parser.add_argument("--force", action="store_true", help="Rebuild even if up to date")
+    args = arg_parser.parse_args()
+
+    corpus_dir = build_corpus(args.data, base=args.base, dev_fraction=args.dev_fraction,
+                              shard_size=args.shard_size, force=args.force)
+    manifest = read_manifest(corpus_dir)
+    print(f"📊 Labels: {', '.join(manifest['labels'])}")
+    for name, split in manifest["splits"].items():
+        print(f"   {name}: {split['docs']} docs in {split['shards']} shard(s)")
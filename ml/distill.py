@@ -0,0 +1,198 @@
+"""
+Teacher -> student distillation
+Labels a large unlabeled corpus with the current hybrid pipeline (NER model +
+rules, via HybridEventParser) as the teacher, trains a compact student on those
+labels (blank English: no static vectors, small hash embeddings), and prints
+accuracy, docs/sec, load time, RSS and disk size for both, side by side.
+
+The student is a normal model directory, so the server can use it with:
+    EVENTSNIFFER_MODEL_DIR=model_student python server.py
+
+Usage:
+    python distill.py                                   # model_output_v2 -> model_student
+    python distill.py --teacher model_output_v2 --student model_student --n 100000
+    python distill.py --texts window_dumps.txt --iterations 20
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import random
+import shutil
+import sys
+from pathlib import Path
+from typing import Iterator, List
+
+from corpus import CORPUS_ROOT, is_dev, make_doc
+
+
+def unlabeled_texts(n: int, seed: int, text_files: List[str] = ()) -> Iterator[str]:
+    """Texts to label: any given files (one text per line), SIMPLE_DATA, then generated templates"""
+    for path in text_files:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield line.rstrip("\n")
+
+    from training_data_v2 import SIMPLE_DATA
+    for text, _ in SIMPLE_DATA:
+        yield text
+
+    # Only the text of generated examples is used; the teacher provides the labels
+    from generate_data import render, shard_seed
+    rng = random.Random(shard_seed(seed, 0))
+    for _ in range(n):
+        yield render(rng)[0]
+
+
+def label_corpus(teacher_dir: str, texts: Iterator[str], out_dir: Path, shard_size: int = 5000,
+                 dev_fraction: float = 0.1, batch_size: int = 256, force: bool = False) -> Path:
+    """
+    Run the teacher over `texts` and write its spans as corpus.py-style
+    shards. A non-empty out_dir is only replaced with force=True.
+    """
+    if out_dir.exists() and any(out_dir.iterdir()) and not force:
+        raise FileExistsError(f"'{out_dir}' already exists (use --force to overwrite)")
+
+    import spacy
+    from spacy.tokens import DocBin
+    from hybrid_parser import HybridEventParser
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        teacher = HybridEventParser(teacher_dir, cache_size=0)
+    tokenizer = spacy.blank("en")
+
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    bins = {"train": DocBin(store_user_data=False), "dev": DocBin(store_user_data=False)}
+    counts = {"train": 0, "dev": 0}
+    shards = {"train": 0, "dev": 0}
+    labels = set()
+    skipped = []
+
+    def flush(split):
+        if len(bins[split]):
+            (out_dir / split).mkdir(parents=True, exist_ok=True)
+            bins[split].to_disk(out_dir / split / f"{shards[split]:04d}.spacy")
+            shards[split] += 1
+            bins[split] = DocBin(store_user_data=False)
+
+    batch = []
+
+    def label_batch():
+        for text, result in zip(batch, teacher.parse_many(batch, batch_size=batch_size)):
+            entities = [(s["start"], s["end"], s["label"]) for s in result["spans"]]
+            try:
+                doc = make_doc(tokenizer, text, entities)
+            except ValueError as e:
+                # A rule span that cuts through a token; dropping only that span
+                # would teach the student it isn't an entity, so drop the text
+                skipped.append({"text": text[:80], "error": str(e)})
+                continue
+            labels.update(ent.label_ for ent in doc.ents)
+            split = "dev" if is_dev(text, dev_fraction) else "train"
+            bins[split].add(doc)
+            counts[split] += 1
+            if len(bins[split]) >= shard_size:
+                flush(split)
+        batch.clear()
+
+    for text in texts:
+        batch.append(text)
+        if len(batch) >= batch_size * 4:
+            label_batch()
+    label_batch()
+    flush("train")
+    flush("dev")
+
+    manifest = {
+        "hash": hashlib.sha256(f"{Path(teacher_dir).resolve()}:{counts}".encode()).hexdigest(),
+        "source": f"distill:{teacher_dir}",
+        "base": "blank:en",
+        "labels": sorted(labels),
+        "skipped": skipped,
+        "splits": {split: {"docs": counts[split], "shards": shards[split]} for split in counts},
+    }
+    out_dir.mkdir(parents=True, exist_ok=True)
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    print(f"✅ Teacher labeled {counts['train'] + counts['dev']} texts -> '{out_dir}' "
+          f"(train {counts['train']}, dev {counts['dev']}, skipped {len(skipped)})")
+    return out_dir
+
+
+def compare(models: dict, corpus_dir: Path) -> List[dict]:
+    """Suite accuracy + speed on the distill dev split, load time, RSS and disk size per model"""
+    from evaluator import evaluate_models
+    from export_model import disk_size_mb, measure_load
+
+    paths = [str(Path(p).resolve()) for p in models.values()]
+    corpora = {"validation_suite": None, "distill_dev": str(corpus_dir / "dev")}
+    # Serial, so the speed numbers aren't skewed by the other model
+    results = evaluate_models(paths, corpora, concurrent=False)
+
+    rows = []
+    for (name, path), result in zip(models.items(), results):
+        suite = result["datasets"]["validation_suite"]
+        dev = result["datasets"]["distill_dev"]
+        rows.append({
+            "model": name,
+            "path": str(path),
+            "suite_exact_f": suite["scores"]["exact"]["micro"]["f"],
+            "suite_overlap_f": suite["scores"]["overlap"]["micro"]["f"],
+            "teacher_agreement_f": dev["scores"]["exact"]["micro"]["f"],
+            "docs_per_sec": dev["docs_per_sec"],
+            "disk_mb": disk_size_mb(path),
+            **measure_load(path),
+        })
+
+    print("\n📊 TEACHER vs STUDENT")
+    print(f"   {'':8} {'suite F':>8} {'overlap':>8} {'agree F':>8} {'docs/s':>8} "
+          f"{'load':>7} {'rss':>8} {'disk':>9}")
+    for row in rows:
+        load = f"{row['load_seconds']:.2f}s" if row.get("load_seconds") is not None else "n/a"
+        rss = f"{row['rss_mb']:.0f}MB" if row.get("rss_mb") is not None else "n/a"
+        print(f"   {row['model']:8} {row['suite_exact_f']:>8.3f} {row['suite_overlap_f']:>8.3f} "
+              f"{row['teacher_agreement_f']:>8.3f} {row['docs_per_sec']:>8.0f} {load:>7} {rss:>8} "
+              f"{row['disk_mb']:>7.1f}MB")
+    if len(rows) == 2 and rows[0]["docs_per_sec"]:
+        print(f"   Student speed-up: {rows[1]['docs_per_sec'] / rows[0]['docs_per_sec']:.1f}x")
+    return rows
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Distill the hybrid pipeline into a compact student")
+    arg_parser.add_argument("--teacher", default="model_output_v2")
+    arg_parser.add_argument("--student", default="model_student")
+    arg_parser.add_argument("--n", type=int, default=50000, help="Generated texts to label")
+    arg_parser.add_argument("--texts", action="append", default=[],
+                            help="Extra unlabeled texts, one per line (repeatable)")
+    arg_parser.add_argument("--iterations", type=int, default=15)
+    arg_parser.add_argument("--dropout", type=float, default=0.2)
+    arg_parser.add_argument("--batch-size", type=int, default=32)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--force", action="store_true", help="Overwrite the labeled corpus if it exists")
+    args = arg_parser.parse_args()
+
+    corpus_dir = CORPUS_ROOT / f"distill-{Path(args.teacher).name}-{args.seed}-{args.n}"
+    print(f"🔍 Labeling texts with the teacher ({args.teacher})...")
+    try:
+        label_corpus(args.teacher, unlabeled_texts(args.n, args.seed, args.texts), corpus_dir, force=args.force)
+    except FileExistsError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"\n🚀 Training the student ({args.student})...")
+    from train_v2 import train_model
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = train_model(
+            iterations=args.iterations, dropout=args.dropout, batch_size=args.batch_size,
+            seed=args.seed, output_dir=args.student, base="blank:en",
+            quick_check=False, corpus_dir=corpus_dir,
+        )
+    print(f"✅ Student saved to '{result['output_dir']}' (dev F vs teacher {result['dev']['ents_f']:.3f})")
+
+    rows = compare({"teacher": args.teacher, "student": args.student}, corpus_dir)
+    (Path(args.student) / "distill_report.json").write_text(json.dumps(rows, indent=2))
+    print(f"\n   Serve it with: EVENTSNIFFER_MODEL_DIR={args.student} python server.py")
@@ -0,0 +1,216 @@
+"""
+Batched span-level evaluator
+Runs the validation suite and any held-out DocBin corpus through nlp.pipe and
+reports, per label, exact-match and overlap precision / recall / F1 together
+with docs/sec and tokens/sec. Several models are evaluated concurrently, one
+process each.
+
+Usage:
+    python evaluator.py model_output model_output_v2
+    python evaluator.py model_output_v2 --corpus corpus/training_data_v2-<hash>/dev --out eval.json
+    python evaluator.py model_output model_output_v2 --serial    # clean speed numbers
+"""
+
+import argparse
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# (start, end, label) character spans
+Span = Tuple[int, int, str]
+
+ML_DIR = Path(__file__).resolve().parent
+
+
+def suite_gold() -> List[Tuple[str, List[Span]]]:
+    """
+    validate_model.VALIDATION_SUITE as character spans. Each expected string
+    is matched case-insensitively at its first occurrence not already used.
+    """
+    from validate_model import VALIDATION_SUITE
+
+    dataset = []
+    for text, expected in VALIDATION_SUITE:
+        lowered = text.lower()
+        taken = []
+        spans = []
+        for label, values in expected.items():
+            for value in values:
+                start = lowered.find(value.lower())
+                while start != -1 and any(start < e and start + len(value) > s for s, e in taken):
+                    start = lowered.find(value.lower(), start + 1)
+                if start == -1:
+                    raise ValueError(f"'{value}' not found in '{text}'")
+                taken.append((start, start + len(value)))
+                spans.append((start, start + len(value), label))
+        dataset.append((text, sorted(spans)))
+    return dataset
+
+
+def corpus_gold(path: str, vocab) -> List[Tuple[str, List[Span]]]:
+    """Gold entities from a .spacy file, or every .spacy file in a directory"""
+    from spacy.tokens import DocBin
+
+    path = Path(path)
+    files = sorted(path.glob("*.spacy")) if path.is_dir() else [path]
+    dataset = []
+    for file in files:
+        for doc in DocBin().from_disk(file).get_docs(vocab):
+            dataset.append((doc.text, [(e.start_char, e.end_char, e.label_) for e in doc.ents]))
+    return dataset
+
+
+def _overlaps(a: Span, b: Span) -> bool:
+    return a[0] < b[1] and b[0] < a[1]
+
+
+def match_spans(gold: List[Span], pred: List[Span]) -> Dict[str, Dict[str, Dict[str, int]]]:
+    """
+    Per-label counts for one doc: {"exact"|"overlap": {label: {"tp", "fp", "fn"}}}.
+    Overlap matching is one-to-one: each gold span can be claimed by one prediction.
+    """
+    counts = {"exact": {}, "overlap": {}}
+    labels = {s[2] for s in gold} | {s[2] for s in pred}
+    for label in labels:
+        gold_l = [s for s in gold if s[2] == label]
+        pred_l = [s for s in pred if s[2] == label]
+
+        exact_tp = len(set(gold_l) & set(pred_l))
+        counts["exact"][label] = {"tp": exact_tp, "fp": len(pred_l) - exact_tp, "fn": len(gold_l) - exact_tp}
+
+        unmatched = list(gold_l)
+        overlap_tp = 0
+        for p in pred_l:
+            hit = next((g for g in unmatched if _overlaps(g, p)), None)
+            if hit is not None:
+                unmatched.remove(hit)
+                overlap_tp += 1
+        counts["overlap"][label] = {"tp": overlap_tp, "fp": len(pred_l) - overlap_tp, "fn": len(unmatched)}
+    return counts
+
+
+def prf(tp: int, fp: int, fn: int) -> Dict[str, float]:
+    p = tp / (tp + fp) if tp + fp else 0.0
+    r = tp / (tp + fn) if tp + fn else 0.0
+    f = 2 * p * r / (p + r) if p + r else 0.0
+    return {"p": p, "r": r, "f": f, "tp": tp, "fp": fp, "fn": fn}
+
+
+def score(dataset: List[Tuple[str, List[Span]]], predictions: List[List[Span]]) -> Dict:
+    """Per-label and micro-averaged P/R/F1, exact and overlap"""
+    totals = {"exact": {}, "overlap": {}}
+    for (_, gold), pred in zip(dataset, predictions):
+        for mode, per_label in match_spans(gold, pred).items():
+            for label, c in per_label.items():
+                t = totals[mode].setdefault(label, {"tp": 0, "fp": 0, "fn": 0})
+                for key in t:
+                    t[key] += c[key]
+
+    report = {}
+    for mode, per_label in totals.items():
+        micro = {key: sum(c[key] for c in per_label.values()) for key in ("tp", "fp", "fn")}
+        report[mode] = {
+            "labels": {label: prf(**c) for label, c in sorted(per_label.items())},
+            "micro": prf(**micro),
+        }
+    return report
+
+
+def evaluate(model_dir: str, corpora: Dict[str, Optional[str]], batch_size: int = 64) -> Dict:
+    """Load one model and score it on every dataset; runs inside a worker process"""
+    import spacy
+    import compact_vectors  # noqa: F401 (lets spacy.load read export_model.py --half models)
+
+    started = time.perf_counter()
+    nlp = spacy.load(model_dir)
+    result = {"model": model_dir, "load_seconds": time.perf_counter() - started, "datasets": {}}
+
+    for name, path in corpora.items():
+        dataset = suite_gold() if path is None else corpus_gold(path, nlp.vocab)
+        texts = [text for text, _ in dataset]
+
+        # Warm up so lazy init isn't billed to the first batch
+        list(nlp.pipe(texts[:batch_size], batch_size=batch_size))
+
+        started = time.perf_counter()
+        predictions, n_tokens = [], 0
+        for doc in nlp.pipe(texts, batch_size=batch_size):
+            n_tokens += len(doc)
+            predictions.append([(e.start_char, e.end_char, e.label_) for e in doc.ents])
+        seconds = time.perf_counter() - started
+
+        result["datasets"][name] = {
+            "docs": len(texts),
+            "tokens": n_tokens,
+            "seconds": seconds,
+            "docs_per_sec": len(texts) / seconds if seconds else 0.0,
+            "tokens_per_sec": n_tokens / seconds if seconds else 0.0,
+            "scores": score(dataset, predictions),
+        }
+    return result
+
+
+def evaluate_models(model_dirs: List[str], corpora: Dict[str, Optional[str]], batch_size: int = 64,
+                    concurrent: bool = True) -> List[Dict]:
+    if not concurrent or len(model_dirs) == 1:
+        return [evaluate(model_dir, corpora, batch_size) for model_dir in model_dirs]
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(model_dirs), mp_context=context) as pool:
+        futures = [pool.submit(evaluate, model_dir, corpora, batch_size) for model_dir in model_dirs]
+        return [future.result() for future in futures]
+
+
+def latest_dev_split(data_module: str = "training_data_v2") -> Optional[str]:
+    """Dev split of the most recently built corpus for `data_module`, if any"""
+    from corpus import CORPUS_ROOT
+
+    builds = sorted(CORPUS_ROOT.glob(f"{data_module}-*/manifest.json"), key=lambda p: p.stat().st_mtime)
+    return str(builds[-1].parent / "dev") if builds else None
+
+
+def print_report(results: List[Dict], concurrent: bool):
+    for result in results:
+        print(f"\n📊 {result['model']} (loaded in {result['load_seconds']:.2f}s)")
+        for name, ds in result["datasets"].items():
+            exact, overlap = ds["scores"]["exact"], ds["scores"]["overlap"]
+            print(f"   {name}: {ds['docs']} docs, {ds['docs_per_sec']:.0f} docs/s, "
+                  f"{ds['tokens_per_sec']:.0f} tokens/s")
+            print(f"     {'label':9} {'exact P':>8} {'R':>6} {'F1':>6}   {'overlap P':>9} {'R':>6} {'F1':>6}")
+            for label in exact["labels"]:
+                e, o = exact["labels"][label], overlap["labels"][label]
+                print(f"     {label:9} {e['p']:>8.3f} {e['r']:>6.3f} {e['f']:>6.3f}   "
+                      f"{o['p']:>9.3f} {o['r']:>6.3f} {o['f']:>6.3f}")
+            e, o = exact["micro"], overlap["micro"]
+            print(f"     {'ALL':9} {e['p']:>8.3f} {e['r']:>6.3f} {e['f']:>6.3f}   "
+                  f"{o['p']:>9.3f} {o['r']:>6.3f} {o['f']:>6.3f}")
+    if concurrent and len(results) > 1:
+        print("\n⚠️  Models ran concurrently and shared CPUs; use --serial for clean speed numbers")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Span-level accuracy and speed for one or more models")
+    arg_parser.add_argument("models", nargs="*", default=["model_output", "model_output_v2"])
+    arg_parser.add_argument("--corpus", action="append", default=None,
+                            help="DocBin file or directory (repeatable); default: latest training_data_v2 dev split")
+    arg_parser.add_argument("--no-suite", action="store_true", help="Skip validate_model.VALIDATION_SUITE")
+    arg_parser.add_argument("--batch-size", type=int, default=64)
+    arg_parser.add_argument("--serial", action="store_true", help="Evaluate models one after another")
+    arg_parser.add_argument("--out", default=None, help="Save the full results as JSON")
+    args = arg_parser.parse_args()
+
+    corpora = {} if args.no_suite else {"validation_suite": None}
+    for path in args.corpus if args.corpus is not None else [latest_dev_split()]:
+        if path:
+            corpora[path] = str(Path(path).resolve())
+
+    models = [str(Path(m).resolve()) if Path(m).exists() else m for m in args.models]
+    results = evaluate_models(models, corpora, args.batch_size, concurrent=not args.serial)
+    print_report(results, concurrent=not args.serial)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Saved results to '{args.out}'")
@@ -0,0 +1,153 @@
+"""
+Lean serving export
+Strips every pipe /parse doesn't need, optionally prunes the vector table to
+the N most frequent words and stores it in float16, then prints a before /
+after report of disk size, load time, RSS and validate_model accuracy.
+
+Usage:
+    python export_model.py model_output_v2 model_serving
+    python export_model.py model_output_v2 model_serving --vectors 50000 --half
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import spacy
+
+import compact_vectors
+from rules_component import RULES_PIPE_NAME
+
+# Pipes the server reads entities from
+SERVING_PIPES = ["ner", RULES_PIPE_NAME]
+
+
+def required_pipes(nlp):
+    """The serving pipes plus any shared embedding layer (tok2vec) they listen to"""
+    keep = {name for name in SERVING_PIPES if name in nlp.component_names}
+    for name, pipe in nlp.components:
+        listeners = getattr(pipe, "listening_components", [])
+        if any(listener in keep for listener in listeners):
+            keep.add(name)
+    return keep
+
+
+def export(model_dir, output_dir, n_vectors=None, half=False):
+    print(f"Loading model from {model_dir}...")
+    nlp = spacy.load(model_dir)
+
+    keep = required_pipes(nlp)
+    removed = [name for name in nlp.component_names if name not in keep]
+    for name in removed:
+        nlp.remove_pipe(name)
+    print(f"✅ Kept pipes: {', '.join(nlp.pipe_names)}")
+    print(f"   Removed: {', '.join(removed) or '(none)'}")
+
+    vectors = nlp.vocab.vectors
+    if vectors.shape[0] == 0:
+        print("   Model has no static vectors, nothing to prune")
+    else:
+        if n_vectors and n_vectors < vectors.shape[0]:
+            print(f"✂️  Pruning vectors {vectors.shape[0]} -> {n_vectors} rows "
+                  f"(dropped words map to their nearest kept vector)...")
+            nlp.vocab.prune_vectors(n_vectors)
+        if half:
+            print("🗜️  Storing vectors as float16...")
+            nlp.vocab.vectors = compact_vectors.Float16Vectors.from_vectors(nlp.vocab.vectors)
+            nlp.config["nlp"]["vectors"] = {"@vectors": compact_vectors.VECTORS_REGISTRY_NAME}
+
+    output_dir = Path(output_dir)
+    nlp.to_disk(output_dir)
+    print(f"✅ Serving model saved to '{output_dir}'")
+
+
+def disk_size_mb(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file()) / (1024 * 1024)
+
+
+def measure_load(model_dir):
+    """Load time and RSS, measured in a fresh interpreter so nothing is shared"""
+    result = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--measure-load", str(Path(model_dir).resolve())],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        return {"load_seconds": None, "rss_mb": None, "error": result.stderr.strip()[-500:]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _measure_load_child(model_dir):
+    import time
+    import psutil
+
+    started = time.perf_counter()
+    nlp = spacy.load(model_dir)
+    nlp("Warm up: sync tomorrow at 10am on Zoom")
+    load_seconds = time.perf_counter() - started
+    rss_mb = psutil.Process().memory_info().rss / (1024 * 1024)
+    print(json.dumps({"load_seconds": load_seconds, "rss_mb": rss_mb}))
+
+
+def accuracy(model_dir):
+    from validate_model import evaluate_model
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = evaluate_model(str(model_dir))
+    if not results:
+        return None
+    return results["correct"] / results["total"] * 100
+
+
+def report(before_dir, after_dir):
+    rows = []
+    for name, path in (("before", before_dir), ("after", after_dir)):
+        load = measure_load(path)
+        rows.append({
+            "model": name,
+            "path": str(path),
+            "disk_mb": disk_size_mb(path),
+            **load,
+            "accuracy": accuracy(path),
+        })
+
+    print("\n📊 EXPORT REPORT")
+    print(f"   {'':8} {'disk':>10} {'load':>9} {'rss':>10} {'accuracy':>9}")
+    for row in rows:
+        load = f"{row['load_seconds']:.2f}s" if row["load_seconds"] is not None else "n/a"
+        rss = f"{row['rss_mb']:.0f}MB" if row["rss_mb"] is not None else "n/a"
+        acc = f"{row['accuracy']:.1f}%" if row["accuracy"] is not None else "n/a"
+        print(f"   {row['model']:8} {row['disk_mb']:>8.1f}MB {load:>9} {rss:>10} {acc:>9}")
+        if row.get("error"):
+            print(f"   ⚠️  {row['model']}: {row['error']}")
+    return rows
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--measure-load":
+        _measure_load_child(sys.argv[2])
+        sys.exit(0)
+
+    arg_parser = argparse.ArgumentParser(description="Export a minimal serving model")
+    arg_parser.add_argument("model_dir")
+    arg_parser.add_argument("output_dir")
+    arg_parser.add_argument("--vectors", type=int, default=None,
+                            help="Keep only this many vector rows")
+    arg_parser.add_argument("--half", action="store_true",
+                            help="Store vectors in float16")
+    arg_parser.add_argument("--force", action="store_true",
+                            help="Overwrite output_dir if it exists")
+    args = arg_parser.parse_args()
+
+    if Path(args.output_dir).exists():
+        if not args.force:
+            print(f"❌ '{args.output_dir}' already exists (use --force to overwrite)")
+            sys.exit(1)
+        shutil.rmtree(args.output_dir)
+
+    export(args.model_dir, args.output_dir, n_vectors=args.vectors, half=args.half)
+    report(args.model_dir, args.output_dir)
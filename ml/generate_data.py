@@ -0,0 +1,304 @@
+"""
+Templated training-data generator
+Fills sentence templates with event, date, time and location phrases (plus
+slang like "tmrw", "10a", "2-4pm") and writes the annotated docs straight
+into sharded DocBin files, in the same layout corpus.py builds. Entity
+offsets are recorded while the text is assembled, so they are exact by
+construction. Shards are generated in a process pool, each from its own
+seeded RNG, so the output only depends on --seed and --n.
+
+Usage:
+    python generate_data.py --n 200000
+    python generate_data.py --n 50000 --seed 7 --out corpus/generated-small
+    python generate_data.py --preview 20
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+from corpus import CORPUS_ROOT, is_dev
+
+# Bump when the templates or phrase lists change (part of the output hash)
+GENERATOR_VERSION = 1
+
+# Annotation conventions follow training_data_v2: TIME includes a leading
+# "at"/"around", multi-word events are one span ("Team lunch", "grab coffee")
+EVENTS = [
+    "meeting", "sync", "standup", "team standup", "1:1", "call", "quick call", "kickoff call",
+    "design review", "code review", "sprint planning", "retro", "all hands", "client demo",
+    "product demo", "interview", "performance review", "board meeting", "town hall",
+    "workshop", "training session", "webinar", "offsite", "planning session",
+    "lunch", "team lunch", "dinner", "brunch", "coffee", "drinks", "happy hour",
+    "gym session", "yoga class", "tennis match", "movie", "game night", "birthday party",
+    "doctor appointment", "dentist appointment", "haircut", "vet appointment",
+    "study session", "office hours", "lecture", "exam", "group project meeting",
+]
+EVENT_VERBS = ["grab", "get", "do", "have", "hop on a"]
+VERBABLE_EVENTS = ["lunch", "dinner", "coffee", "drinks", "brunch", "call", "quick call"]
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+WEEKDAY_SLANG = ["mon", "tues", "wed", "thurs", "thu", "fri", "sat", "sun"]
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+          "September", "October", "November", "December"]
+MONTH_SHORT = ["Jan", "Feb", "Mar", "Apr", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+RELATIVE_DATES = ["today", "tonight", "tomorrow", "tmrw", "tmr", "tmw", "tonite", "tn",
+                  "tomorrow morning", "tomorrow afternoon", "tomorrow night", "this weekend",
+                  "next week", "end of the week", "the day after tomorrow"]
+
+# "on"/"via" platforms vs. "at"/"in" places; like the hand-written data, a
+# leading "the" stays outside the span ("in the auditorium" -> "auditorium")
+ONLINE = ["Zoom", "zoom", "Google Meet", "Teams", "Slack", "Webex", "Skype"]
+PLACES = [
+    "Conference Room A", "Conference Room B", "room 4B", "Starbucks", "Chipotle", "Joe's Pizza",
+    "Blue Bottle", "Main St", "5th Ave", "Market Street", "campus", "HQ",
+]
+THE_PLACES = ["auditorium", "library", "cafe", "office", "gym", "park"]
+
+
+def _ordinal(day: int) -> str:
+    suffix = "th" if 11 <= day % 100 <= 13 else {1: "st", 2: "nd", 3: "rd"}.get(day % 10, "th")
+    return f"{day}{suffix}"
+
+
+def random_date(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.35:
+        return rng.choice(RELATIVE_DATES)
+    if kind < 0.6:
+        day = rng.choice(WEEKDAYS + WEEKDAY_SLANG)
+        return rng.choice(["", "", "next ", "this ", "every "]) + day
+    if kind < 0.8:
+        month, day = rng.randint(1, 12), rng.randint(1, 28)
+        return f"{month}/{day}" if rng.random() < 0.8 else f"{month}/{day}/{rng.choice([25, 26, 2026])}"
+    day = rng.randint(1, 28)
+    month = rng.choice(MONTHS + MONTH_SHORT)
+    return rng.choice([f"{month} {_ordinal(day)}", f"{month} {day}", f"the {_ordinal(day)}"])
+
+
+def random_time(rng: random.Random) -> str:
+    hour = rng.randint(1, 12)
+    minute = rng.choice(["", "", ":00", ":15", ":30", ":45"])
+    kind = rng.random()
+    if kind < 0.2:
+        # Ranges: "2-4pm", "10am-12pm", "from 2 to 4pm"
+        end = hour % 12 + rng.randint(1, 3)
+        end = end - 12 if end > 12 else end
+        return rng.choice([f"{hour}-{end}pm", f"{hour}am-{end}pm", f"{hour}:30-{end}:30",
+                           f"from {hour} to {end}pm"])
+    if kind < 0.3:
+        return rng.choice(["at noon", "around noon", "at midnight", "noon", "eod", "end of day"])
+    suffix = rng.choice(["am", "pm", "pm", "a", "p", " am", " pm", "", "PM"])
+    prefix = rng.choice(["at ", "at ", "at ", "around ", "@", ""])
+    if not suffix and not minute:
+        prefix = rng.choice(["at ", "around "])  # a bare "3" isn't a time on its own
+    return f"{prefix}{hour}{minute}{suffix}"
+
+
+# Templates: plain text with {event}/{verb_event}, {date}, {time}/{time_bare}
+# and {online}/{place}/{the_place} slots
+TEMPLATES = [
+    "{event} {date} {time_bare}",
+    "{event} {date} {time}",
+    "{event} {date} {time} on {online}",
+    "{event} {date} {time} at {place}",
+    "{event} {date} {time} at the {the_place}",
+    "{event} at {place} {date} {time}",
+    "Let's {verb_event} {date} {time}",
+    "let's {verb_event} {date}?",
+    "Wanna {verb_event} {date}?",
+    "wanna {verb_event} {date} {time}?",
+    "Can we do {event} {date} {time}?",
+    "Are you free for {event} {date}?",
+    "reminder: {event} {date} {time}",
+    "{event} moved to {date} {time}",
+    "{event} got moved to {date}",
+    "Don't forget {event} {date} {time} in the {the_place}",
+    "{event} on {date} {time} via {online}",
+    "{event} {time} {date}",
+    "{event} {date}",
+    "{date} {time} {event} @ {place}",
+    "heads up, {event} is {date} {time}",
+    "Is {event} still on for {date}?",
+    "{event} w/ the team {date} {time}",
+    "sure, {date} {time} works for {event}",
+    "{event} {date} {time}, {online}",
+]
+
+# Chatter with no schedule signal, so the model learns to leave it alone
+NEGATIVES = [
+    "That's a great idea", "lol same", "ok sounds good", "Thanks for the update!",
+    "Can you send me the doc?", "I finished the project yesterday", "haha yeah",
+    "Let me check and get back to you", "Good point", "What do you think?",
+    "I'll take a look", "nice work on the release", "brb", "Agreed, ship it",
+    "Did you see the new design?", "The build is green again", "Sent from my iPhone",
+]
+
+SLOT = re.compile(r"\{(\w+)\}")
+
+
+def render(rng: random.Random) -> Tuple[str, List[Tuple[int, int, str]]]:
+    """One annotated example; offsets are recorded as each piece is appended"""
+    if rng.random() < 0.15:
+        return rng.choice(NEGATIVES), []
+
+    template = rng.choice(TEMPLATES)
+    parts, entities, pos, last = [], [], 0, 0
+    for match in SLOT.finditer(template):
+        literal = template[last:match.start()]
+        parts.append(literal)
+        pos += len(literal)
+        last = match.end()
+
+        slot = match.group(1)
+        if slot == "event":
+            value, label = rng.choice(EVENTS), "EVENT"
+        elif slot == "verb_event":
+            # The verb is part of the EVENT span ("grab coffee"), like the hand-written data
+            value, label = f"{rng.choice(EVENT_VERBS)} {rng.choice(VERBABLE_EVENTS)}", "EVENT"
+        elif slot == "date":
+            value, label = random_date(rng), "DATE"
+        elif slot == "time":
+            value, label = random_time(rng), "TIME"
+        elif slot == "time_bare":
+            value, label = f"{rng.randint(1, 12)}{rng.choice(['am', 'pm', 'a', 'p'])}", "TIME"
+        elif slot == "online":
+            value, label = rng.choice(ONLINE), "LOCATION"
+        elif slot == "place":
+            value, label = rng.choice(PLACES), "LOCATION"
+        else:
+            value, label = rng.choice(THE_PLACES), "LOCATION"
+
+        if pos == 0 and rng.random() < 0.7:
+            value = value[0].upper() + value[1:]
+        parts.append(value)
+        entities.append((pos, pos + len(value), label))
+        pos += len(value)
+    parts.append(template[last:])
+    text = "".join(parts)
+
+    # Casing variants of the whole message: all lower (texting), rarely all caps
+    roll = rng.random()
+    if roll < 0.25:
+        text = text.lower()
+    elif roll < 0.27:
+        text = text.upper()
+    return text, entities
+
+
+def shard_seed(seed: int, shard: int) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{seed}:{shard}".encode(), digest_size=8).digest(), "big")
+
+
+def generate_shard(shard: int, n_docs: int, seed: int, out_dir: str, dev_fraction: float) -> dict:
+    """Generate, tokenize and write one train shard and one dev shard; runs in a worker"""
+    import spacy
+    from spacy.tokens import DocBin
+    from corpus import make_doc
+
+    nlp = spacy.blank("en")
+    rng = random.Random(shard_seed(seed, shard))
+    bins = {"train": DocBin(store_user_data=False), "dev": DocBin(store_user_data=False)}
+    labels, skipped = set(), []
+    for _ in range(n_docs):
+        text, entities = render(rng)
+        try:
+            doc = make_doc(nlp, text, entities)
+        except ValueError as e:
+            skipped.append({"text": text[:80], "error": str(e)})
+            continue
+        labels.update(ent.label_ for ent in doc.ents)
+        bins["dev" if is_dev(text, dev_fraction) else "train"].add(doc)
+
+    counts = {}
+    for split, doc_bin in bins.items():
+        counts[split] = len(doc_bin)
+        if len(doc_bin):
+            Path(out_dir, split).mkdir(parents=True, exist_ok=True)
+            doc_bin.to_disk(Path(out_dir, split, f"{shard:04d}.spacy"))
+    return {"shard": shard, "counts": counts, "labels": sorted(labels), "skipped": skipped}
+
+
+def generate(n: int, out_dir: Path, seed: int = 0, shard_size: int = 5000, dev_fraction: float = 0.1,
+             workers: int = None, force: bool = False) -> Path:
+    """
+    Write n generated examples as corpus-style shards + manifest.json under
+    out_dir. A non-empty out_dir is only replaced with force=True.
+    """
+    out_dir = Path(out_dir)
+    if out_dir.exists():
+        if any(out_dir.iterdir()) and not force:
+            raise FileExistsError(f"'{out_dir}' already exists (use --force to overwrite)")
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+
+    shard_sizes = [min(shard_size, n - start) for start in range(0, n, shard_size)]
+    started = time.perf_counter()
+    totals = {"train": 0, "dev": 0}
+    labels, skipped = set(), []
+    # Shards are written by the workers; only small summaries come back, so
+    # memory stays at roughly one shard per worker
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = [pool.submit(generate_shard, i, size, seed, str(out_dir), dev_fraction)
+                   for i, size in enumerate(shard_sizes)]
+        for future in futures:
+            summary = future.result()
+            for split, count in summary["counts"].items():
+                totals[split] += count
+            labels.update(summary["labels"])
+            skipped.extend(summary["skipped"])
+            print(f"   shard {summary['shard']:04d}: {summary['counts']['train']} train, "
+                  f"{summary['counts']['dev']} dev")
+
+    manifest = {
+        "hash": hashlib.sha256(json.dumps([GENERATOR_VERSION, n, seed, shard_size, dev_fraction]).encode()).hexdigest(),
+        "source": "generate_data",
+        "base": "blank:en",
+        "seed": seed,
+        "labels": sorted(labels),
+        "skipped": skipped,
+        "splits": {
+            split: {"docs": totals[split], "shards": len(list((out_dir / split).glob("*.spacy")))}
+            for split in ("train", "dev")
+        },
+    }
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    print(f"✅ {n} examples in {time.perf_counter() - started:.1f}s -> '{out_dir}' "
+          f"(train {totals['train']}, dev {totals['dev']}, skipped {len(skipped)})")
+    return out_dir
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Generate templated training data as DocBin shards")
+    arg_parser.add_argument("--n", type=int, default=200000, help="Number of examples")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--shard-size", type=int, default=5000)
+    arg_parser.add_argument("--dev-fraction", type=float, default=0.1)
+    arg_parser.add_argument("--workers", type=int, default=None)
+    arg_parser.add_argument("--out", default=None, help="Output dir (default corpus/generated-<seed>-<n>)")
+    arg_parser.add_argument("--preview", type=int, default=0, help="Just print N examples")
+    arg_parser.add_argument("--force", action="store_true", help="Overwrite the output dir if it exists")
+    args = arg_parser.parse_args()
+
+    if args.preview:
+        rng = random.Random(shard_seed(args.seed, 0))
+        for _ in range(args.preview):
+            text, entities = render(rng)
+            print(f"{text!r}: {[(text[s:e], label) for s, e, label in entities]}")
+    else:
+        out = Path(args.out) if args.out else CORPUS_ROOT / f"generated-{args.seed}-{args.n}"
+        try:
+            generate(args.n, out, seed=args.seed, shard_size=args.shard_size,
+                     dev_fraction=args.dev_fraction, workers=args.workers, force=args.force)
+        except FileExistsError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
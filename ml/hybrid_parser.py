@@ -5,8 +5,124 @@ Combines ML predictions with deterministic rules for maximum accuracy
 
 import spacy
 import re
+import copy
+import time
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
+
+from parse_cache import DiskParseCache, ParseCache, model_fingerprint
+import compact_vectors  # noqa: F401 (lets spacy.load read export_model.py --half models)
+from rules_component import RULES_PIPE_NAME, RULE_ID
+from metrics import REGISTRY
+from normalize import DateTimeNormalizer, reference_time
+
+# Per-stage latency of parse_many; "ner" is the nlp.pipe time per doc
+STAGE_SECONDS = REGISTRY.histogram(
+    "eventsniffer_hybrid_stage_seconds", "HybridEventParser time per text by stage", ["stage"])
+
+
+# Spelled out, so "maybe 12" isn't read as a month and a day
+MONTH_NAMES = ('jan|january|feb|february|mar|march|apr|april|may|jun|june|jul|july|aug|august|'
+               'sep|sept|september|oct|october|nov|november|dec|december')
+
+# Date patterns
+DATE_PATTERNS = [
+    # Relative dates
+    (r'\b(today|tonight|tn|tonite)\b', 'DATE'),
+    (r'\b(tomorrow|tmrw|tmr|tmw)\b', 'DATE'),
+    (r'\b(yesterday)\b', 'DATE'),
+    (r'\b(next|this)\s+(week|month|year)\b', 'DATE'),
+    (r'\b(next|this)\s+(mon|monday|tues|tuesday|wed|wednesday|thurs|thursday|fri|friday|sat|saturday|sun|sunday)\b', 'DATE'),
+    (r'\b(mon|monday|tues|tuesday|wed|wednesday|thurs|thursday|fri|friday|sat|saturday|sun|sunday)\b', 'DATE'),
+
+    # Absolute dates
+    (r'\b\d{1,2}/\d{1,2}(/\d{2,4})?\b', 'DATE'),  # 12/5, 12/5/24
+    (rf'\b({MONTH_NAMES})\s+\d{{1,2}}(st|nd|rd|th)?\b', 'DATE'),  # Dec 5th
+    (rf'\b\d{{1,2}}(st|nd|rd|th)?\s+({MONTH_NAMES})\b', 'DATE'),  # 5th Dec
+]
+
+# Time patterns
+# Patterns in a category are scanned as one alternation where the first
+# alternative that matches at a position wins, so ranges go before single times
+TIME_PATTERNS = [
+    # Time ranges
+    (r'\b\d{1,2}(:\d{2})?(\s*(am|pm|a|p))?\s*-\s*\d{1,2}(:\d{2})?(\s*(am|pm|a|p))?\b', 'TIME'),  # 2-4pm, 10am-12pm
+    (r'\b(from|between)\s+\d{1,2}.*?\d{1,2}\s*(am|pm|AM|PM)\b', 'TIME'),
+
+    # Standard times
+    (r'\b\d{1,2}:\d{2}(\s*(am|pm))?\b', 'TIME'),  # 3:30pm
+    (r'\b\d{1,2}\s*(am|pm|AM|PM|a|p)\b', 'TIME'),  # 3pm, 3p
+    (r'(\bat|@)\s*\d{1,2}(:\d{2})?(\s*(am|pm|a|p))?\b', 'TIME'),  # at 3, @ 3pm (see trim_time_prefix)
+
+    # Relative times
+    (r'\b(noon|midnight|EOD|end of day)\b', 'TIME'),
+    (r'\b(morning|afternoon|evening|night)\b', 'TIME'),
+    (r'\bin\s+\d+\s+(min|minutes|mins|hour|hours|hr|hrs)\b', 'TIME'),
+]
+
+# Location patterns
+LOCATION_PATTERNS = [
+    # Virtual
+    (r'\b(zoom|teams|google meet|slack|webex|skype)\b', 'LOCATION'),
+    (r'https?://\S+', 'LOCATION'),  # URLs
+
+    # Physical markers
+    (r'\bat\s+[A-Z][a-z]+\'?s\b', 'LOCATION'),  # at Joe's
+    (r'\b(conference room|conf room|room)\s+[A-Z0-9]+\b', 'LOCATION'),
+    (r'\bon\s+[A-Z][a-z]+\s+(st|street|ave|avenue|rd|road|blvd|boulevard)\b\.?', 'LOCATION'),  # on Main St.
+]
+
+
+ENTITY_LABELS = ('EVENT', 'DATE', 'TIME', 'LOCATION')
+
+# A span is (start, end, label, source), source being 'ner' or 'rule'
+Span = Tuple[int, int, str, str]
+
+
+def compile_patterns(patterns: List[Tuple[str, str]]) -> 're.Pattern':
+    """Combine a category's patterns into one case-insensitive alternation"""
+    return re.compile('|'.join(f'(?:{pattern})' for pattern, _ in patterns), re.IGNORECASE)
+
+
+# "at 3" is only a time because of the "at", but the preposition isn't part of it
+TIME_PREFIX = re.compile(r'(at\b|@)\s*', re.IGNORECASE)
+
+
+def trim_time_prefix(text: str, span: Span) -> Span:
+    """Drop a leading "at"/"@" from a rule TIME span ("at 3pm" -> "3pm")"""
+    start, end, label, source = span
+    if label == 'TIME':
+        prefix = TIME_PREFIX.match(text, start, end)
+        if prefix and prefix.end() < end:
+            start = prefix.end()
+    return (start, end, label, source)
+
+
+def merge_spans(ner_spans: List[Span], rule_spans: List[Span]) -> List[Span]:
+    """
+    Sorted-interval merge, O(n log n). NER spans always win (the model saw
+    the context); a rule span is kept only if it overlaps neither an NER
+    span nor a rule span kept before it (longest first at equal starts).
+    """
+    ner_spans = sorted(ner_spans)
+    rule_spans = sorted(rule_spans, key=lambda s: (s[0], s[0] - s[1]))
+
+    kept = list(ner_spans)
+    i = 0
+    last_rule_end = -1
+    for span in rule_spans:
+        start, end = span[0], span[1]
+        # NER spans don't overlap each other, so their ends are sorted too
+        while i < len(ner_spans) and ner_spans[i][1] <= start:
+            i += 1
+        if i < len(ner_spans) and ner_spans[i][0] < end:
+            continue
+        if start < last_rule_end:
+            continue
+        kept.append(span)
+        last_rule_end = end
+
+    return sorted(kept)
 
 
 class HybridEventParser:
@@ -14,75 +130,142 @@ class HybridEventParser:
     Two-stage parser:
     1. Use spaCy NER model for entity extraction
     2. Apply rule-based post-processing to fix/enhance results
+       (inside the spaCy pipeline when the model has the rules component)
     """
     
-    def __init__(self, model_path="model_output_v2"):
-        """Load the trained NER model"""
+    def __init__(self, model_path="model_output_v2", cache_size=1024, cache_ttl=300.0,
+                 prefilter=False, disk_cache=None, disk_cache_mb=256):
+        """
+        Load the trained NER model
+
+        Args:
+            model_path: Directory of the trained spaCy pipeline
+            cache_size: Max cached parse results (0 disables the cache)
+            cache_ttl: Seconds before a cached result expires
+            prefilter: Skip NER on text with no date/time/event trigger words
+            disk_cache: SQLite file for a persistent result cache shared
+                across processes and restarts (None disables it)
+            disk_cache_mb: Size budget of the disk cache
+        """
         print(f"Loading model from {model_path}...")
         self.nlp = spacy.load(model_path)
         print("✅ Model loaded")
+
+        # Models saved by train_v2.py run the rules inside the pipeline
+        # (rules_component.py); older models fall back to the regex scan below
+        self.rules_in_pipeline = RULES_PIPE_NAME in self.nlp.pipe_names
         
-        # Date patterns
-        self.date_patterns = [
-            # Relative dates
-            (r'\b(today|tonight|tn|tonite)\b', 'DATE'),
-            (r'\b(tomorrow|tmrw|tmr|tmw)\b', 'DATE'),
-            (r'\b(yesterday)\b', 'DATE'),
-            (r'\b(next|this)\s+(week|month|year)\b', 'DATE'),
-            (r'\b(next|this)\s+(mon|monday|tues|tuesday|wed|wednesday|thurs|thursday|fri|friday|sat|saturday|sun|sunday)\b', 'DATE'),
-            (r'\b(mon|monday|tues|tuesday|wed|wednesday|thurs|thursday|fri|friday|sat|saturday|sun|sunday)\b', 'DATE'),
-            
-            # Absolute dates
-            (r'\b\d{1,2}/\d{1,2}(/\d{2,4})?\b', 'DATE'),  # 12/5, 12/5/24
-            (r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{1,2}(st|nd|rd|th)?\b', 'DATE'),  # Dec 5th
-            (r'\b\d{1,2}(st|nd|rd|th)?\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b', 'DATE'),  # 5th Dec
-        ]
-        
-        # Time patterns
-        self.time_patterns = [
-            # Standard times
-            (r'\b\d{1,2}:\d{2}\s*(am|pm|AM|PM)?\b', 'TIME'),  # 3:30pm
-            (r'\b\d{1,2}\s*(am|pm|AM|PM|a|p)\b', 'TIME'),  # 3pm, 3p
-            (r'\b(at|@)\s*\d{1,2}(:\d{2})?\s*(am|pm|AM|PM|a|p)?\b', 'TIME'),  # at 3, @ 3pm
-            
-            # Time ranges
-            (r'\b\d{1,2}(:\d{2})?\s*-\s*\d{1,2}(:\d{2})?\s*(am|pm|AM|PM)?\b', 'TIME'),  # 2-4pm
-            (r'\b(from|between)\s+\d{1,2}.*?\d{1,2}\s*(am|pm|AM|PM)\b', 'TIME'),
-            
-            # Relative times
-            (r'\b(noon|midnight|EOD|end of day)\b', 'TIME'),
-            (r'\b(morning|afternoon|evening|night)\b', 'TIME'),
-            (r'\bin\s+\d+\s+(min|minutes|mins|hour|hours|hr|hrs)\b', 'TIME'),
-        ]
-        
-        # Location patterns
-        self.location_patterns = [
-            # Virtual
-            (r'\b(zoom|teams|google meet|slack|webex|skype)\b', 'LOCATION'),
-            (r'https?://\S+', 'LOCATION'),  # URLs
-            
-            # Physical markers
-            (r'\bat\s+[A-Z][a-z]+\'?s\b', 'LOCATION'),  # at Joe's
-            (r'\b(conference room|conf room|room)\s+[A-Z0-9]+\b', 'LOCATION'),
-            (r'\bon\s+[A-Z][a-z]+\s+(st|street|ave|avenue|rd|road|blvd|boulevard)\b', 'LOCATION'),
+        # Rule patterns (shared with the prefilter, see prefilter.py)
+        self.date_patterns = list(DATE_PATTERNS)
+        self.time_patterns = list(TIME_PATTERNS)
+        self.location_patterns = list(LOCATION_PATTERNS)
+
+        # One precompiled scan per category instead of one re.finditer per pattern
+        self._rule_regexes = [
+            ('DATE', compile_patterns(self.date_patterns)),
+            ('TIME', compile_patterns(self.time_patterns)),
+            ('LOCATION', compile_patterns(self.location_patterns)),
         ]
+
+        # Result caches (memory, then optionally disk), keyed on model + rule patterns + text
+        rules = repr((self.date_patterns, self.time_patterns, self.location_patterns, TIME_PREFIX.pattern))
+        fingerprint = model_fingerprint(self.nlp, model_path, extra=rules)
+        self.cache = None
+        if cache_size > 0:
+            self.cache = ParseCache(fingerprint, max_entries=cache_size, ttl=cache_ttl)
+        self.disk_cache = None
+        if disk_cache:
+            self.disk_cache = DiskParseCache(disk_cache, fingerprint, namespace=f"hybrid:{model_path}",
+                                             max_bytes=int(disk_cache_mb * 1024 * 1024))
+
+        self.prefilter = None
+        if prefilter:
+            from prefilter import PreFilter
+            self.prefilter = PreFilter()
+
+        # Resolves calendar_event date/time to ISO start/end; applied after the
+        # cache, since the result depends on the reference time
+        self.normalizer = DateTimeNormalizer()
     
-    def parse(self, text: str) -> Dict[str, Any]:
+    def parse(self, text: str, bypass_prefilter: bool = False, reference: datetime = None) -> Dict[str, Any]:
         """
         Parse text for calendar events
+
+        Args:
+            text: Text to parse
+            bypass_prefilter: Run the full pipeline even if the prefilter
+                would skip this text (for comparisons)
+            reference: Timezone-aware time that relative dates resolve
+                against (default: now, local timezone)
         
         Returns:
             {
                 'entities': [...],  # Raw NER entities
                 'enhanced': {...},  # Enhanced with rules
+                'spans': [...],  # NER + rule spans with offsets, overlaps resolved
                 'confidence': float,  # Overall confidence
-                'calendar_event': {...} or None  # Ready-to-use event
+                'calendar_event': {...} or None  # Ready-to-use event, with
+                                                 # ISO 'start'/'end' when the date/time resolve
             }
         """
-        # Stage 1: NER extraction
-        doc = self.nlp(text)
+        return self.parse_many([text], bypass_prefilter=bypass_prefilter, reference=reference)[0]
+
+    def parse_many(self, texts: List[str], batch_size: int = 64, n_process: int = 1,
+                   bypass_prefilter: bool = False, reference: datetime = None) -> List[Dict[str, Any]]:
+        """Parse several texts with one nlp.pipe pass; results are in input order"""
+        results = [None] * len(texts)
+        cache_keys = [None] * len(texts)
+        todo = []
+
+        for i, text in enumerate(texts):
+            if self.prefilter and not bypass_prefilter and not self.prefilter.should_parse(text):
+                results[i] = self._empty_result()
+                continue
+            if self.cache:
+                cache_keys[i] = self.cache.key(text)
+                cached = self.cache.get(cache_keys[i])
+                if cached is not None:
+                    # Hand out a copy so callers can't mutate the cached result
+                    results[i] = copy.deepcopy(cached)
+                    continue
+            if self.disk_cache:
+                cache_keys[i] = cache_keys[i] or self.disk_cache.key(text)
+                cached = self.disk_cache.get(cache_keys[i])  # a fresh copy from JSON
+                if cached is not None:
+                    if self.cache:
+                        self.cache.put(cache_keys[i], copy.deepcopy(cached))
+                    results[i] = cached
+                    continue
+            todo.append(i)
+
+        docs = self.nlp.pipe((texts[i] for i in todo), batch_size=batch_size, n_process=n_process)
+        for i in todo:
+            started = time.perf_counter()
+            doc = next(docs)
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="ner")
+            results[i] = self._parse_doc(texts[i], doc)
+            if self.cache:
+                self.cache.put(cache_keys[i], copy.deepcopy(results[i]))
+            if self.disk_cache:
+                self.disk_cache.put(cache_keys[i], results[i])
+
+        reference = reference or reference_time()
+        for result in results:
+            event = result['calendar_event']
+            if event:
+                resolved = self.normalizer.resolve(event['date'], event['time'], reference)
+                event.update(resolved or {'start': None, 'end': None, 'all_day': None})
+        return results
+
+    def _parse_doc(self, text: str, doc) -> Dict[str, Any]:
+        # Stage 1: NER extraction. If the model ships the rules component,
+        # its matches are already in doc.ents, tagged with RULE_ID.
         ner_entities = []
+        rule_spans = [] if self.rules_in_pipeline else None
         for ent in doc.ents:
+            if self.rules_in_pipeline and ent.ent_id_ == RULE_ID:
+                rule_spans.append((ent.start_char, ent.end_char, ent.label_, 'rule'))
+                continue
             ner_entities.append({
                 'text': ent.text,
                 'label': ent.label_,
@@ -91,60 +274,73 @@ class HybridEventParser:
             })
         
         # Stage 2: Rule-based enhancement
-        enhanced_entities = self._apply_rules(text, ner_entities)
+        started = time.perf_counter()
+        enhanced_entities, spans = self._apply_rules(text, ner_entities, rule_spans)
+        rules_done = time.perf_counter()
         
         # Stage 3: Build calendar event
         calendar_event = self._build_calendar_event(enhanced_entities, text)
+        calendar_done = time.perf_counter()
         
         # Stage 4: Calculate confidence
         confidence = self._calculate_confidence(enhanced_entities, calendar_event)
+        confidence_done = time.perf_counter()
+
+        STAGE_SECONDS.observe(rules_done - started, stage="rules")
+        STAGE_SECONDS.observe(calendar_done - rules_done, stage="calendar_event")
+        STAGE_SECONDS.observe(confidence_done - calendar_done, stage="confidence")
         
         return {
             'entities': ner_entities,
             'enhanced': enhanced_entities,
+            'spans': spans,
             'confidence': confidence,
             'calendar_event': calendar_event
         }
-    
-    def _apply_rules(self, text: str, ner_entities: List[Dict]) -> Dict[str, List[str]]:
-        """Apply regex rules to catch what NER missed"""
-        enhanced = {
-            'EVENT': [],
-            'DATE': [],
-            'TIME': [],
-            'LOCATION': []
+
+    def _empty_result(self) -> Dict[str, Any]:
+        return {
+            'entities': [],
+            'enhanced': {label: [] for label in ENTITY_LABELS},
+            'spans': [],
+            'confidence': 0.0,
+            'calendar_event': None
         }
-        
-        # Add NER findings
-        for ent in ner_entities:
-            if ent['label'] in enhanced:
-                enhanced[ent['label']].append(ent['text'])
-        
-        # Apply date rules
-        for pattern, label in self.date_patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                val = match.group(0)
-                if val not in enhanced['DATE']:
-                    enhanced['DATE'].append(val)
-        
-        # Apply time rules
-        for pattern, label in self.time_patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                val = match.group(0)
-                if val not in enhanced['TIME']:
-                    enhanced['TIME'].append(val)
-        
-        # Apply location rules
-        for pattern, label in self.location_patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                val = match.group(0)
-                if val not in enhanced['LOCATION']:
-                    enhanced['LOCATION'].append(val)
-        
-        return enhanced
+    
+    def _apply_rules(self, text: str, ner_entities: List[Dict],
+                     rule_spans: List[Span] = None) -> Tuple[Dict[str, List[str]], List[Dict]]:
+        """
+        Apply regex rules to catch what NER missed. `rule_spans` skips the
+        regex scan when the rules already ran inside the spaCy pipeline.
+
+        Returns (enhanced label -> values, merged spans with offsets)
+        """
+        ner_spans = [(e['start'], e['end'], e['label'], 'ner') for e in ner_entities]
+        if rule_spans is None:
+            rule_spans = []
+            for label, regex in self._rule_regexes:
+                for match in regex.finditer(text):
+                    rule_spans.append((match.start(), match.end(), label, 'rule'))
+        # The regexes and the in-pipeline rules both match "at 3" / "@ 3pm" whole
+        rule_spans = [trim_time_prefix(text, span) for span in rule_spans]
+
+        spans = merge_spans(ner_spans, rule_spans)
+
+        # NER findings first, then whatever the rules added; each value once
+        enhanced = {label: [] for label in ENTITY_LABELS}
+        seen = set()
+        for source in ('ner', 'rule'):
+            for start, end, label, span_source in spans:
+                val = text[start:end]
+                if span_source == source and label in enhanced and (label, val) not in seen:
+                    seen.add((label, val))
+                    enhanced[label].append(val)
+
+        span_dicts = [
+            {'text': text[start:end], 'label': label, 'start': start, 'end': end, 'source': source}
+            for start, end, label, source in spans
+        ]
+        return enhanced, span_dicts
     
     def _build_calendar_event(self, entities: Dict, text: str) -> Dict:
         """Try to build a complete calendar event"""
@@ -155,9 +351,15 @@ class HybridEventParser:
         title = entities.get('EVENT', ['New Event'])[0] if entities.get('EVENT') else "Event"
         
         # Get date/time
-        date_str = entities.get('DATE', [None])[0]
-        time_str = entities.get('TIME', [None])[0]
-        location = entities.get('LOCATION', [None])[0]
+        # (the label lists always exist but may be empty)
+        date_str = (entities.get('DATE') or [None])[0]
+        time_str = (entities.get('TIME') or [None])[0]
+        # The NER is trained on "at 3pm" spans; the event time is just "3pm"
+        if time_str:
+            prefix = TIME_PREFIX.match(time_str)
+            if prefix and prefix.end() < len(time_str):
+                time_str = time_str[prefix.end():]
+        location = (entities.get('LOCATION') or [None])[0]
         
         return {
             'title': title.title(),
@@ -220,6 +422,7 @@ if __name__ == "__main__":
             print(f"   Title: {event['title']}")
             print(f"   Date: {event['date'] or 'N/A'}")
             print(f"   Time: {event['time'] or 'N/A'}")
+            print(f"   Start: {event['start'] or 'N/A'}  End: {event['end'] or 'N/A'}")
             print(f"   Location: {event['location'] or 'N/A'}")
         else:
             print(f"⚪ No event detected")
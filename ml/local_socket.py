@@ -0,0 +1,279 @@
+"""
+Unix domain socket transport
+A lower-overhead alternative to HTTP for clients on the same machine: no TCP,
+no HTTP parsing and no JSON. Every frame is a 4-byte big-endian length
+followed by a MessagePack map:
+
+    request:  {"id": 7, "text": "...", "session_id": ..., "reference": ..., "timezone": ...}
+    response: {"id": 7, "code": 200, "entities": [...], "datetime": {...}, "model_version": "..."}
+
+Requests take the same fields as POST /parse, and a response is the /parse
+JSON body plus "id" (echoed back) and "code" (the HTTP status /parse would
+have returned). A connection stays open for any number of requests, and a
+client may send several before reading any answer (pipelining). Requests on
+one connection run concurrently, so they can share a micro-batch, which means
+answers can come back out of order: match them up by "id".
+
+Usage (reference client):
+    python local_socket.py --socket /tmp/eventsniffer.sock "Lunch tomorrow at noon"
+    cat messages.txt | python local_socket.py --socket /tmp/eventsniffer.sock
+"""
+
+import argparse
+import itertools
+import json
+import os
+import select
+import socket
+import stat
+import struct
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+import msgpack
+
+HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+class FrameError(ValueError):
+    """The peer sent something that isn't a valid frame; the connection can't continue"""
+
+
+def encode_frame(message: Dict) -> bytes:
+    body = msgpack.packb(message)
+    return HEADER.pack(len(body)) + body
+
+
+def read_frame(reader, max_bytes: int = MAX_FRAME_BYTES) -> Optional[bytes]:
+    """The body of the next frame from a buffered reader, or None on a clean EOF"""
+    header = reader.read(HEADER.size)
+    if not header:
+        return None
+    if len(header) < HEADER.size:
+        raise FrameError("Connection closed inside a frame header")
+    (size,) = HEADER.unpack(header)
+    if size > max_bytes:
+        raise FrameError(f"Frame of {size} bytes is over the {max_bytes} byte limit")
+    body = reader.read(size)
+    if len(body) < size:
+        raise FrameError("Connection closed inside a frame")
+    return body
+
+
+def bind(path: str, backlog: int = 128) -> socket.socket:
+    """Listen on `path`, replacing a stale socket file; only this user can connect"""
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        listener.bind(path)
+    finally:
+        os.umask(old_umask)
+    listener.listen(backlog)
+    return listener
+
+
+class LocalSocketServer:
+    """
+    Accepts connections on a listening Unix socket (from bind(), possibly
+    inherited across a fork) and calls `handler(request)` for every frame on
+    a pool of `threads` threads. Each connection has at most `max_in_flight`
+    requests running; past that the server stops reading from it, so a client
+    that pipelines too far ahead is held back by the socket buffers.
+    """
+
+    def __init__(self, listener: socket.socket, handler: Callable[[Dict], Dict],
+                 threads: int = 32, max_in_flight: int = 32, max_frame_bytes: int = MAX_FRAME_BYTES):
+        self.listener = listener
+        self.handler = handler
+        self.threads = threads
+        self.max_in_flight = max_in_flight
+        self.max_frame_bytes = max_frame_bytes
+
+        self._pool = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._connections = {}  # socket -> its reader thread
+        self.accepted = 0
+        self.frame_errors = 0
+
+    def start(self) -> threading.Thread:
+        """Serve on a background thread; call it in the process that will serve (after any fork)"""
+        self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="socket-request")
+        # Non-blocking, so a worker that loses the race for a connection to another worker moves on
+        self.listener.setblocking(False)
+        thread = threading.Thread(target=self._accept_loop, name="socket-accept", daemon=True)
+        thread.start()
+        return thread
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self.listener], [], [], 0.5)
+            if not ready:
+                continue
+            try:
+                conn, _ = self.listener.accept()
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                if self._stop.is_set():
+                    return
+                raise
+            conn.setblocking(True)
+            reader = threading.Thread(target=self._serve_connection, args=(conn,),
+                                      name="socket-connection", daemon=True)
+            with self._lock:
+                self._connections[conn] = reader
+                self.accepted += 1
+            reader.start()
+
+    def _serve_connection(self, conn: socket.socket):
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        write_lock = threading.Lock()
+        reader = conn.makefile("rb")
+        try:
+            while not self._stop.is_set():
+                try:
+                    body = read_frame(reader, self.max_frame_bytes)
+                except FrameError as e:
+                    with self._lock:
+                        self.frame_errors += 1
+                    self._send(conn, write_lock, {"id": None, "code": 400, "error": str(e)})
+                    return
+                except OSError:
+                    return
+                if body is None:
+                    return
+                slots.acquire()
+                self._pool.submit(self._handle, conn, write_lock, slots, body)
+        finally:
+            # Answer everything already read before closing
+            for _ in range(self.max_in_flight):
+                slots.acquire()
+            reader.close()
+            with self._lock:
+                self._connections.pop(conn, None)
+            conn.close()
+
+    def _handle(self, conn, write_lock, slots, body):
+        try:
+            try:
+                request = msgpack.unpackb(body)
+            except Exception:
+                request = None
+            if not isinstance(request, dict):
+                response = {"id": None, "code": 400, "error": "Frame is not a MessagePack map"}
+            else:
+                try:
+                    response = self.handler(request)
+                except Exception as e:
+                    response = {"code": 500, "error": f"{type(e).__name__}: {e}"}
+                response["id"] = request.get("id")
+            self._send(conn, write_lock, response)
+        finally:
+            slots.release()
+
+    @staticmethod
+    def _send(conn, write_lock, response):
+        frame = encode_frame(response)
+        with write_lock:
+            try:
+                conn.sendall(frame)
+            except OSError:
+                pass  # the client went away; nothing to answer
+
+    def close(self, timeout: float = 30.0):
+        """Stop accepting, stop reading, answer requests already read, then close every connection"""
+        self._stop.set()
+        with self._lock:
+            connections = list(self._connections.items())
+        for conn, _ in connections:
+            try:
+                conn.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass
+        for _, reader in connections:
+            reader.join(timeout)
+        if self._pool:
+            self._pool.shutdown(wait=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"connections": len(self._connections), "accepted": self.accepted,
+                    "frame_errors": self.frame_errors}
+
+
+class LocalClient:
+    """
+    Reference client: one persistent connection, used from one thread at a
+    time. Responses are dicts with the /parse body plus "id" and "code".
+    """
+
+    def __init__(self, path: str, timeout: Optional[float] = 60.0):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self.reader = self.sock.makefile("rb")
+        self._ids = itertools.count(1)
+
+    def send(self, messages: Iterable[Dict]) -> List[int]:
+        """Send requests without waiting for answers; returns the ids given to them"""
+        ids, frames = [], []
+        for message in messages:
+            message = dict(message, id=next(self._ids))
+            ids.append(message["id"])
+            frames.append(encode_frame(message))
+        self.sock.sendall(b"".join(frames))
+        return ids
+
+    def receive(self) -> Dict:
+        body = read_frame(self.reader)
+        if body is None:
+            raise ConnectionError("Server closed the connection")
+        return msgpack.unpackb(body)
+
+    def parse(self, text: str, **fields) -> Dict:
+        return self.parse_many([text], **fields)[0]
+
+    def parse_many(self, texts: List[str], **fields) -> List[Dict]:
+        """Pipeline one request per text; answers come back in input order"""
+        ids = self.send(dict(fields, text=text) for text in texts)
+        answers = {}
+        while len(answers) < len(ids):
+            response = self.receive()
+            if response.get("id") is None:
+                raise ConnectionError(response.get("error", "Server rejected a frame"))
+            answers[response["id"]] = response
+        return [answers[i] for i in ids]
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Parse texts over the EventSniffer Unix socket")
+    arg_parser.add_argument("texts", nargs="*", help="Texts to parse (default: one per line on stdin)")
+    arg_parser.add_argument("--socket", default=os.environ.get("EVENTSNIFFER_SOCKET", "/tmp/eventsniffer.sock"))
+    arg_parser.add_argument("--session-id", default=None)
+    args = arg_parser.parse_args()
+
+    texts = args.texts or [line.rstrip("\n") for line in sys.stdin if line.strip()]
+    fields = {"session_id": args.session_id} if args.session_id else {}
+    with LocalClient(args.socket) as client:
+        for response in client.parse_many(texts, **fields):
+            print(json.dumps(response, ensure_ascii=False))
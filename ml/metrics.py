@@ -0,0 +1,336 @@
+"""
+Lightweight Prometheus metrics
+Counters, histograms and callback gauges rendered in the Prometheus text
+exposition format. Recording is a dict lookup plus a bisect under one lock,
+cheap enough to leave on in every request. With several processes (serve.py),
+MetricsDir merges what each of them records into one exposition.
+"""
+
+import bisect
+import fcntl
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; spans a regex stage on a chat message up to NER on a huge window dump
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Characters; chat message, paragraph, email, long thread, whole channel
+LENGTH_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_label_str(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            series = [[list(key), value] for key, value in self._values.items()]
+        return {"kind": self.kind, "help": self.help, "labelnames": list(self.labelnames), "series": series}
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {cumulative}")
+        return lines
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            series = [[list(key), list(counts), total] for key, (counts, total) in self._series.items()]
+        return {"kind": self.kind, "help": self.help, "labelnames": list(self.labelnames),
+                "buckets": list(self.buckets), "series": series}
+
+
+class CallbackMetric(_Metric):
+    """Value read at scrape time, e.g. a cache size or a counter kept elsewhere"""
+
+    def __init__(self, name, help_text, fn: Callable[[], Optional[float]], kind: str = "gauge"):
+        super().__init__(name, help_text)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            value = None
+        if value is None:
+            return []
+        return self.header() + [f"{self.name} {_format_value(value)}"]
+
+    def snapshot(self) -> Dict:
+        try:
+            value = self.fn()
+        except Exception:
+            value = None
+        return {"kind": self.kind, "help": self.help, "callback": True, "value": value}
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Add a metric; registering the same name again returns the existing one"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(self, name, help_text, fn, kind="gauge") -> CallbackMetric:
+        return self.register(CallbackMetric(name, help_text, fn, kind))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Every metric's raw values (callbacks are read now), for MetricsDir"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+class MetricsDir:
+    """
+    Metrics of several processes, e.g. serve.py's master and its workers.
+    Each process writes its registry's snapshot to <path>/metrics-<pid>.json
+    (write()), and render() merges every file: counters and histograms are
+    summed, and callback gauges are reported once per process with a
+    "process" label. When a worker is gone, the master folds its counters
+    and histograms into metrics-archive.json (archive()), so totals never
+    go down across restarts.
+    """
+
+    ARCHIVE = "archive"
+
+    def __init__(self, path: str, registry: Registry = None):
+        self.path = path
+        self.registry = registry or REGISTRY
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, name) -> str:
+        return os.path.join(self.path, f"metrics-{name}.json")
+
+    @contextmanager
+    def _locked(self, mode: int):
+        # Readers and archive() can't interleave, or a scrape could count a
+        # worker twice (or not at all) while it moves into the archive
+        with open(os.path.join(self.path, ".lock"), "a") as lock:
+            fcntl.flock(lock, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def write(self):
+        """Write this process's snapshot (atomically, so readers never see half a file)"""
+        target = self._file(os.getpid())
+        tmp = f"{target}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.registry.snapshot(), f)
+        os.replace(tmp, target)
+
+    def clear(self):
+        """Drop every file, e.g. left over from an earlier run"""
+        for path in glob.glob(os.path.join(self.path, "metrics-*.json")):
+            os.unlink(path)
+
+    @staticmethod
+    def _read(path) -> Optional[Dict]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def archive(self, pid: int):
+        """Fold an exited process's counters and histograms into the archive"""
+        with self._locked(fcntl.LOCK_EX):
+            snapshot = self._read(self._file(pid))
+            if snapshot is None:
+                return
+            archive = self._read(self._file(self.ARCHIVE)) or {}
+            merged = _merge([archive, snapshot])
+            tmp = self._file(self.ARCHIVE) + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(merged, f)
+            os.replace(tmp, self._file(self.ARCHIVE))
+            os.unlink(self._file(pid))
+
+    def render(self) -> str:
+        with self._locked(fcntl.LOCK_SH):
+            snapshots = {}
+            for path in sorted(glob.glob(os.path.join(self.path, "metrics-*.json"))):
+                snapshot = self._read(path)
+                if snapshot is not None:
+                    snapshots[os.path.basename(path)[len("metrics-"):-len(".json")]] = snapshot
+        archive = snapshots.pop(self.ARCHIVE, {})
+        return _render_merged(archive, snapshots)
+
+
+def _merge(snapshots: List[Dict]) -> Dict[str, Dict]:
+    """Sum counters and histograms (callback counters too) over snapshots; gauges are left out"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            if metric.get("callback"):
+                if metric["kind"] != "counter" or metric["value"] is None:
+                    continue
+                total = merged.setdefault(name, dict(metric, value=0))
+                total["value"] += metric["value"]
+                continue
+            total = merged.setdefault(name, dict(metric, series=[]))
+            index = {tuple(series[0]): series for series in total["series"]}
+            for series in metric["series"]:
+                key = tuple(series[0])
+                if key not in index:
+                    index[key] = [list(key)] + [list(v) if isinstance(v, list) else v for v in series[1:]]
+                    total["series"].append(index[key])
+                elif metric["kind"] == "histogram":
+                    index[key][1] = [a + b for a, b in zip(index[key][1], series[1])]
+                    index[key][2] += series[2]
+                else:
+                    index[key][1] += series[1]
+    return merged
+
+
+def _render_merged(archive: Dict, processes: Dict[str, Dict]) -> str:
+    totals = _merge([archive] + list(processes.values()))
+    names = list(totals)
+    for snapshot in processes.values():
+        names.extend(name for name in snapshot if name not in totals and name not in names)
+
+    lines = []
+    for name in names:
+        if name in totals and not totals[name].get("callback"):
+            metric = totals[name]
+            if metric["kind"] == "histogram":
+                rendered = Histogram(name, metric["help"], metric["labelnames"], metric["buckets"])
+                rendered._series = {tuple(key): [counts, total] for key, counts, total in metric["series"]}
+            else:
+                rendered = Counter(name, metric["help"], metric["labelnames"])
+                rendered._values = {tuple(key): value for key, value in metric["series"]}
+            lines.extend(rendered.render())
+        elif name in totals:
+            metric = totals[name]
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {_format_value(metric['value'])}")
+        else:
+            # A gauge: one value per live process
+            values = [(process, snapshot[name]) for process, snapshot in sorted(processes.items())
+                      if name in snapshot and snapshot[name]["value"] is not None]
+            if not values:
+                continue
+            lines.append(f"# HELP {name} {values[0][1]['help']}")
+            lines.append(f"# TYPE {name} {values[0][1]['kind']}")
+            lines.extend(f'{name}{{process="{_escape(process)}"}} {_format_value(metric["value"])}'
+                         for process, metric in values)
+    return "\n".join(lines) + "\n"
+
+
+# Shared by server.py and hybrid_parser.py so one /metrics shows both
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
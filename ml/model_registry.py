@@ -0,0 +1,149 @@
+"""
+Versioned model registry
+A models directory holds one trained pipeline per version:
+
+    models/
+        2025-01-06_0930/     <- any names; the newest in natural sort order wins
+        2025-01-13_1410/
+        v12/
+
+The registry lists the versions, picks the one to serve (the newest, unless a
+version is pinned), and ModelWatcher polls for changes: a new version landing
+in the directory, or a single model directory (EVENTSNIFFER_MODEL_DIR) being
+retrained in place. Copy a new version in under a name starting with "." or
+"_" and rename it when complete, so a half-written model is never picked up.
+"""
+
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from parse_cache import model_files_signature
+
+
+def natural_key(name: str):
+    """'v10' sorts after 'v9'"""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def is_model_dir(path: Path) -> bool:
+    return (path.is_dir() and not path.name.startswith((".", "_"))
+            and (path / "meta.json").exists() and (path / "config.cfg").exists())
+
+
+class ModelRegistry:
+    """
+    Either a versioned `root` directory, or one fixed `model_dir` that can be
+    retrained in place (its directory name is then the version).
+    """
+
+    def __init__(self, root: Optional[str] = None, model_dir: Optional[str] = None):
+        if (root is None) == (model_dir is None):
+            raise ValueError("Pass either a models root or a single model_dir")
+        self.root = Path(root) if root else None
+        self.model_dir = Path(model_dir) if model_dir else None
+        self.pinned = None
+
+    @property
+    def versioned(self) -> bool:
+        return self.root is not None
+
+    def versions(self) -> List[str]:
+        if not self.versioned:
+            return [self.model_dir.name] if is_model_dir(self.model_dir) else []
+        if not self.root.is_dir():
+            return []
+        return sorted((p.name for p in self.root.iterdir() if is_model_dir(p)), key=natural_key)
+
+    def path(self, version: str) -> Path:
+        if not self.versioned:
+            if version != self.model_dir.name:
+                raise KeyError(version)
+            return self.model_dir
+        path = self.root / version
+        if "/" in version or version.startswith((".", "_")) or not is_model_dir(path):
+            raise KeyError(version)
+        return path
+
+    def resolve(self, version: Optional[str] = None) -> Tuple[str, Path]:
+        """(version, path) for `version`, else the pinned one, else the newest; KeyError if none"""
+        version = version or self.pinned
+        if version is None:
+            versions = self.versions()
+            if not versions:
+                raise KeyError(f"No model found in {self.root or self.model_dir}")
+            version = versions[-1]
+        return version, self.path(version)
+
+    def describe(self) -> List[Dict]:
+        rows = []
+        for version in self.versions():
+            path = self.path(version)
+            meta = json.loads((path / "meta.json").read_text())
+            rows.append({
+                "version": version,
+                "path": str(path),
+                "name": meta.get("name"),
+                "meta_version": meta.get("version"),
+                "modified": (path / "meta.json").stat().st_mtime,
+            })
+        return rows
+
+
+class ModelWatcher:
+    """
+    Polls the registry every `interval` seconds and calls `on_change(version)`
+    when the version to serve, or the files of the one being served, differ
+    from `current()` (a (version, signature) pair). A change has to look the
+    same on two polls in a row, so a model that is still being copied or
+    saved isn't loaded half-written. If on_change returns False (the load
+    failed), that exact state isn't retried until the files change again.
+    """
+
+    def __init__(self, registry: ModelRegistry, current: Callable[[], Tuple[str, str]],
+                 on_change: Callable[[str], bool], interval: float = 5.0):
+        self.registry = registry
+        self.current = current
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._candidate = None
+        self._failed = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self) -> Optional[str]:
+        """One poll; returns the version handed to on_change, if any"""
+        try:
+            version, path = self.registry.resolve()
+            seen = (version, model_files_signature(str(path)))
+        except (KeyError, OSError):
+            self._candidate = None
+            return None
+
+        if seen == self.current() or seen == self._failed:
+            self._candidate = None
+            return None
+        if seen != self._candidate:
+            self._candidate = seen  # wait one more poll for it to settle
+            return None
+        self._candidate = None
+        if not self.on_change(version):
+            self._failed = seen
+            return None
+        return version
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️  Model watcher: {e}")
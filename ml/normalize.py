@@ -0,0 +1,403 @@
+"""
+DATE/TIME normalization
+Resolves the DATE and TIME strings the model finds ("tmrw", "next fri",
+"12/5", "2-4pm", "at 3", "noon") into ISO start/end datetimes relative to a
+reference time and timezone. Phrases are canonicalized first ("Tmrw" and
+"tomorrow" are the same phrase) and each resolution is kept in an LRU keyed
+by (phrase, reference day), so a repeated phrase costs one dict lookup.
+
+Conventions:
+* A weekday on its own is the next one on or after the reference day;
+  "next <weekday>" is that weekday in the following (Monday-start) week.
+* m/d dates are US order. Without a year, a date that has already passed
+  this year means next year. A two-digit year is the one within 50 years of
+  the reference year ("12/5/99" is 1999, "12/5/30" is 2030).
+* Hours without am/pm: 1-6 are afternoon, 7-11 morning, 12 noon, unless the
+  DATE or TIME names a part of the day: "tonight at 8" and "this evening at 9"
+  are pm, "morning at 6" is am.
+* No time means an all-day event; a single time lasts DEFAULT_DURATION.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, tzinfo
+from typing import Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_DURATION = timedelta(hours=1)
+
+# Chat spellings -> canonical words
+ALIASES = {
+    "tmrw": "tomorrow", "tmr": "tomorrow", "tmw": "tomorrow", "tomorow": "tomorrow", "2morrow": "tomorrow",
+    "tn": "tonight", "tonite": "tonight", "2nite": "tonight",
+    "mon": "monday", "tue": "tuesday", "tues": "tuesday", "wed": "wednesday", "thu": "thursday",
+    "thur": "thursday", "thurs": "thursday", "fri": "friday", "sat": "saturday", "sun": "sunday",
+    "jan": "january", "feb": "february", "mar": "march", "apr": "april", "jun": "june",
+    "jul": "july", "aug": "august", "sep": "september", "sept": "september", "oct": "october",
+    "nov": "november", "dec": "december",
+    "eod": "end of day", "mins": "minutes", "min": "minutes", "hrs": "hours", "hr": "hours",
+}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august",
+          "september", "october", "november", "december"]
+
+# Named parts of the day, as (start, end) minutes after midnight
+DAY_PARTS = {
+    "morning": (9 * 60, 12 * 60),
+    "afternoon": (12 * 60, 17 * 60),
+    "evening": (17 * 60, 21 * 60),
+    "night": (19 * 60, 23 * 60),
+}
+NAMED_TIMES = {"noon": 12 * 60, "midnight": 24 * 60, "end of day": 17 * 60}
+
+# "this evening at 9", "9 tonight", "8 at night": the day part, then the clock
+DAY_PART_WORDS = "tonight|morning|afternoon|evening|night"
+LEADING_DAY_PART_RE = re.compile(rf"^(?:this\s+|in\s+the\s+)?({DAY_PART_WORDS})\s+(?:at\s+|@\s+|around\s+)?(.+)$")
+TRAILING_DAY_PART_RE = re.compile(rf"^(.+?)\s+(?:this\s+|in\s+the\s+|at\s+)?({DAY_PART_WORDS})$")
+
+_CLOCK = r"(\d{1,2})(?::(\d{2}))?\s*(am|pm)?|noon|midnight"
+CLOCK_RE = re.compile(rf"^(?:{_CLOCK})$")
+RANGE_RE = re.compile(rf"^(?:from\s+|between\s+)?({_CLOCK})\s*(?:-|to|and|until|till)\s*({_CLOCK})$")
+OFFSET_RE = re.compile(r"^in\s+(\d+)\s+(minutes|hours)$")
+SLASH_DATE_RE = re.compile(r"^(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?$")
+MONTH_DAY_RE = re.compile(rf"^({'|'.join(MONTHS)})\s+(\d{{1,2}})(?:\s+(\d{{4}}))?$")
+DAY_MONTH_RE = re.compile(rf"^(\d{{1,2}})\s+({'|'.join(MONTHS)})(?:\s+(\d{{4}}))?$")
+
+# Resolved forms. Dates: (first day, day after the last) as ordinals.
+# Times: ("clock", start_minute, end_minute or None) or ("offset", minutes, None).
+DateRange = Tuple[int, int]
+TimeForm = Tuple[str, int, Optional[int]]
+
+
+def canonical(phrase: str) -> str:
+    """Lowercase, unify chat spellings and drop filler words, so equivalent phrases share a cache entry"""
+    text = phrase.lower().replace("a.m.", "am").replace("p.m.", "pm")
+    text = re.sub(r"[,.?!]", " ", text)
+    text = re.sub(r"(\d)(st|nd|rd|th)\b", r"\1", text)
+    text = re.sub(r"\b(\d{1,2}(?::\d{2})?)\s*([ap])m?\b", r"\1\2m", text)  # "3 p" / "3p" / "3 pm" -> "3pm"
+    text = re.sub(r"\s*-\s*", "-", text).replace("-", " - ")
+    words = [ALIASES.get(word, word) for word in text.replace("@", " @ ").split()]
+    while words and words[0] in ("on", "at", "@", "around", "by", "for", "the"):
+        words = words[1:]
+    return " ".join(words)
+
+
+def _next_weekday(day: date, weekday: int) -> date:
+    return day + timedelta(days=(weekday - day.weekday()) % 7)
+
+
+def _monday(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def _month_start(year: int, month: int) -> date:
+    return date(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def _calendar_date(day: date, month: int, dom: int, year: Optional[str]) -> Optional[date]:
+    if year is not None:
+        year = int(year)
+        if year < 100:
+            # Closest to the reference year: within 50 years either way
+            year += day.year - day.year % 100
+            if year > day.year + 49:
+                year -= 100
+            elif year < day.year - 50:
+                year += 100
+        candidates = [year]
+    else:
+        # The next time the day comes round: this year or next, or for Feb 29
+        # the next leap year (at most 8 years away)
+        candidates = range(day.year, day.year + (9 if (month, dom) == (2, 29) else 2))
+    for y in candidates:
+        try:
+            resolved = date(y, month, dom)
+        except ValueError:
+            if year is None and (month, dom) == (2, 29):
+                continue
+            return None
+        if year is not None or resolved >= day:
+            return resolved
+    return None
+
+
+def split_day_part(phrase: str) -> Tuple[str, Optional[str]]:
+    """
+    'tomorrow night' -> ('tomorrow', 'night'), 'this evening at 9' -> ('9', 'evening'),
+    'tonight' -> ('tonight', 'night'); phrases without a day part come back unchanged with None
+    """
+    if phrase == "tonight":
+        return phrase, "night"
+    if phrase in ("this morning", "this afternoon", "this evening"):
+        return "today", phrase.split()[1]
+    for regex, part_group, rest_group in ((LEADING_DAY_PART_RE, 1, 2), (TRAILING_DAY_PART_RE, 2, 1)):
+        match = regex.match(phrase)
+        if match:
+            part = match.group(part_group)
+            return match.group(rest_group), "night" if part == "tonight" else part
+    return phrase, None
+
+
+def resolve_date(phrase: str, day: date) -> Optional[DateRange]:
+    """Canonical DATE phrase -> (first day, day after the last) relative to `day`, or None"""
+    one_day = None
+    phrase, _ = split_day_part(phrase)
+    words = phrase.split()
+
+    if phrase in ("today", "tonight"):
+        one_day = day
+    elif phrase == "tomorrow":
+        one_day = day + timedelta(days=1)
+    elif phrase == "yesterday":
+        one_day = day - timedelta(days=1)
+    elif phrase in ("day after tomorrow", "the day after tomorrow"):
+        one_day = day + timedelta(days=2)
+    elif phrase in WEEKDAYS or (len(words) == 2 and words[0] == "this" and words[1] in WEEKDAYS):
+        one_day = _next_weekday(day, WEEKDAYS.index(words[-1]))
+    elif len(words) == 2 and words[0] == "next" and words[1] in WEEKDAYS:
+        one_day = _monday(day) + timedelta(days=7 + WEEKDAYS.index(words[1]))
+    elif len(words) == 2 and words[0] in ("this", "next"):
+        ahead = words[0] == "next"
+        if words[1] == "week":
+            start = _monday(day) + timedelta(days=7) if ahead else day
+            return start.toordinal(), (_monday(start) + timedelta(days=7)).toordinal()
+        if words[1] == "weekend":
+            saturday = _next_weekday(day, 5) if day.weekday() < 5 else _monday(day) + timedelta(days=5)
+            if ahead:
+                saturday += timedelta(days=7)
+            start = max(saturday, day)
+            return start.toordinal(), (saturday + timedelta(days=2)).toordinal()
+        if words[1] == "month":
+            start = _month_start(day.year, day.month + 1) if ahead else day
+            return start.toordinal(), _month_start(start.year, start.month + 1).toordinal()
+        if words[1] == "year":
+            start = date(day.year + 1, 1, 1) if ahead else day
+            return start.toordinal(), date(start.year + 1, 1, 1).toordinal()
+    elif match := SLASH_DATE_RE.match(phrase):
+        one_day = _calendar_date(day, int(match.group(1)), int(match.group(2)), match.group(3))
+    elif match := MONTH_DAY_RE.match(phrase):
+        one_day = _calendar_date(day, MONTHS.index(match.group(1)) + 1, int(match.group(2)), match.group(3))
+    elif match := DAY_MONTH_RE.match(phrase):
+        one_day = _calendar_date(day, MONTHS.index(match.group(2)) + 1, int(match.group(1)), match.group(3))
+
+    if one_day is None:
+        return None
+    return one_day.toordinal(), one_day.toordinal() + 1
+
+
+def _clock_minutes(clock: str, suffix: Optional[str] = None, day_part: Optional[str] = None) -> Optional[int]:
+    """
+    '3:30pm' -> 930 minutes after midnight; `suffix` is the am/pm to assume if
+    none is given, `day_part` the part of the day the phrase or its date named
+    """
+    if clock in NAMED_TIMES:
+        return NAMED_TIMES[clock]
+    match = CLOCK_RE.match(clock)
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if hour > 23 or minute > 59:
+        return None
+    meridiem = match.group(3) or suffix
+    if meridiem and not 1 <= hour <= 12:
+        return None
+    if meridiem == "am":
+        hour %= 12
+    elif meridiem == "pm":
+        hour = hour % 12 + 12
+    elif day_part in ("afternoon", "evening", "night") and 1 <= hour <= 11:
+        hour += 12  # "tonight at 8"
+    elif day_part == "morning":
+        pass
+    elif 1 <= hour <= 6:
+        hour += 12  # "at 3" in chat means the afternoon
+    return hour * 60 + minute
+
+
+def resolve_time(phrase: str, day_part: Optional[str] = None) -> Optional[TimeForm]:
+    """
+    Canonical TIME phrase -> ("clock", start, end) minutes or ("offset",
+    minutes, None), or None. `day_part` comes from the DATE ("tonight"), if any;
+    one named in the phrase itself takes precedence.
+    """
+    if phrase in DAY_PARTS:
+        return ("clock",) + DAY_PARTS[phrase]
+    phrase, own_part = split_day_part(phrase)
+    day_part = own_part or day_part
+    if phrase == "tonight":
+        return ("clock",) + DAY_PARTS["night"]
+
+    match = OFFSET_RE.match(phrase)
+    if match:
+        minutes = int(match.group(1)) * (60 if match.group(2) == "hours" else 1)
+        return "offset", minutes, None
+
+    match = RANGE_RE.match(phrase)
+    if match:
+        start_text, end_text = match.group(1), match.group(5)
+        end = _clock_minutes(end_text, day_part=day_part)
+        if end is None:
+            return None
+        # "2-4pm": the start borrows the end's am/pm unless that would put it after the end
+        end_suffix = re.search(r"(am|pm)$", end_text)
+        start = None
+        if end_suffix and not re.search(r"(am|pm)$", start_text):
+            start = _clock_minutes(start_text, end_suffix.group(1))
+            if start is not None and start > end:
+                start = _clock_minutes(start_text, "am")
+        if start is None:
+            start = _clock_minutes(start_text, day_part=day_part)
+        if start is None:
+            return None
+        return "clock", start, end
+
+    single = _clock_minutes(phrase, day_part=day_part)
+    if single is None:
+        return None
+    return "clock", single, None
+
+
+def date_time_texts(entities: List[Dict]) -> Tuple[Optional[str], Optional[str]]:
+    """The first DATE and first TIME text in an entity list"""
+    date_text = next((e["text"] for e in entities if e["label"] == "DATE"), None)
+    time_text = next((e["text"] for e in entities if e["label"] == "TIME"), None)
+    return date_text, time_text
+
+
+class DateTimeNormalizer:
+    """
+    Thread-safe memoizing resolver. Entries are keyed by (kind, canonical
+    phrase, reference day, the DATE's day part for times) and evicted least-recently-used after
+    `max_entries`; 0 disables the cache.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.unresolved = 0
+
+    def _lookup(self, kind: str, phrase: str, day: date, day_part: Optional[str] = None):
+        key = (kind, phrase, day.toordinal(), day_part)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = resolve_date(phrase, day) if kind == "date" else resolve_time(phrase, day_part)
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def resolve(self, date_text: Optional[str], time_text: Optional[str],
+                reference: datetime) -> Optional[Dict]:
+        """
+        {"start", "end" (ISO 8601 with offset), "all_day"} for a DATE and/or
+        TIME string, relative to the timezone-aware `reference`. None when
+        neither is given or either one can't be resolved.
+        """
+        if not date_text and not time_text:
+            return None
+        day = reference.date()
+
+        date_phrase = canonical(date_text) if date_text else None
+        days = self._lookup("date", date_phrase, day) if date_text else None
+        # "tonight" + "at 8": the DATE's part of the day decides am/pm
+        day_part = split_day_part(date_phrase)[1] if date_text else None
+        when = self._lookup("time", canonical(time_text), day, day_part) if time_text else None
+        if (date_text and days is None) or (time_text and when is None):
+            with self._lock:
+                self.unresolved += 1
+            return None
+
+        try:
+            return self._span(days or (day.toordinal(), day.toordinal() + 1), when, reference)
+        except (OverflowError, ValueError):
+            # Past the last day a datetime can hold ("12/31/9999")
+            with self._lock:
+                self.unresolved += 1
+            return None
+
+    @staticmethod
+    def _span(days: DateRange, when: Optional[TimeForm], reference: datetime) -> Dict:
+        first, last = days
+        tz = reference.tzinfo
+        midnight = datetime.combine(date.fromordinal(first), datetime.min.time(), tzinfo=tz)
+        if when is None:
+            end = datetime.combine(date.fromordinal(last), datetime.min.time(), tzinfo=tz)
+            return {"start": midnight.isoformat(), "end": end.isoformat(), "all_day": True}
+
+        kind, start_minute, end_minute = when
+        if kind == "offset":
+            start = reference.replace(second=0, microsecond=0) + timedelta(minutes=start_minute)
+            end = start + DEFAULT_DURATION
+        else:
+            start = midnight + timedelta(minutes=start_minute)
+            end = start + DEFAULT_DURATION if end_minute is None else midnight + timedelta(minutes=end_minute)
+            if end <= start:
+                end += timedelta(days=1)  # "11pm-1am"
+        return {"start": start.isoformat(), "end": end.isoformat(), "all_day": False}
+
+    def resolve_many(self, pairs: Sequence[Tuple[Optional[str], Optional[str]]],
+                     reference: datetime) -> List[Optional[Dict]]:
+        """resolve() for several (date, time) pairs against one reference"""
+        return [self.resolve(date_text, time_text, reference) for date_text, time_text in pairs]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "unresolved": self.unresolved,
+            }
+
+
+def reference_time(reference: Optional[str] = None, timezone: Optional[str] = None) -> datetime:
+    """
+    Timezone-aware reference time from request fields: an ISO 8601 datetime
+    (default now) and an IANA timezone name (default the reference's own
+    offset, else the server's local zone). Raises ValueError on bad input.
+    """
+    tz: Optional[tzinfo] = None
+    if timezone:
+        try:
+            tz = ZoneInfo(timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone '{timezone}'")
+
+    if reference:
+        moment = datetime.fromisoformat(reference)
+        if moment.tzinfo is None:
+            return moment.replace(tzinfo=tz) if tz else moment.astimezone()
+        return moment.astimezone(tz) if tz else moment
+    return datetime.now(tz) if tz else datetime.now().astimezone()
+
+
+if __name__ == "__main__":
+    import sys
+
+    normalizer = DateTimeNormalizer()
+    now = reference_time()
+    print(f"🔍 Reference: {now.isoformat()}")
+    for date_text, time_text in [("tomorrow", "2:30pm"), ("tmrw", "2-4pm"), ("next fri", "at 3"),
+                                 ("12/5", None), ("Dec 5th", "noon"), (None, "in 30 mins"),
+                                 ("this weekend", None), ("wed", "10am-12pm")] + \
+                                [tuple(arg.split("|", 1)) for arg in sys.argv[1:]]:
+        print(f"   {str(date_text):>14} | {str(time_text):<12} -> {normalizer.resolve(date_text, time_text, now)}")
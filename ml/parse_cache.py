@@ -0,0 +1,324 @@
+"""
+Content-addressed parse result cache
+Bounded LRU with a TTL, keyed by a hash of (model version, pipeline config, text).
+DiskParseCache is the same idea in a SQLite file (WAL mode), so results survive
+restarts and are shared by every worker process on the box.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+def model_files_signature(model_path: str) -> str:
+    """
+    (relative path, size, mtime) of every file in a model directory, so a
+    retrain saved over the same directory changes the fingerprint even when
+    meta.json and the config don't
+    """
+    root = Path(model_path)
+    if not root.is_dir():
+        return ""
+    entries = []
+    for file in sorted(root.rglob("*")):
+        if file.is_file():
+            stat = file.stat()
+            entries.append(f"{file.relative_to(root)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256("\n".join(entries).encode("utf-8")).hexdigest()
+
+
+def model_fingerprint(nlp, model_path: str = "", extra: str = "") -> str:
+    """
+    Identify a loaded pipeline: model name/version, its pipes and config,
+    where it was loaded from and the state of its files, plus anything else
+    that changes the output (e.g. the hybrid parser's rule patterns)
+    """
+    meta = nlp.meta
+    parts = [
+        str(model_path),
+        model_files_signature(model_path) if model_path else "",
+        meta.get("name", ""),
+        meta.get("version", ""),
+        ",".join(nlp.pipe_names),
+        nlp.config.to_str(),
+        extra,
+    ]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def _text_key(fingerprint: str, text: str, variant: str) -> str:
+    digest = hashlib.sha256(fingerprint.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(variant.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    Thread-safe LRU cache with a time-to-live.
+
+    Keys are sha256 digests of (fingerprint, text), so the cache never holds
+    on to the raw window text as a key. Entries older than `ttl` seconds are
+    treated as misses; once `max_entries` is reached the least recently used
+    entry is evicted.
+    """
+
+    def __init__(self, fingerprint: str, max_entries: int = 1024, ttl: float = 300.0):
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, text: str, variant: str = "") -> str:
+        """`variant` separates results of different parse modes for the same text"""
+        return _text_key(self.fingerprint, text, variant)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if self.ttl and now - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class DiskParseCache:
+    """
+    Persistent parse cache in a SQLite file, for results that are worth
+    keeping across restarts and sharing between worker processes.
+
+    Keys match ParseCache.key(), so one key can be looked up in memory first
+    and on disk second. Values must be JSON-serializable. WAL mode lets any
+    number of processes read while one writes. Each process (and thread) opens
+    its own connection, so a cache created before serve.py forks stays usable
+    in the workers.
+
+    Size is bounded by `max_bytes` of stored values: once over, the least
+    recently used entries are deleted down to 90% of the budget. Access times
+    are only rewritten when older than `touch_interval` seconds, so hot keys
+    don't turn every read into a write.
+
+    Entries are grouped by `namespace` (e.g. the model directory). When a
+    namespace is opened with a new fingerprint (the model was retrained or
+    replaced), its old entries are dropped.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path: str, fingerprint: str, namespace: str = "", max_bytes: int = 256 * 1024 * 1024,
+                 ttl: float = 0.0, touch_interval: float = 60.0):
+        self.path = str(path)
+        self.fingerprint = fingerprint
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._puts_since_check = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+        self.invalidated = self._open_namespace()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # a crash may lose the last writes, never corrupt
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_fingerprint ON entries (fingerprint)")
+            conn.execute("CREATE TABLE IF NOT EXISTS namespaces (name TEXT PRIMARY KEY, fingerprint TEXT NOT NULL)")
+            conn.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _open_namespace(self) -> int:
+        """Drop entries left by an older fingerprint of this namespace; returns how many"""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT fingerprint FROM namespaces WHERE name = ?", (self.namespace,)).fetchone()
+            if row and row[0] == self.fingerprint:
+                return 0
+            dropped = 0
+            if row:
+                dropped = conn.execute("DELETE FROM entries WHERE fingerprint = ?", (row[0],)).rowcount
+            conn.execute("INSERT OR REPLACE INTO namespaces (name, fingerprint) VALUES (?, ?)",
+                         (self.namespace, self.fingerprint))
+        if dropped:
+            print(f"🧹 Disk cache: model changed, dropped {dropped} old entries")
+        return dropped
+
+    def key(self, text: str, variant: str = "") -> str:
+        return _text_key(self.fingerprint, text, variant)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute("SELECT value, stored_at, accessed_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                with self._stats_lock:
+                    self.expirations += 1
+                row = None
+            if row is not None and now - row[2] > self.touch_interval:
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            # A busy or broken cache file must never fail a request
+            row = None
+            with self._stats_lock:
+                self.errors += 1
+
+        with self._stats_lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any):
+        blob = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        now = time.time()
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO entries (key, fingerprint, value, size, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self.fingerprint, blob, len(blob), now, now),
+            )
+        except sqlite3.Error:
+            with self._stats_lock:
+                self.errors += 1
+            return
+
+        # Summing the sizes is a table scan, so only check every so often
+        with self._stats_lock:
+            self._puts_since_check += 1
+            check = self._puts_since_check >= 64
+            if check:
+                self._puts_since_check = 0
+        if check:
+            self.enforce_size()
+
+    def enforce_size(self) -> int:
+        """Evict least recently used entries until under 90% of max_bytes; returns how many"""
+        conn = self._conn()
+        evicted = 0
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total <= self.max_bytes:
+                    return 0
+                target = total - int(self.max_bytes * 0.9)
+                freed = 0
+                victims = []
+                for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                    victims.append((key,))
+                    freed += size
+                    if freed >= target:
+                        break
+                conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+                evicted = len(victims)
+        except sqlite3.Error:
+            with self._stats_lock:
+                self.errors += 1
+            return 0
+        with self._stats_lock:
+            self.evictions += evicted
+        return evicted
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entries WHERE fingerprint = ?", (self.fingerprint,))
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            entries, size = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        except sqlite3.Error:
+            entries, size = None, None
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidated": self.invalidated,
+                "errors": self.errors,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
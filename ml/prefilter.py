@@ -0,0 +1,125 @@
+"""
+Lexical pre-filter gate
+One combined, precompiled regex over date/time vocabulary and event keywords.
+Text with no match can't describe an event, so it skips NER entirely.
+
+Run directly to measure the false-negative rate:
+    python prefilter.py
+"""
+
+import re
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+from hybrid_parser import DATE_PATTERNS, TIME_PATTERNS
+
+# Function words that show up inside EVENT annotations ("Drinks after work",
+# "1:1 with Sarah") but carry no schedule signal on their own. spaCy's
+# STOP_WORDS is too broad here: it contains "call" and "due".
+FILLER_WORDS = {"the", "and", "for", "with", "all", "after", "off", "get", "together", "our", "your"}
+
+
+def mine_event_keywords(simple_data: Iterable[Tuple[str, List[Tuple[str, str]]]]) -> List[str]:
+    """Collect the content words of every EVENT annotation in a SIMPLE_DATA list"""
+    keywords = set()
+    for _, entities in simple_data:
+        for ent_text, label in entities:
+            if label != "EVENT":
+                continue
+            for word in ent_text.lower().split():
+                word = word.strip(".,!?'\"()")
+                if len(word) >= 3 and word not in FILLER_WORDS:
+                    keywords.add(word)
+    return sorted(keywords)
+
+
+def build_trigger_regex(keywords: Iterable[str]):
+    """Date/time patterns plus the keyword list, as one alternation"""
+    alternatives = [pattern for pattern, _ in DATE_PATTERNS + TIME_PATTERNS]
+    # Longest first so e.g. "check-in" wins over "check"
+    words = sorted(set(keywords), key=len, reverse=True)
+    if words:
+        alternatives.append(r"\b(?:" + "|".join(re.escape(w) for w in words) + r")\b")
+    return re.compile("|".join(f"(?:{alt})" for alt in alternatives), re.IGNORECASE)
+
+
+def default_keywords() -> List[str]:
+    from training_data_v2 import SIMPLE_DATA
+    return mine_event_keywords(SIMPLE_DATA)
+
+
+class PreFilter:
+    """
+    Single-pass trigger scan. `should_parse(text)` is False only when no
+    date, time or event keyword appears anywhere in the text.
+    """
+
+    def __init__(self, keywords: Iterable[str] = None):
+        self.keywords = list(keywords) if keywords is not None else default_keywords()
+        self.regex = build_trigger_regex(self.keywords)
+
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0
+
+    def should_parse(self, text: str) -> bool:
+        hit = self.regex.search(text) is not None
+        with self._lock:
+            self.checked += 1
+            if not hit:
+                self.skipped += 1
+        return hit
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "skipped": self.skipped,
+                "skip_rate": (self.skipped / self.checked) if self.checked else 0.0,
+            }
+
+
+def measure(gate: PreFilter, corpora: Dict[str, List[Tuple[str, bool]]]) -> Dict[str, Dict]:
+    """
+    For each corpus of (text, has_entities) pairs, count positives the gate
+    would wrongly skip (false negatives) and negatives it correctly skips
+    """
+    report = {}
+    for name, examples in corpora.items():
+        positives = [text for text, has_entities in examples if has_entities]
+        negatives = [text for text, has_entities in examples if not has_entities]
+        missed = [text for text in positives if not gate.regex.search(text)]
+        skipped = [text for text in negatives if not gate.regex.search(text)]
+        report[name] = {
+            "positives": len(positives),
+            "false_negatives": len(missed),
+            "false_negative_rate": (len(missed) / len(positives)) if positives else 0.0,
+            "negatives": len(negatives),
+            "negatives_skipped": len(skipped),
+            "missed_examples": missed,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import training_data
+    import training_data_v2
+    from validate_model import VALIDATION_SUITE
+
+    gate = PreFilter()
+    corpora = {
+        "validate_model.VALIDATION_SUITE": [(text, bool(expected)) for text, expected in VALIDATION_SUITE],
+        "training_data_v2.SIMPLE_DATA": [(text, bool(ents)) for text, ents in training_data_v2.SIMPLE_DATA],
+        "training_data.SIMPLE_DATA": [(text, bool(ents)) for text, ents in training_data.SIMPLE_DATA],
+    }
+
+    print(f"🔍 Prefilter: {len(gate.keywords)} event keywords + "
+          f"{len(DATE_PATTERNS) + len(TIME_PATTERNS)} date/time patterns")
+    print("   (keywords are mined from training_data_v2, so that corpus is not held out)")
+    for name, row in measure(gate, corpora).items():
+        print(f"\n📊 {name}")
+        print(f"   False negatives: {row['false_negatives']}/{row['positives']} "
+              f"({row['false_negative_rate']:.1%})")
+        print(f"   Negatives skipped: {row['negatives_skipped']}/{row['negatives']}")
+        for text in row["missed_examples"]:
+            print(f"   ❌ would skip: {text}")
@@ -0,0 +1,140 @@
+"""
+Slow-request profiler
+Runs cProfile on 1 in N requests and keeps the profile only when the request
+turns out slower than a threshold. Profiles go into a bounded ring together
+with the input length and a redacted fingerprint of the text (never the text
+itself), so latency outliers can be matched to window contents after the fact.
+
+The saved .prof files open in snakeviz, or turn into flamegraphs with
+flameprof / gprof2dot.
+"""
+
+import cProfile
+import hashlib
+import io
+import itertools
+import marshal
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Per-process salt: fingerprints of the same text match within one server run,
+# but can't be looked up against a dictionary of likely messages
+_SALT = os.urandom(16)
+
+
+def text_fingerprint(text: str) -> Dict[str, Any]:
+    """Shape of the text plus a salted hash; enough to spot repeats, not to read it"""
+    lines = text.splitlines()
+    return {
+        "hash": hashlib.blake2b(text.encode("utf-8", "replace"), key=_SALT, digest_size=8).hexdigest(),
+        "chars": len(text),
+        "lines": len(lines),
+        "words": len(text.split()),
+        "longest_line": max((len(line) for line in lines), default=0),
+        "non_ascii": sum(1 for ch in text if ord(ch) > 127),
+    }
+
+
+class SlowRequestProfiler:
+    """
+    `with profiler.profile("parse", text): ...` around the request handler.
+    Unsampled requests cost one counter increment. Only one request is
+    profiled at a time (Python allows one active profiler), so concurrent
+    sampled requests just run unprofiled.
+    """
+
+    def __init__(self, threshold_ms: float, sample_every: int = 1, max_profiles: int = 32,
+                 top_functions: int = 40):
+        self.threshold = threshold_ms / 1000.0
+        self.sample_every = max(1, sample_every)
+        self.top_functions = top_functions
+        self._profiles = deque(maxlen=max_profiles)
+        self._ids = itertools.count(1)
+        self._seen = itertools.count()
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+        self.sampled = 0
+        self.captured = 0
+        self.busy = 0
+
+    @contextmanager
+    def profile(self, endpoint: str, text: str):
+        if next(self._seen) % self.sample_every:
+            yield
+            return
+        if not self._active.acquire(blocking=False):
+            with self._lock:
+                self.busy += 1
+            yield
+            return
+
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+        finally:
+            elapsed = time.perf_counter() - started
+            self._active.release()
+            self._record(endpoint, text, elapsed, profile)
+
+    def _record(self, endpoint, text, elapsed, profile):
+        with self._lock:
+            self.sampled += 1
+        if elapsed < self.threshold:
+            return
+
+        summary = io.StringIO()
+        stats = pstats.Stats(profile, stream=summary)
+        # Dump before sorting/printing, in the same format as cProfile's .prof files
+        raw = marshal.dumps(stats.stats)
+        stats.sort_stats("cumulative").print_stats(self.top_functions)
+        entry = {
+            "id": next(self._ids),
+            "endpoint": endpoint,
+            "timestamp": time.time(),
+            "elapsed_ms": elapsed * 1000,
+            "input": text_fingerprint(text),
+            "summary": summary.getvalue(),
+            "prof": raw,
+        }
+        with self._lock:
+            self._profiles.append(entry)
+            self.captured += 1
+        print(f"⚠️  Slow {endpoint} request ({elapsed * 1000:.0f}ms, {len(text)} chars), "
+              f"profile #{entry['id']} saved")
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Newest first, without the heavy fields"""
+        with self._lock:
+            entries = list(self._profiles)
+        return [
+            {key: value for key, value in entry.items() if key not in ("summary", "prof")}
+            for entry in reversed(entries)
+        ]
+
+    def get(self, profile_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for entry in self._profiles:
+                if entry["id"] == profile_id:
+                    return entry
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "threshold_ms": self.threshold * 1000,
+                "sample_every": self.sample_every,
+                "sampled": self.sampled,
+                "captured": self.captured,
+                "kept": len(self._profiles),
+                "skipped_busy": self.busy,
+            }
@@ -0,0 +1,126 @@
+"""
+Hybrid date/time/location rules as a spaCy pipeline component
+Token-based EntityRuler patterns that run right after "ner", so one nlp.pipe
+pass produces the final hybrid entities and the rules ship inside the model.
+
+Add the component to an already trained model:
+    python rules_component.py model_output_v2
+"""
+
+from typing import Dict, List
+
+# Name of the component in the pipeline, and the pattern id that marks its
+# entities (ent.ent_id_) so callers can tell rule hits from NER predictions
+RULES_PIPE_NAME = "event_rules"
+RULE_ID = "rule"
+
+WEEKDAYS = ["mon", "monday", "tues", "tuesday", "wed", "wednesday", "thurs", "thursday",
+            "fri", "friday", "sat", "saturday", "sun", "sunday"]
+MONTHS = ["jan", "january", "feb", "february", "mar", "march", "apr", "april", "may",
+          "jun", "june", "jul", "july", "aug", "august", "sep", "sept", "september",
+          "oct", "october", "nov", "november", "dec", "december"]
+AMPM = ["am", "pm", "a", "p", "a.m.", "p.m."]
+
+# Token-level regexes (the tokenizer keeps "2:30pm", "@3pm" and "10am-12pm" whole)
+HOUR = r"^\d{1,2}$"
+CLOCK = r"^\d{1,2}:\d{2}$"
+TIME_TOKEN = r"^@?\d{1,2}(:\d{2})?(am|pm|a|p)$"
+RANGE_TOKEN = r"^\d{1,2}(:\d{2})?(am|pm)?-\d{1,2}(:\d{2})?(am|pm)?$"
+SLASH_DATE = r"^\d{1,2}/\d{1,2}(/\d{2,4})?$"
+DAY_OF_MONTH = r"^\d{1,2}(st|nd|rd|th)?$"
+
+
+def _pattern(label: str, tokens: List[Dict]) -> Dict:
+    return {"label": label, "pattern": tokens, "id": RULE_ID}
+
+
+def build_rule_patterns() -> List[Dict]:
+    """EntityRuler patterns mirroring hybrid_parser's DATE/TIME/LOCATION regexes"""
+    any_time = {"LOWER": {"REGEX": f"({HOUR})|({CLOCK})|({TIME_TOKEN})"}}
+    optional_ampm = {"LOWER": {"IN": AMPM}, "OP": "?"}
+
+    # The English tokenizer reads "wed" as "we'd" and splits it into "we" + "d"
+    split_wed = [{"LOWER": "we", "SPACY": False}, {"LOWER": "d"}]
+
+    date = [
+        [{"LOWER": {"IN": ["today", "tonight", "tn", "tonite", "tomorrow", "tmrw", "tmr", "tmw", "yesterday"]}}],
+        [{"LOWER": {"IN": ["next", "this"]}}, {"LOWER": {"IN": ["week", "month", "year"] + WEEKDAYS}}],
+        [{"LOWER": {"IN": WEEKDAYS}}],
+        split_wed,
+        [{"LOWER": {"IN": ["next", "this"]}}] + split_wed,
+        [{"TEXT": {"REGEX": SLASH_DATE}}],
+        [{"LOWER": {"IN": MONTHS}}, {"LOWER": {"REGEX": DAY_OF_MONTH}}],
+        [{"LOWER": {"REGEX": DAY_OF_MONTH}}, {"LOWER": {"IN": MONTHS}}],
+    ]
+
+    time = [
+        # Ranges: "10am-12pm", "2 - 4pm", "from 2 to 4pm"
+        [{"LOWER": {"REGEX": RANGE_TOKEN}}],
+        [any_time, optional_ampm, {"ORTH": "-"}, any_time, optional_ampm],
+        [{"LOWER": {"IN": ["from", "between"]}}, any_time, {"LOWER": {"IN": ["to", "and", "-"]}}, any_time, optional_ampm],
+        # Single times: "3pm", "3 pm", "2:30", "at 3", "@ 3pm" (hybrid_parser.trim_time_prefix
+        # drops the "at"/"@" again)
+        [{"LOWER": {"REGEX": TIME_TOKEN}}],
+        [{"LOWER": {"REGEX": CLOCK}}, optional_ampm],
+        [{"LOWER": {"REGEX": HOUR}}, {"LOWER": {"IN": AMPM}}],
+        [{"LOWER": {"IN": ["at", "@"]}}, any_time, optional_ampm],
+        # Named and relative times
+        [{"LOWER": {"IN": ["noon", "midnight", "eod", "morning", "afternoon", "evening", "night"]}}],
+        [{"LOWER": "end"}, {"LOWER": "of"}, {"LOWER": "day"}],
+        [{"LOWER": "in"}, {"LIKE_NUM": True}, {"LOWER": {"IN": ["min", "mins", "minutes", "hour", "hours", "hr", "hrs"]}}],
+    ]
+
+    location = [
+        [{"LOWER": {"IN": ["zoom", "teams", "slack", "webex", "skype"]}}],
+        [{"LOWER": "google"}, {"LOWER": "meet"}],
+        [{"LIKE_URL": True}],
+        [{"LOWER": "at"}, {"IS_TITLE": True}, {"LOWER": {"IN": ["'s", "s"]}}],
+        [{"LOWER": "at"}, {"TEXT": {"REGEX": r"^[A-Z][a-z]+s$"}}],
+        [{"LOWER": {"IN": ["conference", "conf"]}, "OP": "?"}, {"LOWER": "room"}, {"TEXT": {"REGEX": r"^[A-Z0-9]+$"}}],
+        [{"LOWER": "on"}, {"IS_TITLE": True},
+         {"LOWER": {"IN": ["st", "st.", "street", "ave", "ave.", "avenue", "rd", "rd.", "road",
+                           "blvd", "blvd.", "boulevard"]}}],
+    ]
+
+    return ([_pattern("DATE", p) for p in date]
+            + [_pattern("TIME", p) for p in time]
+            + [_pattern("LOCATION", p) for p in location])
+
+
+def add_rule_component(nlp):
+    """
+    Add (or replace) the rules component right after "ner".
+    overwrite_ents=False means NER predictions always win; rule matches only
+    fill the gaps, the same policy as hybrid_parser.merge_spans.
+    """
+    if RULES_PIPE_NAME in nlp.pipe_names:
+        nlp.remove_pipe(RULES_PIPE_NAME)
+
+    placement = {"after": "ner"} if "ner" in nlp.pipe_names else {"last": True}
+    ruler = nlp.add_pipe(
+        "entity_ruler",
+        name=RULES_PIPE_NAME,
+        config={"overwrite_ents": False, "validate": True},
+        **placement,
+    )
+    ruler.add_patterns(build_rule_patterns())
+    return ruler
+
+
+if __name__ == "__main__":
+    import sys
+    import spacy
+
+    if len(sys.argv) < 2:
+        print("Usage: python rules_component.py MODEL_DIR [OUTPUT_DIR]")
+        sys.exit(1)
+
+    model_dir = sys.argv[1]
+    output_dir = sys.argv[2] if len(sys.argv) > 2 else model_dir
+
+    print(f"Loading model from {model_dir}...")
+    nlp = spacy.load(model_dir)
+    ruler = add_rule_component(nlp)
+    nlp.to_disk(output_dir)
+    print(f"✅ Added '{RULES_PIPE_NAME}' ({len(ruler.patterns)} patterns), saved to '{output_dir}'")
+    print(f"   Pipeline: {', '.join(nlp.pipe_names)}")
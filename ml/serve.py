@@ -0,0 +1,329 @@
+"""
+EventSniffer production server
+Loads the spaCy model once in a master process, then forks worker processes
+that share the model's read-only weights and vectors through copy-on-write
+
+Usage:
+    python serve.py                      # one worker per CPU core
+    python serve.py --workers 4 --port 5000
+    python serve.py --socket /tmp/eventsniffer.sock   # also listen on a Unix socket
+
+Signals (sent to the master):
+    SIGHUP   load the newest model version if it changed, then rolling restart:
+             start a fresh worker, then retire an old one
+    SIGUSR1  log RSS / USS / PSS of every worker
+    SIGTERM  graceful shutdown: workers finish in-flight requests and exit
+"""
+
+import argparse
+import gc
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def _mb(n_bytes):
+    return n_bytes / (1024 * 1024)
+
+
+def memory_report(pid):
+    """RSS plus, where the platform has it, USS (private) and PSS (shared pages split fairly)"""
+    if psutil is None:
+        return "psutil not installed"
+    try:
+        info = psutil.Process(pid).memory_full_info()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return "unavailable"
+    parts = [f"rss={_mb(info.rss):.0f}MB", f"uss={_mb(info.uss):.0f}MB"]
+    if hasattr(info, "pss"):
+        parts.append(f"pss={_mb(info.pss):.0f}MB")
+    return " ".join(parts)
+
+
+def run_worker(listener, app, host, port, graceful_timeout, socket_listener=None):
+    """Serve requests on the inherited listening socket(s) until SIGTERM"""
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import server as server_module
+
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+    # Track request threads so server_close() waits for in-flight requests
+    server.daemon_threads = False
+    if server_module.metrics_dir:
+        server_module.start_metrics_writer()
+
+    socket_server = None
+    if socket_listener is not None:
+        socket_server = server_module.start_socket_server(socket_listener)
+    closing = []
+
+    def stop(signum, frame):
+        # shutdown() blocks until serve_forever returns, so call it off-thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+        if socket_server:
+            # Stops reading frames; the ones already read are still answered
+            closing.append(threading.Thread(target=socket_server.close, args=(graceful_timeout,), daemon=True))
+            closing[-1].start()
+        signal.alarm(int(graceful_timeout) + 1)
+
+    signal.signal(signal.SIGTERM, stop)
+    server.serve_forever()
+    server.server_close()
+    for thread in closing:
+        thread.join()
+    if server_module.metrics_dir:
+        server_module.metrics_dir.write()  # the master archives it once this worker is reaped
+    os._exit(0)
+
+
+class Master:
+    """Forks and supervises workers; restarts any that die"""
+
+    def __init__(self, listener, app, host, port, workers, graceful_timeout, server=None,
+                 socket_listener=None, watcher=None):
+        self.listener = listener
+        self.socket_listener = socket_listener
+        self.app = app
+        self.host = host
+        self.port = port
+        self.num_workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.workers = {}  # pid -> start time
+        self.retiring = set()
+        self.stopping = False
+        self.pending_restart = False
+        self.pending_reload = False
+        self.pending_report = False
+        # The server module, when the master watches for new model versions,
+        # and its registry watcher, polled from the main loop
+        self.server = server
+        self.watcher = watcher
+        # Where every process's metrics go (see metrics.MetricsDir); the master
+        # writes its own there too and archives the files of reaped workers
+        self.metrics_dir = server.metrics_dir if server is not None else None
+        # The shadow candidate's results come back to the master (see shadow.py)
+        self.shadow = server.shadow if server is not None else None
+
+    def on_model_swap(self, version):
+        """The master swapped in a new model: refreeze it and fork workers that share it"""
+        gc.unfreeze()
+        gc.collect()
+        gc.freeze()
+        self.pending_restart = True
+
+    def reload(self):
+        """SIGHUP: pick up a new model version if there is one; restart the workers either way"""
+        if self.server is None or not self.server.swap_model():
+            self.pending_restart = True
+
+    def before_fork(self):
+        """
+        Forking while another thread holds a lock (logging, imports, SQLite)
+        leaves that lock held forever in the child, so the master stays
+        single-threaded: stop the server's background threads before each fork
+        """
+        if self.server is not None:
+            self.server.stop_background_threads(self.graceful_timeout)
+        others = [thread.name for thread in threading.enumerate() if thread is not threading.main_thread()]
+        if others:
+            print(f"⚠️  Forking with other threads still running: {', '.join(others)}")
+
+    def spawn(self):
+        self.before_fork()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(self.listener, self.app, self.host, self.port, self.graceful_timeout,
+                           self.socket_listener)
+            finally:
+                os._exit(1)
+        self.workers[pid] = time.time()
+        return pid
+
+    def report(self):
+        print(f"📊 Master pid {os.getpid()}: {memory_report(os.getpid())}")
+        for pid in sorted(self.workers):
+            tag = " (retiring)" if pid in self.retiring else ""
+            print(f"   worker {pid}{tag}: {memory_report(pid)}")
+        sys.stdout.flush()
+
+    def rolling_restart(self):
+        """Replace workers one at a time so some are always accepting"""
+        print("🔄 Rolling restart of workers...")
+        for old_pid in list(self.workers):
+            if self.stopping:
+                return
+            self.spawn()
+            self.retire(old_pid)
+
+    def retire(self, pid):
+        self.retiring.add(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def reap(self):
+        """Collect exited workers; replace the ones that weren't asked to stop"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            self.workers.pop(pid, None)
+            if self.metrics_dir:
+                self.metrics_dir.archive(pid)
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+            elif not self.stopping:
+                print(f"⚠️  Worker {pid} died (status {status}), starting a replacement")
+                self.spawn()
+
+    def shutdown(self):
+        print("🛑 Shutting down workers...")
+        for pid in list(self.workers):
+            self.retire(pid)
+        deadline = time.time() + self.graceful_timeout
+        while self.workers and time.time() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            print(f"⚠️  Worker {pid} did not stop in time, killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.reap()
+
+    def run(self):
+        def on_stop(signum, frame):
+            self.stopping = True
+
+        def on_restart(signum, frame):
+            # The load happens on the main loop: no threads in the master (see before_fork)
+            self.pending_reload = True
+
+        def on_report(signum, frame):
+            self.pending_report = True
+
+        signal.signal(signal.SIGTERM, on_stop)
+        signal.signal(signal.SIGINT, on_stop)
+        signal.signal(signal.SIGHUP, on_restart)
+        signal.signal(signal.SIGUSR1, on_report)
+
+        for _ in range(self.num_workers):
+            self.spawn()
+
+        # Give workers a moment to settle before the first memory report
+        time.sleep(2)
+        self.report()
+
+        next_poll = time.monotonic() + (self.watcher.interval if self.watcher else 0)
+        next_metrics = time.monotonic()
+        while not self.stopping:
+            # Loading a new model blocks the loop; workers keep serving meanwhile
+            if self.pending_reload:
+                self.pending_reload = False
+                self.reload()
+            if self.watcher and time.monotonic() >= next_poll:
+                try:
+                    self.watcher.check()
+                except Exception as e:
+                    print(f"⚠️  Model watcher: {e}")
+                next_poll = time.monotonic() + self.watcher.interval
+            if self.shadow:
+                self.shadow.poll()
+            if self.metrics_dir and time.monotonic() >= next_metrics:
+                self.metrics_dir.write()
+                next_metrics = time.monotonic() + self.server.METRICS_WRITE_S
+            if self.pending_restart:
+                self.pending_restart = False
+                self.rolling_restart()
+            if self.pending_report:
+                self.pending_report = False
+                self.report()
+            self.reap()
+            time.sleep(0.2)
+
+        self.shutdown()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Pre-forking EventSniffer server")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=5000)
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Worker processes (default: one per CPU core)")
+    arg_parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                            help="Seconds a worker gets to finish in-flight requests")
+    arg_parser.add_argument("--socket", default=os.environ.get("EVENTSNIFFER_SOCKET", ""),
+                            help="Also serve /parse on this Unix socket (see local_socket.py)")
+    args = arg_parser.parse_args()
+
+    # Bind first so early connections wait in the backlog instead of being refused
+    listener = socket.create_server((args.host, args.port), backlog=2048)
+    listener.set_inheritable(True)
+    socket_listener = None
+    if args.socket:
+        from local_socket import bind
+        socket_listener = bind(args.socket, backlog=2048)
+
+    # Every process writes its metrics here and /metrics merges them (see server.py)
+    temp_metrics_dir = None
+    if not os.environ.get("EVENTSNIFFER_METRICS_DIR"):
+        temp_metrics_dir = os.environ["EVENTSNIFFER_METRICS_DIR"] = tempfile.mkdtemp(prefix="eventsniffer-metrics-")
+
+    # Load the model once, in the master, before any worker is forked
+    import server
+
+    server.metrics_dir.clear()
+
+    if not server.load_model():
+        print("❌ Model failed to load, not starting workers.")
+        sys.exit(1)
+
+    # One shadow candidate for all workers, collected from the main loop
+    if server.shadow:
+        server.shadow.start(stats_path=os.path.join(server.metrics_dir.path, "shadow-stats.json"))
+
+    # Move everything allocated so far into the permanent GC generation, so the
+    # cyclic collector in each worker never writes to (and un-shares) those pages
+    gc.collect()
+    gc.freeze()
+
+    print(f"Starting {args.workers} workers on http://{args.host}:{args.port} ...")
+    if socket_listener:
+        print(f"   ... and on unix:{args.socket}")
+    # New model versions load in the master, then workers are rolled so the
+    # new weights are shared copy-on-write again; workers forward admin reloads here
+    master = Master(listener, server.app, args.host, args.port, args.workers, args.graceful_timeout,
+                    server=server, socket_listener=socket_listener, watcher=server.model_watcher())
+    server.control_pid = os.getpid()
+    server.on_swap.append(master.on_model_swap)
+    master.run()
+    if server.shadow:
+        server.shadow.close()
+    if socket_listener:
+        os.unlink(args.socket)
+    if temp_metrics_dir:
+        shutil.rmtree(temp_metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
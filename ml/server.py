@@ -1,52 +1,1028 @@
+import json
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
 import spacy
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
+from batching import MicroBatcher
+import compact_vectors  # noqa: F401 (lets spacy.load read export_model.py --half models)
+from parse_cache import DiskParseCache, ParseCache, model_files_signature, model_fingerprint
+from model_registry import ModelRegistry, ModelWatcher
+from incremental import IncrementalParser, parse_by_line
+from prefilter import PreFilter
+from chunking import split_chunks
+from metrics import CONTENT_TYPE, LENGTH_BUCKETS, REGISTRY, MetricsDir
+from profiler import SlowRequestProfiler
+from normalize import DateTimeNormalizer, date_time_texts, reference_time
+from shadow import ShadowEvaluator
+from local_socket import LocalSocketServer, bind
+from admission import PRIORITIES, AdmissionController, Rejected
 
 # 1. Set up the Flask app
 app = Flask(__name__)
 
+# Defaults for /parse_batch. Both can be overridden per request.
+# n_process > 1 forks extra spaCy workers for every call, so it only pays off
+# for big backfills (old chat logs, re-scans after a model upgrade).
+BATCH_SIZE = int(os.environ.get("EVENTSNIFFER_BATCH_SIZE", "64"))
+N_PROCESS = int(os.environ.get("EVENTSNIFFER_N_PROCESS", "1"))
+MAX_BATCH_TEXTS = int(os.environ.get("EVENTSNIFFER_MAX_BATCH_TEXTS", "1000"))
+
+# Micro-batching for single /parse requests: concurrent requests are held for
+# up to COALESCE_MS (or until COALESCE_MAX_DOCS are waiting) and run as one
+# nlp.pipe call. 0 disables it and every request runs nlp(text) directly.
+COALESCE_MS = float(os.environ.get("EVENTSNIFFER_COALESCE_MS", "0"))
+COALESCE_MAX_DOCS = int(os.environ.get("EVENTSNIFFER_COALESCE_MAX_DOCS", "32"))
+
+# Result cache for /parse. Auto-scan re-posts the same window text whenever the
+# user switches back to it, so most requests are repeats. 0 entries disables it.
+CACHE_SIZE = int(os.environ.get("EVENTSNIFFER_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.environ.get("EVENTSNIFFER_CACHE_TTL", "300"))
+
+# Optional second tier on disk (SQLite, see parse_cache.DiskParseCache): survives
+# restarts and is shared by every serve.py worker, so a deploy starts warm.
+# Off unless a path is given. Entries for an older version of the model are
+# dropped when the server starts.
+DISK_CACHE = os.environ.get("EVENTSNIFFER_DISK_CACHE", "")
+DISK_CACHE_MB = float(os.environ.get("EVENTSNIFFER_DISK_CACHE_MB", "256"))
+
+# Admission control for /parse (and the Unix socket): at most ADMIT_RUNNING
+# requests run the model at once (default one, or a full micro-batch with
+# COALESCE_MS set) and up to ADMIT_QUEUE more wait, manual scans ahead of
+# auto-scans (see admission.py). Cache hits and prefiltered texts never wait.
+# /parse_batch and /parse_stream share the same slots in the auto lane, one
+# slot per nlp.pipe chunk, so a backfill can't run alongside them unbounded.
+# Requests can send "priority" ("manual" or "auto", the default), "deadline_ms"
+# (give up unless the model starts within that long; default
+# DEFAULT_DEADLINE_MS, 0 for none) and "stream_id" (a newer request on the
+# same stream cancels an older one still waiting, unless the older one is a
+# manual scan and the newer an auto-scan; defaults to "session_id").
+# Dropped requests get 503 (shed, with Retry-After), 504 (deadline) or 409
+# (superseded). ADMIT_QUEUE=0 turns admission control off.
+ADMIT_QUEUE = int(os.environ.get("EVENTSNIFFER_ADMIT_QUEUE", "64"))
+ADMIT_RUNNING = int(os.environ.get("EVENTSNIFFER_ADMIT_RUNNING", "0")) or (COALESCE_MAX_DOCS if COALESCE_MS > 0 else 1)
+DEFAULT_DEADLINE_MS = float(os.environ.get("EVENTSNIFFER_DEFAULT_DEADLINE_MS", "0"))
+
+# Every text is parsed line by line (see incremental.py). Requests that carry
+# a "session_id" only send the lines the session hasn't sent before through NER.
+MAX_SESSIONS = int(os.environ.get("EVENTSNIFFER_MAX_SESSIONS", "64"))
+
+# Lexical pre-filter: text with no date/time pattern or event keyword skips NER
+# and returns no entities. Requests can send "bypass_prefilter": true to compare.
+PREFILTER = os.environ.get("EVENTSNIFFER_PREFILTER", "0") == "1"
+
+# Slow-request profiler (off by default): 1 in PROFILE_SAMPLE /parse requests
+# runs under cProfile, and the profile is kept when it takes PROFILE_SLOW_MS or
+# more. Browse them at /debug/slow (localhost only).
+PROFILE_SLOW_MS = float(os.environ.get("EVENTSNIFFER_PROFILE_SLOW_MS", "0"))
+PROFILE_SAMPLE = int(os.environ.get("EVENTSNIFFER_PROFILE_SAMPLE", "1"))
+PROFILE_KEEP = int(os.environ.get("EVENTSNIFFER_PROFILE_KEEP", "32"))
+
+# DATE/TIME normalization: /parse and /parse_batch add a "datetime" field with
+# ISO start/end for the first DATE and TIME found, relative to the request's
+# "reference" (ISO datetime, default now) and "timezone" (IANA name, default
+# EVENTSNIFFER_TIMEZONE or the server's local zone). Resolutions are memoized
+# per (phrase, reference day) in an LRU of NORMALIZE_CACHE entries.
+TIMEZONE = os.environ.get("EVENTSNIFFER_TIMEZONE") or None
+NORMALIZE_CACHE = int(os.environ.get("EVENTSNIFFER_NORMALIZE_CACHE", "4096"))
+
+# Shadow evaluation (off by default): a random SHADOW_SAMPLE fraction of /parse
+# inputs that ran through the model is mirrored to a candidate model in its own
+# process, and /metrics and /stats report per-label agreement and the latency
+# difference. At most SHADOW_QUEUE texts wait; the rest are dropped. Under
+# serve.py the master runs the only candidate process and every worker feeds it.
+SHADOW_MODEL_DIR = os.environ.get("EVENTSNIFFER_SHADOW_MODEL_DIR", "")
+SHADOW_SAMPLE = float(os.environ.get("EVENTSNIFFER_SHADOW_SAMPLE", "0.1"))
+SHADOW_QUEUE = int(os.environ.get("EVENTSNIFFER_SHADOW_QUEUE", "64"))
+
+# Unix domain socket listener (off by default): /parse over length-prefixed
+# MessagePack frames on a persistent connection that takes pipelined requests
+# (see local_socket.py), with no TCP, HTTP or JSON in the way. Only the user
+# running the server can connect. SOCKET_THREADS requests run at once.
+SOCKET_PATH = os.environ.get("EVENTSNIFFER_SOCKET", "")
+SOCKET_THREADS = int(os.environ.get("EVENTSNIFFER_SOCKET_THREADS", "32"))
+
+# /parse_stream splits huge window dumps into chunks of at most STREAM_CHUNK_CHARS
+# and runs them through nlp.pipe STREAM_BATCH_CHUNKS at a time, so results for
+# the first chunks go out while later ones are still being parsed.
+STREAM_CHUNK_CHARS = int(os.environ.get("EVENTSNIFFER_STREAM_CHUNK_CHARS", "2000"))
+STREAM_BATCH_CHUNKS = int(os.environ.get("EVENTSNIFFER_STREAM_BATCH_CHUNKS", "4"))
+
+# Metrics for /metrics (Prometheus text format). "stage" splits a request into
+# prefilter, cache lookup, queue (waiting for admission), model (spaCy) and
+# serialize (JSON encoding); for /parse_stream, "stream" is the whole body, which outlives the request handler.
+# Unix socket requests are recorded under endpoint "socket".
+# Under serve.py, every process writes its metrics to METRICS_DIR (serve.py
+# makes a temporary one unless it is set) at least every METRICS_WRITE_S
+# seconds, and /metrics on any worker merges them (see metrics.MetricsDir):
+# counters and histograms are totals over all workers, gauges are per process.
+METRICS_DIR = os.environ.get("EVENTSNIFFER_METRICS_DIR", "")
+METRICS_WRITE_S = float(os.environ.get("EVENTSNIFFER_METRICS_WRITE_S", "1"))
+metrics_dir = MetricsDir(METRICS_DIR) if METRICS_DIR else None
+REQUESTS = REGISTRY.counter("eventsniffer_requests_total", "Requests by endpoint and status", ["endpoint", "status"])
+REQUEST_SECONDS = REGISTRY.histogram("eventsniffer_request_seconds", "Request handling time", ["endpoint"])
+STAGE_SECONDS = REGISTRY.histogram("eventsniffer_stage_seconds", "Time per request stage", ["endpoint", "stage"])
+INPUT_CHARS = REGISTRY.histogram("eventsniffer_input_chars", "Input text length", ["endpoint"], LENGTH_BUCKETS)
+ENTITIES = REGISTRY.counter("eventsniffer_entities_total", "Entities returned, by label", ["label"])
+
+
+def _count_entities(entities):
+    for ent in entities:
+        ENTITIES.inc(label=ent["label"])
+
+
 # 2. Load our trained model
-model_dir = "model_output"
-print(f"Loading model from {model_dir}...")
-try:
-    nlp = spacy.load(model_dir)
-    print("✅ Model loaded successfully.")
-except Exception as e:
-    print(f"❌ ERROR: Could not load model. {e}")
-    nlp = None
+# The model loads in the background so the port is bound right away; until it
+# is ready, requests get a fast 503 and /readyz says why.
+# EVENTSNIFFER_MODELS_DIR serves the newest version in a versioned directory
+# (see model_registry.py); otherwise EVENTSNIFFER_MODEL_DIR is the one model.
+# Either way the watcher polls every MODEL_POLL_S seconds (0 disables it), and
+# a new version, or a retrain saved over the same directory, is loaded and
+# warmed up in the background, then swapped in between requests. Requests
+# already running finish on the old model, which is released once drained.
+model_dir = os.environ.get("EVENTSNIFFER_MODEL_DIR", "model_output")
+MODELS_DIR = os.environ.get("EVENTSNIFFER_MODELS_DIR", "")
+MODEL_POLL_S = float(os.environ.get("EVENTSNIFFER_MODEL_POLL_S", "5"))
+DRAIN_TIMEOUT = float(os.environ.get("EVENTSNIFFER_DRAIN_TIMEOUT", "30"))
+PORT = int(os.environ.get("EVENTSNIFFER_PORT", "5000"))
+registry = ModelRegistry(root=MODELS_DIR) if MODELS_DIR else ModelRegistry(model_dir=model_dir)
+serving = None  # the active ServingModel; replaced as a whole on a swap
+prefilter = None
+profiler = None
+normalizer = DateTimeNormalizer(max_entries=NORMALIZE_CACHE)
+shadow = None
+socket_server = None
+admission = AdmissionController(max_running=ADMIT_RUNNING, max_queue=ADMIT_QUEUE) if ADMIT_QUEUE > 0 else None
+# The candidate process is spawned, so it re-imports this file as __mp_main__
+# when it is run as `python server.py`; only the real server mirrors traffic
+if SHADOW_MODEL_DIR and __name__ != "__mp_main__":
+    shadow = ShadowEvaluator(SHADOW_MODEL_DIR, sample_rate=SHADOW_SAMPLE, max_queue=SHADOW_QUEUE)
+if PROFILE_SLOW_MS > 0:
+    profiler = SlowRequestProfiler(PROFILE_SLOW_MS, sample_every=PROFILE_SAMPLE, max_profiles=PROFILE_KEEP)
+
+# A few representative texts, so lazy init (vectors, pipe state, regexes) is
+# paid before the first real request instead of during it
+WARMUP_TEXTS = [
+    "Let's sync tomorrow at 10am on Zoom",
+    "Team lunch on Friday at noon at Chipotle",
+    "Doctor appointment on 12/5 at 2:30pm",
+    "That's a great idea",
+]
+
+model_state = {"status": "loading", "error": None, "stages": {}}
+model_ready = threading.Event()
+
+# Swaps after startup: one at a time; "status" is idle, loading or failed
+swap_state = {"status": "idle", "version": None, "error": None, "swaps": 0, "last_swap": None}
+swap_lock = threading.Lock()
+on_swap = []  # callbacks(version) run after each swap (serve.py restarts its workers)
+draining = []  # threads draining swapped-out models
+# Set by serve.py to the master's pid: workers can't swap on their own, so
+# /admin/models/load asks the master instead
+control_pid = None
+
+
+def doc_to_entities(doc):
+    """Format a parsed Doc's entities into the JSON shape our Swift app expects"""
+    return [
+        {
+            "text": ent.text,
+            "label": ent.label_,
+            "start": ent.start_char,
+            "end": ent.end_char,
+        }
+        for ent in doc.ents
+    ]
+
+
+class ServingModel:
+    """
+    One loaded model version and everything whose contents depend on it: the
+    result caches, the micro-batcher and the incremental-parse sessions. A
+    swap replaces the whole object, so no request ever mixes two models.
+    """
+
+    def __init__(self, version, path):
+        self.version = version
+        self.path = str(path)
+        # Taken before loading, so a save that lands mid-load still counts as a change
+        self.signature = model_files_signature(self.path)
+        self.nlp = spacy.load(self.path)
+        self.loaded_at = time.time()
+        self.batcher = None
+        self.cache = None
+        self.disk_cache = None
+        self.incremental = None
+
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._closing = False
+
+    def setup(self):
+        if COALESCE_MS > 0:
+            self.batcher = MicroBatcher(self.parse_many, max_wait_ms=COALESCE_MS, max_batch=COALESCE_MAX_DOCS)
+            print(f"Micro-batching enabled ({COALESCE_MS}ms window, up to {COALESCE_MAX_DOCS} docs).")
+        fingerprint = model_fingerprint(self.nlp, self.path)
+        if CACHE_SIZE > 0:
+            self.cache = ParseCache(fingerprint, max_entries=CACHE_SIZE, ttl=CACHE_TTL)
+        if DISK_CACHE:
+            # One namespace per version, so rolling back finds its entries still there
+            self.disk_cache = DiskParseCache(DISK_CACHE, fingerprint,
+                                             namespace=f"server:{os.path.abspath(self.path)}",
+                                             max_bytes=int(DISK_CACHE_MB * 1024 * 1024))
+            print(f"Disk cache at {DISK_CACHE} ({DISK_CACHE_MB:.0f}MB).")
+        self.incremental = IncrementalParser(self.parse_many, max_sessions=MAX_SESSIONS)
+
+    def warm_up(self):
+        for doc in self.nlp.pipe(WARMUP_TEXTS):
+            pass
+        if self.batcher:
+            self.batcher.parse(WARMUP_TEXTS[0])
+
+    def parse_many(self, texts):
+        """Run a list of texts through the model in one nlp.pipe call"""
+        return [doc_to_entities(doc) for doc in self.nlp.pipe(texts, batch_size=BATCH_SIZE)]
+
+    def acquire(self):
+        """Count a request in; False once this model is draining"""
+        with self._lock:
+            if self._closing:
+                return False
+            self._inflight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._inflight -= 1
+
+    def drain(self, timeout):
+        """Refuse new requests, wait for running ones, then stop the batcher thread"""
+        with self._lock:
+            self._closing = True
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self._inflight == 0:
+                    break
+            time.sleep(0.05)
+        else:
+            print(f"⚠️  Model {self.version} still had {self._inflight} requests after {timeout:.0f}s")
+        if self.batcher:
+            self.batcher.close()
+
+    def info(self):
+        return {"version": self.version, "path": self.path, "loaded_at": self.loaded_at,
+                "inflight": self._inflight}
+
+
+def acquire_model():
+    """The active model, counted in; pair with model.release()"""
+    while True:
+        model = serving
+        if model.acquire():
+            return model
+        # Lost a race with a swap: the new model is already in `serving`
+
+
+def _build_model(version, path, stages):
+    """Load, set up and warm up one version, recording each stage's seconds in `stages`"""
+    started = time.perf_counter()
+    print(f"Loading model {version} from {path}...")
+    model = ServingModel(version, path)
+    stages["load_seconds"] = time.perf_counter() - started
+    print(f"✅ Model loaded successfully ({stages['load_seconds']:.2f}s).")
+
+    started = time.perf_counter()
+    model.setup()
+    stages["setup_seconds"] = time.perf_counter() - started
+    print(f"✅ Serving components ready ({stages['setup_seconds']:.2f}s).")
+
+    started = time.perf_counter()
+    model.warm_up()
+    if prefilter:
+        for text in WARMUP_TEXTS:
+            prefilter.regex.search(text)
+    stages["warmup_seconds"] = time.perf_counter() - started
+    print(f"✅ Warm-up done ({stages['warmup_seconds']:.2f}s).")
+    return model
+
+
+def load_model():
+    """Load the model, set up the serving components and warm up; logs each stage"""
+    global serving, prefilter
+
+    try:
+        if PREFILTER:
+            prefilter = PreFilter()
+        version, path = registry.resolve()
+        serving = _build_model(version, path, model_state["stages"])
+    except Exception as e:
+        print(f"❌ ERROR: Could not load model. {e}")
+        model_state["status"] = "failed"
+        model_state["error"] = str(e)
+        return False
+
+    model_state["status"] = "ready"
+    model_ready.set()
+    return True
+
+
+def swap_model(version=None):
+    """
+    Load `version` (default: what the registry says to serve) next to the
+    active model, then swap it in and drain the old one. Returns True if a
+    new model went live. Blocks for the load; run it off the request path.
+    """
+    global serving
+
+    with swap_lock:
+        try:
+            version, path = registry.resolve(version)
+        except KeyError as e:
+            swap_state.update(status="failed", version=version, error=f"Unknown version: {e}")
+            return False
+        if serving and (version, model_files_signature(str(path))) == (serving.version, serving.signature):
+            return False
+
+        swap_state.update(status="loading", version=version, error=None)
+        try:
+            model = _build_model(version, path, {})
+        except Exception as e:
+            print(f"❌ ERROR: Could not load model {version}, still serving {serving.version}. {e}")
+            swap_state.update(status="failed", error=str(e))
+            return False
+
+        old, serving = serving, model  # atomic: the next acquire_model() gets the new one
+        swap_state.update(status="idle", swaps=swap_state["swaps"] + 1, last_swap=time.time())
+        print(f"🔄 Now serving model {version} (was {old.version}).")
+
+    drain = threading.Thread(target=old.drain, args=(DRAIN_TIMEOUT,), name="model-drain", daemon=True)
+    drain.start()
+    draining[:] = [thread for thread in draining if thread.is_alive()] + [drain]
+    for callback in on_swap:
+        callback(version)
+    return True
+
+
+def swap_model_in_background(version=None):
+    thread = threading.Thread(target=swap_model, args=(version,), name="model-swap", daemon=True)
+    thread.start()
+    return thread
+
+
+def model_watcher():
+    """The registry watcher, not yet started (None with EVENTSNIFFER_MODEL_POLL_S=0)"""
+    if MODEL_POLL_S <= 0:
+        return None
+    return ModelWatcher(registry, lambda: (serving.version, serving.signature) if serving else None,
+                        lambda version: swap_model(version), interval=MODEL_POLL_S)
+
+
+def start_model_watcher():
+    """Poll the registry for new versions on a background thread"""
+    watcher = model_watcher()
+    if watcher:
+        watcher.start()
+    return watcher
+
+
+def stop_background_threads(timeout=DRAIN_TIMEOUT):
+    """
+    serve.py's master calls this before every fork. A thread that is running
+    when the process forks can be holding a lock (logging, imports, SQLite)
+    that the child then waits on forever, so stop the micro-batcher thread
+    (each worker starts its own on its first request) and finish any drains.
+    """
+    if serving and serving.batcher:
+        serving.batcher.stop(timeout)
+    while draining:
+        draining.pop().join(timeout)
+
+
+def _load_and_watch():
+    if load_model():
+        start_model_watcher()
+        if shadow:
+            shadow.start()
+
+
+def load_model_in_background():
+    thread = threading.Thread(target=_load_and_watch, name="model-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+def _not_ready_body():
+    if model_state["status"] == "failed":
+        return {"error": "Model failed to load", "detail": model_state["error"]}
+    return {"error": "Model is not ready", "status": model_state["status"]}
+
+
+def _not_ready_response():
+    """Fast, explicit answer for requests that arrive before the model is ready"""
+    response = jsonify(_not_ready_body())
+    if model_state["status"] != "failed":
+        response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+def _reference(data):
+    """Reference time for DATE/TIME normalization; raises ValueError on a bad reference or timezone"""
+    reference, timezone = data.get("reference"), data.get("timezone") or TIMEZONE
+    if (reference is not None and not isinstance(reference, str)) or not isinstance(timezone, (str, type(None))):
+        raise ValueError("'reference' and 'timezone' must be strings")
+    return reference_time(reference, timezone)
+
+
+def _admission(data):
+    """(priority, deadline, stream) for the admission queue; raises ValueError on bad fields"""
+    priority = data.get("priority") or "auto"
+    if priority not in PRIORITIES:
+        raise ValueError(f"'priority' must be one of: {', '.join(PRIORITIES)}")
+    deadline_ms = data.get("deadline_ms", DEFAULT_DEADLINE_MS or None)
+    if deadline_ms is not None and (isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float))
+                                    or deadline_ms <= 0):
+        raise ValueError("'deadline_ms' must be a positive number")
+    deadline = time.monotonic() + deadline_ms / 1000.0 if deadline_ms else None
+    stream = data.get("stream_id", data.get("session_id"))
+    return priority, deadline, None if stream is None else str(stream)
+
+
+@contextmanager
+def admitted(endpoint, priority="auto", deadline=None, stream=None):
+    """Hold a model slot for the block (raises Rejected); a no-op with admission control off"""
+    if admission is None:
+        yield
+        return
+    with STAGE_SECONDS.time(endpoint=endpoint, stage="queue"):
+        admission.acquire(priority, deadline, stream)
+    try:
+        yield
+    finally:
+        admission.release()
+
+
+def _positive_int(value, default):
+    """Read an optional positive int from the request body"""
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(value)
+    return value
+
 
 # 3. Define the "/parse" endpoint
 @app.route("/parse", methods=["POST"])
 def parse_text():
-    if not nlp:
-        return jsonify({"error": "Model is not loaded"}), 500
+    if not model_ready.is_set():
+        return _not_ready_response()
 
     # Get the JSON data from the request (our Swift app will send this)
-    data = request.get_json()
+    body, status = parse_request(request.get_json())
+    # Printed here rather than in parse_request, so socket traffic stays off stdout
+    if status == 200 and not body.get("prefiltered"):
+        print(f"Processed text, found {len(body['entities'])} entities.")
+    if "model_version" in body:
+        g.model_version = body["model_version"]
+    with STAGE_SECONDS.time(endpoint="parse", stage="serialize"):
+        response = jsonify(body)
+    if body.get("reason") == "shed":
+        response.headers["Retry-After"] = "1"
+    return response, status
 
-    if not data or "text" not in data:
-        return jsonify({"error": "No 'text' field provided"}), 400
 
-    text = data.get("text")
+def parse_request(data, endpoint="parse"):
+    """
+    Everything /parse does except encoding the answer: returns (body, status).
+    The Unix socket listener (see 13.) calls this too, so both give the same results.
+    """
+    if not model_ready.is_set():
+        return _not_ready_body(), 503
+    if not isinstance(data, dict) or "text" not in data:
+        return {"error": "No 'text' field provided"}, 400
+    if not isinstance(data["text"], str):
+        return {"error": "'text' must be a string"}, 400
 
-    # 4. Use our model to find entities
-    doc = nlp(text)
+    text = data["text"]
+    try:
+        reference = _reference(data)
+        admit = _admission(data)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    model = acquire_model()
+    try:
+        if profiler:
+            # With micro-batching on, spaCy runs on the batcher thread and
+            # the profile shows this thread waiting on the result instead
+            with profiler.profile(endpoint, text):
+                return _parse_text(text, data, model, reference, admit, endpoint), 200
+        return _parse_text(text, data, model, reference, admit, endpoint), 200
+    except Rejected as e:
+        return {"error": str(e), "reason": e.reason, "model_version": model.version}, e.status
+    finally:
+        model.release()
 
-    # 5. Format the entities into a clean JSON response
-    entities = []
-    for ent in doc.ents:
-        entities.append({
-            "text": ent.text,
-            "label": ent.label_
-        })
 
-    print(f"Processed text, found {len(entities)} entities.")
+def _parse_text(text, data, model, reference, admit, endpoint):
+    session_id = data.get("session_id")
+    response = {"model_version": model.version}
+    cache, disk_cache = model.cache, model.disk_cache
+    INPUT_CHARS.observe(len(text), endpoint=endpoint)
+
+    if prefilter and not data.get("bypass_prefilter"):
+        with STAGE_SECONDS.time(endpoint=endpoint, stage="prefilter"):
+            skip = not prefilter.should_parse(text)
+        if skip:
+            return {"entities": [], "datetime": None, "prefiltered": True, "model_version": model.version}
+
+    # 4. Use our model to find entities and format them for the response.
+    # Text is parsed line by line with or without a session (see incremental.py),
+    # so both get the same answer and share cache entries.
+    with STAGE_SECONDS.time(endpoint=endpoint, stage="cache"):
+        # Both tiers share the model fingerprint, so one key works for both
+        cache_key = (cache or disk_cache).key(text, "lines") if cache or disk_cache else None
+        entities = cache.get(cache_key) if cache else None
+    if entities is None and disk_cache:
+        with STAGE_SECONDS.time(endpoint=endpoint, stage="disk_cache"):
+            entities = disk_cache.get(cache_key)
+        if entities is not None and cache:
+            cache.put(cache_key, entities)
+    if entities is None:
+        with admitted(endpoint, *admit):
+            model_started = time.perf_counter()
+            if session_id is not None:
+                entities, response["incremental"] = model.incremental.parse(str(session_id), text)
+            else:
+                entities = parse_by_line(model.batcher.parse_many if model.batcher else model.parse_many, [text])[0]
+        model_seconds = time.perf_counter() - model_started
+        STAGE_SECONDS.observe(model_seconds, endpoint=endpoint, stage="model")
+        # Sessions only re-parse changed lines, so their timings aren't comparable.
+        # With micro-batching, the primary's time includes the batching wait.
+        if shadow and session_id is None:
+            shadow.submit(text, entities, model_seconds)
+        if cache:
+            cache.put(cache_key, entities)
+        if disk_cache:
+            disk_cache.put(cache_key, entities)
+
+    _count_entities(entities)
 
     # Send the list of entities back to our Swift app
-    return jsonify({"entities": entities})
+    response["entities"] = entities
+    with STAGE_SECONDS.time(endpoint=endpoint, stage="normalize"):
+        response["datetime"] = normalizer.resolve(*date_time_texts(entities), reference)
+    return response
+
+
+# 6. Define the "/parse_batch" endpoint
+# Body: {"texts": ["...", ...], "ids": [...], "batch_size": 64, "n_process": 1,
+#        "reference": "2025-01-06T09:00:00", "timezone": "America/New_York"}
+# "ids" is optional (defaults to the list index); results come back in input order.
+@app.route("/parse_batch", methods=["POST"])
+def parse_batch():
+    if not model_ready.is_set():
+        return _not_ready_response()
+
+    data = request.get_json(silent=True)
+
+    if not isinstance(data, dict) or "texts" not in data:
+        return jsonify({"error": "No 'texts' field provided"}), 400
+
+    texts = data["texts"]
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return jsonify({"error": "'texts' must be a list of strings"}), 400
+    if len(texts) > MAX_BATCH_TEXTS:
+        return jsonify({"error": f"At most {MAX_BATCH_TEXTS} texts per batch"}), 413
+
+    ids = data.get("ids")
+    if ids is None:
+        ids = list(range(len(texts)))
+    elif not isinstance(ids, list) or len(ids) != len(texts):
+        return jsonify({"error": "'ids' must be a list with one id per text"}), 400
+
+    try:
+        batch_size = _positive_int(data.get("batch_size"), BATCH_SIZE)
+        n_process = _positive_int(data.get("n_process"), N_PROCESS)
+    except ValueError:
+        return jsonify({"error": "'batch_size' and 'n_process' must be positive integers"}), 400
+    try:
+        reference = _reference(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    n_process = min(n_process, os.cpu_count() or 1, max(len(texts), 1))
+
+    # Only texts that pass the prefilter go to the model
+    if prefilter and not data.get("bypass_prefilter"):
+        keep = [i for i, text in enumerate(texts) if prefilter.should_parse(text)]
+    else:
+        keep = list(range(len(texts)))
+
+    for text in texts:
+        INPUT_CHARS.observe(len(text), endpoint="parse_batch")
+    entities = [[] for _ in texts]
+    model = acquire_model()
+    try:
+        g.model_version = model.version
+        # Texts already in the result caches (same keys as /parse) skip the
+        # model, and a text that appears more than once is parsed once
+        cache, disk_cache = model.cache, model.disk_cache
+        keys, pending = {}, {}  # text -> cache key, text -> indices still to parse
+        with STAGE_SECONDS.time(endpoint="parse_batch", stage="cache"):
+            for i in keep:
+                text = texts[i]
+                if text in pending:
+                    pending[text].append(i)
+                    continue
+                cached = None
+                if cache or disk_cache:
+                    keys[text] = (cache or disk_cache).key(text, "lines")
+                    cached = cache.get(keys[text]) if cache else None
+                    if cached is None and disk_cache:
+                        cached = disk_cache.get(keys[text])
+                        if cached is not None and cache:
+                            cache.put(keys[text], cached)
+                if cached is None:
+                    pending[text] = [i]
+                else:
+                    entities[i] = cached
+                    _count_entities(cached)
+        misses = list(pending)
+        n_process = min(n_process, max(len(misses), 1))
+
+        # Line by line, like /parse; results come back in input order.
+        # Each chunk of batch_size texts takes its own auto-lane model slot, so
+        # /parse requests get a turn in between; with n_process > 1 the whole
+        # call is one chunk, since every nlp.pipe call forks its workers afresh.
+        chunk_size = max(len(misses), 1) if n_process > 1 else batch_size
+        for chunk_start in range(0, len(misses), chunk_size):
+            chunk = misses[chunk_start:chunk_start + chunk_size]
+            with admitted("parse_batch"), STAGE_SECONDS.time(endpoint="parse_batch", stage="model"):
+                results = parse_by_line(
+                    lambda lines: [doc_to_entities(doc) for doc in
+                                   model.nlp.pipe(lines, batch_size=batch_size, n_process=n_process)],
+                    chunk)
+            for text, text_entities in zip(chunk, results):
+                for i in pending[text]:
+                    entities[i] = text_entities
+                    _count_entities(text_entities)
+                if cache:
+                    cache.put(keys[text], text_entities)
+                if disk_cache:
+                    disk_cache.put(keys[text], text_entities)
+    except Rejected as e:
+        response = jsonify({"error": str(e), "reason": e.reason, "model_version": model.version})
+        if e.reason == "shed":
+            response.headers["Retry-After"] = "1"
+        return response, e.status
+    finally:
+        model.release()
+    # One reference for the whole batch, so repeated phrases hit the same cache entries
+    with STAGE_SECONDS.time(endpoint="parse_batch", stage="normalize"):
+        datetimes = normalizer.resolve_many([date_time_texts(e) for e in entities], reference)
+    results = [
+        {"id": text_id, "entities": text_entities, "datetime": text_datetime}
+        for text_id, text_entities, text_datetime in zip(ids, entities, datetimes)
+    ]
+
+    print(f"Processed batch of {len(results)} texts "
+          f"(batch_size={batch_size}, n_process={n_process}).")
+
+    with STAGE_SECONDS.time(endpoint="parse_batch", stage="serialize"):
+        return jsonify({"results": results, "model_version": model.version})
+
+
+# 7. Define the "/parse_stream" endpoint
+# Body: {"text": "...", "budget_ms": 500, "chunk_chars": 2000}
+# Answers with newline-delimited JSON: one line per chunk as soon as it is parsed
+#   {"chunk": 0, "start": 0, "end": 1834, "entities": [...]}   (absolute offsets)
+# and a final summary line
+#   {"done": true, "chunks": 12, "parsed": 12, "skipped": 0, "partial": false, "elapsed_ms": 41.2,
+#    "model_version": "v3"}
+# When "budget_ms" runs out, the stream ends early with "partial": true. So it
+# does when admission control sheds the next group of chunks, and the summary
+# line then also has "reason": "shed".
+@app.route("/parse_stream", methods=["POST"])
+def parse_stream():
+    if not model_ready.is_set():
+        return _not_ready_response()
+
+    data = request.get_json(silent=True)
+
+    if not isinstance(data, dict) or not isinstance(data.get("text"), str):
+        return jsonify({"error": "No 'text' field provided"}), 400
+
+    try:
+        chunk_chars = min(_positive_int(data.get("chunk_chars"), STREAM_CHUNK_CHARS), serving.nlp.max_length)
+    except ValueError:
+        return jsonify({"error": "'chunk_chars' must be a positive integer"}), 400
+    budget_ms = data.get("budget_ms")
+    if budget_ms is not None and (isinstance(budget_ms, bool) or not isinstance(budget_ms, (int, float)) or budget_ms <= 0):
+        return jsonify({"error": "'budget_ms' must be a positive number"}), 400
+
+    text = data["text"]
+    INPUT_CHARS.observe(len(text), endpoint="parse_stream")
+    chunks = [(i, offset, chunk) for i, (offset, chunk) in enumerate(split_chunks(text, chunk_chars))]
+    if prefilter and not data.get("bypass_prefilter"):
+        keep = [item for item in chunks if prefilter.should_parse(item[2])]
+    else:
+        keep = chunks
+
+    # Held until the body is done, since it outlives this handler
+    model = acquire_model()
+    g.model_version = model.version
+
+    def generate():
+        try:
+            yield from stream(model)
+        finally:
+            model.release()
+
+    def stream(model):
+        started = time.perf_counter()
+        deadline = started + budget_ms / 1000 if budget_ms else None
+        parsed = 0
+        partial = False
+        reason = None
+
+        # STREAM_BATCH_CHUNKS chunks per nlp.pipe call (line by line, like
+        # /parse), each call in its own auto-lane model slot; stopping early
+        # means later chunks are never parsed
+        for group_start in range(0, len(keep), STREAM_BATCH_CHUNKS):
+            group = keep[group_start:group_start + STREAM_BATCH_CHUNKS]
+            try:
+                with admitted("parse_stream"), STAGE_SECONDS.time(endpoint="parse_stream", stage="model"):
+                    results = parse_by_line(model.parse_many, [chunk for _, _, chunk in group])
+            except Rejected as e:
+                partial, reason = True, e.reason
+                break
+            for (i, offset, chunk), entities in zip(group, results):
+                _count_entities(entities)
+                for ent in entities:
+                    ent["start"] += offset
+                    ent["end"] += offset
+                parsed += 1
+                yield json.dumps({"chunk": i, "start": offset, "end": offset + len(chunk), "entities": entities}) + "\n"
+                if deadline and parsed < len(keep) and time.perf_counter() > deadline:
+                    partial = True
+                    break
+            if partial:
+                break
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        # after_request fires before the body is streamed, so time the whole stream here
+        STAGE_SECONDS.observe(time.perf_counter() - started, endpoint="parse_stream", stage="stream")
+        print(f"Streamed {parsed}/{len(keep)} chunks of a {len(text)}-char text in {elapsed_ms:.0f}ms"
+              f"{f' ({reason})' if reason else ' (budget hit)' if partial else ''}.")
+        summary = {
+            "done": True,
+            "chunks": len(chunks),
+            "parsed": parsed,
+            "skipped": len(chunks) - len(keep),
+            "partial": partial,
+            "elapsed_ms": elapsed_ms,
+            "model_version": model.version,
+        }
+        if reason:
+            summary["reason"] = reason
+        yield json.dumps(summary) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+# 8. Runtime stats (micro-batcher latency percentiles, queue depth, cache and
+#    incremental-parse and prefilter counters)
+@app.route("/stats", methods=["GET"])
+def stats():
+    model = serving
+    return jsonify({
+        "model": model.info() if model else None,
+        "swap": swap_state,
+        "batcher": model.batcher.stats() if model and model.batcher else None,
+        "cache": model.cache.stats() if model and model.cache else None,
+        "disk_cache": model.disk_cache.stats() if model and model.disk_cache else None,
+        "incremental": model.incremental.stats() if model else None,
+        "prefilter": prefilter.stats() if prefilter else None,
+        "profiler": profiler.stats() if profiler else None,
+        "normalizer": normalizer.stats(),
+        "shadow": shadow.stats() if shadow else None,
+        "socket": socket_server.stats() if socket_server else None,
+        "admission": admission.stats() if admission else None,
+    })
+
+
+# 9. Liveness and readiness
+# /healthz: the process is up and the model hasn't failed to load.
+# /readyz: the model is loaded and warmed up, so /parse will answer.
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    if model_state["status"] == "failed":
+        return jsonify({"status": "failed", "error": model_state["error"]}), 500
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    body = {"status": model_state["status"], "stages": model_state["stages"],
+            "model_dir": serving.path if serving else model_dir,
+            "model_version": serving.version if serving else None}
+    return jsonify(body), (200 if model_ready.is_set() else 503)
+
+
+# 10. Prometheus metrics
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    endpoint = request.url_rule.rule.lstrip("/") if request.url_rule else "unknown"
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    if hasattr(g, "request_started"):
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, endpoint=endpoint)
+    if hasattr(g, "model_version"):
+        response.headers["X-Model-Version"] = g.model_version
+    return response
+
+
+def _stat(component, key):
+    """Read one field of a component's stats() at scrape time (None if it's off)"""
+    return lambda: component().stats()[key] if component() else None
+
+
+def _of_model(name):
+    """A component of whichever model is active at scrape time"""
+    return lambda: getattr(serving, name) if serving else None
+
+
+REGISTRY.callback("eventsniffer_model_ready", "1 once the model is loaded and warmed up",
+                  lambda: 1 if model_ready.is_set() else 0)
+REGISTRY.callback("eventsniffer_model_swaps_total", "Model versions swapped in after startup",
+                  lambda: swap_state["swaps"], "counter")
+REGISTRY.callback("eventsniffer_cache_entries", "Parse cache entries", _stat(_of_model("cache"), "size"))
+REGISTRY.callback("eventsniffer_cache_hits_total", "Parse cache hits", _stat(_of_model("cache"), "hits"), "counter")
+REGISTRY.callback("eventsniffer_cache_misses_total", "Parse cache misses", _stat(_of_model("cache"), "misses"), "counter")
+REGISTRY.callback("eventsniffer_cache_evictions_total", "Parse cache LRU evictions",
+                  _stat(_of_model("cache"), "evictions"), "counter")
+# Attributes rather than stats(), which counts the rows on disk
+REGISTRY.callback("eventsniffer_disk_cache_hits_total", "Disk cache hits",
+                  lambda: serving.disk_cache.hits if serving and serving.disk_cache else None, "counter")
+REGISTRY.callback("eventsniffer_disk_cache_misses_total", "Disk cache misses",
+                  lambda: serving.disk_cache.misses if serving and serving.disk_cache else None, "counter")
+REGISTRY.callback("eventsniffer_disk_cache_evictions_total", "Disk cache LRU evictions",
+                  lambda: serving.disk_cache.evictions if serving and serving.disk_cache else None, "counter")
+REGISTRY.callback("eventsniffer_batcher_queue_depth", "Requests waiting in the micro-batcher",
+                  _stat(_of_model("batcher"), "queue_depth"))
+REGISTRY.callback("eventsniffer_admission_queue_depth", "Requests waiting for a model slot",
+                  lambda: sum(admission.stats()["waiting"].values()) if admission else None)
+REGISTRY.callback("eventsniffer_batcher_batches_total", "Micro-batches run",
+                  _stat(_of_model("batcher"), "batches"), "counter")
+REGISTRY.callback("eventsniffer_incremental_sessions", "Live incremental-parse sessions",
+                  _stat(_of_model("incremental"), "sessions"))
+REGISTRY.callback("eventsniffer_incremental_lines_reused_total", "Lines answered from a session",
+                  _stat(_of_model("incremental"), "lines_reused"), "counter")
+REGISTRY.callback("eventsniffer_prefilter_skipped_total", "Texts the prefilter kept away from NER",
+                  _stat(lambda: prefilter, "skipped"), "counter")
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    if metrics_dir:
+        metrics_dir.write()  # this worker's numbers as of now; the others' are at most METRICS_WRITE_S old
+        return Response(metrics_dir.render(), mimetype=None, content_type=CONTENT_TYPE)
+    return Response(REGISTRY.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+
+def start_metrics_writer():
+    """serve.py workers: keep this process's file in METRICS_DIR current"""
+    def run():
+        while True:
+            time.sleep(METRICS_WRITE_S)
+            try:
+                metrics_dir.write()
+            except OSError as e:
+                print(f"⚠️  Could not write metrics: {e}")
+
+    thread = threading.Thread(target=run, name="metrics-writer", daemon=True)
+    thread.start()
+    return thread
+
+
+# 11. Slow-request profiles (only with EVENTSNIFFER_PROFILE_SLOW_MS set, localhost only)
+# GET /debug/slow            recent slow requests, newest first
+# GET /debug/slow/<id>       top functions by cumulative time
+# GET /debug/slow/<id>.prof  raw cProfile stats (snakeviz, flameprof, pstats)
+def _debug_allowed():
+    return profiler is not None and request.remote_addr in ("127.0.0.1", "::1")
+
+
+@app.route("/debug/slow", methods=["GET"])
+def debug_slow_list():
+    if not _debug_allowed():
+        return jsonify({"error": "Not found"}), 404
+    return jsonify({"stats": profiler.stats(), "profiles": profiler.list()})
+
+
+@app.route("/debug/slow/<int:profile_id>", methods=["GET"])
+def debug_slow_summary(profile_id):
+    entry = profiler.get(profile_id) if _debug_allowed() else None
+    if entry is None:
+        return jsonify({"error": "Not found"}), 404
+    return Response(entry["summary"], mimetype="text/plain")
+
+
+@app.route("/debug/slow/<int:profile_id>.prof", methods=["GET"])
+def debug_slow_download(profile_id):
+    entry = profiler.get(profile_id) if _debug_allowed() else None
+    if entry is None:
+        return jsonify({"error": "Not found"}), 404
+    return Response(entry["prof"], mimetype="application/octet-stream",
+                    headers={"Content-Disposition": f"attachment; filename=slow_{profile_id}.prof"})
+
+
+# 12. Model versions (localhost only)
+# GET  /admin/models        active version, swap state and every version on disk
+# POST /admin/models/load   {"version": "v3"} pins and loads that version;
+#                           {} or {"version": "latest"} unpins and loads the newest.
+#                           Answers 202 right away; "wait": true answers once swapped.
+@app.route("/admin/models", methods=["GET"])
+def admin_models():
+    if request.remote_addr not in ("127.0.0.1", "::1"):
+        return jsonify({"error": "Not found"}), 404
+    return jsonify({
+        "active": serving.info() if serving else None,
+        "swap": swap_state,
+        "pinned": registry.pinned,
+        "versions": registry.describe(),
+    })
+
+
+@app.route("/admin/models/load", methods=["POST"])
+def admin_models_load():
+    if request.remote_addr not in ("127.0.0.1", "::1"):
+        return jsonify({"error": "Not found"}), 404
+    if not model_ready.is_set():
+        return _not_ready_response()
+
+    data = request.get_json(silent=True) or {}
+    version = data.get("version")
+    if version == "latest":
+        version = None
+    if version is not None:
+        try:
+            registry.path(str(version))
+        except KeyError:
+            return jsonify({"error": f"Unknown version '{version}'", "versions": registry.versions()}), 404
+
+    if control_pid is not None and control_pid != os.getpid():
+        # A serve.py worker: the master loads the model and restarts the workers
+        if version is not None:
+            return jsonify({"error": "Pinning a version needs the single-process server; "
+                                     "under serve.py, make it the newest version instead"}), 409
+        os.kill(control_pid, signal.SIGHUP)
+        return jsonify({"status": "reloading", "via": "master"}), 202
+
+    registry.pinned = version
+    if data.get("wait"):
+        swapped = swap_model(version)
+        status = 200 if swapped or swap_state["status"] != "failed" else 500
+        return jsonify({"swapped": swapped, "active": serving.info(), "swap": swap_state}), status
+    swap_model_in_background(version)
+    return jsonify({"status": "loading", "version": version or registry.resolve()[0]}), 202
+
+
+# 13. Unix domain socket listener (only with EVENTSNIFFER_SOCKET set)
+def handle_socket_request(message):
+    """One socket frame: the /parse body plus "code", the status /parse would have used"""
+    started = time.perf_counter()
+    body, status = parse_request(message, endpoint="socket")
+    REQUESTS.inc(endpoint="socket", status=status)
+    REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="socket")
+    body["code"] = status
+    return body
+
+
+def start_socket_server(listener=None):
+    """Listen on EVENTSNIFFER_SOCKET; serve.py binds it before forking and passes it in"""
+    global socket_server
+    if listener is None:
+        if not SOCKET_PATH:
+            return None
+        listener = bind(SOCKET_PATH)
+    socket_server = LocalSocketServer(listener, handle_socket_request, threads=SOCKET_THREADS)
+    socket_server.start()
+    return socket_server
+
 
-# 6. Run the server
+# 14. Run the server
 if __name__ == "__main__":
-    print("Starting Flask server on http://127.0.0.1:5000 ...")
+    load_model_in_background()
+    if start_socket_server():
+        print(f"Listening on unix:{SOCKET_PATH} ...")
+    print(f"Starting Flask server on http://127.0.0.1:{PORT} ...")
     # 'host="0.0.0.0"' makes it accessible on your local network
     # We use 127.0.0.1 (localhost) for our Swift app
-    app.run(port=5000, host="127.0.0.1")
\ No newline at end of file
+    # threaded=True lets concurrent /parse requests meet in the micro-batcher
+    app.run(port=PORT, host="127.0.0.1", threaded=True)
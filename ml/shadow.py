@@ -0,0 +1,254 @@
+"""
+Shadow evaluation of a candidate model
+Mirrors a sampled fraction of /parse inputs, together with the primary
+model's entities and model time, to a candidate model running in its own
+process. Per label, it counts entities both models found, found only by the
+primary, and found only by the candidate, plus the candidate-minus-primary
+latency, so a retrained model can be judged on real traffic before it is
+promoted. The mirror queue is bounded: when the candidate falls behind, new
+work is dropped instead of slowing down the request path.
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+from batching import percentile
+from incremental import parse_by_line
+from metrics import REGISTRY
+
+# Candidate minus primary model time, in seconds; negative means the candidate was faster
+DELTA_BUCKETS = (-1.0, -0.25, -0.1, -0.05, -0.025, -0.01, -0.005, -0.001, 0.0,
+                 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+SHADOW_REQUESTS = REGISTRY.counter(
+    "eventsniffer_shadow_requests_total", "Sampled /parse inputs by outcome", ["outcome"])
+SHADOW_ENTITIES = REGISTRY.counter(
+    "eventsniffer_shadow_entities_total", "Shadowed entities by label and which model found them",
+    ["label", "found_by"])
+SHADOW_SECONDS = REGISTRY.histogram(
+    "eventsniffer_shadow_model_seconds", "Model time on shadowed texts", ["model"])
+SHADOW_DELTA = REGISTRY.histogram(
+    "eventsniffer_shadow_latency_delta_seconds", "Candidate minus primary model time per text",
+    buckets=DELTA_BUCKETS)
+
+
+def compare(primary: List[Dict], candidate: List[Dict]) -> Dict[str, Dict[str, int]]:
+    """Per label: {"both", "primary", "candidate"} counts of exact (start, end, label) matches"""
+    from evaluator import match_spans
+
+    primary_spans = [(e["start"], e["end"], e["label"]) for e in primary]
+    candidate_spans = [(e["start"], e["end"], e["label"]) for e in candidate]
+    counts = match_spans(primary_spans, candidate_spans)["exact"]
+    return {label: {"both": c["tp"], "primary": c["fn"], "candidate": c["fp"]} for label, c in counts.items()}
+
+
+def _candidate_worker(model_dir: str, jobs, results):
+    """Runs in the shadow process: parse each mirrored text and send back the comparison"""
+    import spacy
+    import compact_vectors  # noqa: F401 (lets spacy.load read export_model.py --half models)
+
+    nlp = spacy.load(model_dir)
+    results.put(("ready", None))
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        text, primary, primary_seconds = job
+        try:
+            started = time.perf_counter()
+            # Line by line, like the primary (see incremental.py)
+            candidate = parse_by_line(lambda lines: [[{"start": e.start_char, "end": e.end_char, "label": e.label_}
+                                                      for e in doc.ents] for doc in nlp.pipe(lines)], [text])[0]
+            seconds = time.perf_counter() - started
+            results.put(("done", (primary_seconds, seconds, compare(primary, candidate),
+                                  _same(primary, candidate))))
+        except Exception as e:
+            results.put(("error", f"{type(e).__name__}: {e}"))
+
+
+def _same(primary: List[Dict], candidate: List[Dict]) -> bool:
+    key = lambda e: (e["start"], e["end"], e["label"])  # noqa: E731
+    return sorted(map(key, primary)) == sorted(map(key, candidate))
+
+
+class ShadowEvaluator:
+    """
+    Sends a random `sample_rate` fraction of texts to `model_dir` in a
+    separate process. At most `max_queue` texts wait for it; beyond that they
+    are counted as dropped. There is a single candidate process, started by
+    start(); processes forked afterwards (serve.py's workers) feed the same
+    one, so the candidate model is loaded once however many workers there are.
+    """
+
+    def __init__(self, model_dir: str, sample_rate: float = 0.1, max_queue: int = 64, latency_window: int = 2048):
+        self.model_dir = model_dir
+        self.sample_rate = sample_rate
+        self.max_queue = max_queue
+        self.stats_path = None
+
+        self._owner = None  # pid of the process that started the candidate
+        self._jobs = None
+        self._results = None
+        self._process = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._labels = {}  # label -> {"both", "primary", "candidate"}
+        self._deltas_ms = deque(maxlen=latency_window)
+        self.ready = False
+        # Shared memory, so forked workers count into the same totals
+        self._sampled = multiprocessing.Value("q", 0)
+        self._dropped = multiprocessing.Value("q", 0)
+        self.compared = 0
+        self.identical = 0
+        self.errors = 0
+
+    def start(self, stats_path: str = None):
+        """
+        Start the candidate process, once. By default a "shadow-results" thread
+        handles what it sends back. With `stats_path` (serve.py's master, which
+        must not run threads when it forks) the caller drains the results with
+        poll() instead, which writes stats() there for the forked workers.
+        """
+        with self._start_lock:
+            if self._owner is not None or multiprocessing.parent_process() is not None:
+                # Already started, or this is a spawned child that re-imported the server
+                return
+            self._owner = os.getpid()
+        context = multiprocessing.get_context("spawn")
+        self._jobs = context.Queue(maxsize=self.max_queue)
+        self._results = context.Queue()
+        self._process = context.Process(target=_candidate_worker, args=(self.model_dir, self._jobs, self._results),
+                                        name="shadow-model", daemon=True)
+        self._process.start()
+        self.stats_path = stats_path
+        if stats_path and os.path.exists(stats_path):
+            os.remove(stats_path)  # from an earlier run
+        if stats_path is None:
+            threading.Thread(target=self._collect, name="shadow-results", daemon=True).start()
+
+    def _running(self) -> bool:
+        if self._jobs is None:
+            return False
+        if self._owner == os.getpid():
+            return self._process.is_alive()
+        # Forked from the owner: is_alive() only works there, and a dead
+        # candidate just leaves the queue full, so samples are dropped
+        return True
+
+    def submit(self, text: str, primary: List[Dict], primary_seconds: float) -> bool:
+        """Maybe mirror one parse; never blocks. Returns True if it was queued"""
+        if random.random() >= self.sample_rate:
+            return False
+        with self._sampled.get_lock():
+            self._sampled.value += 1
+        try:
+            if not self._running():
+                raise queue.Full
+            self._jobs.put_nowait((text, primary, primary_seconds))
+        except queue.Full:
+            with self._dropped.get_lock():
+                self._dropped.value += 1
+            SHADOW_REQUESTS.inc(outcome="dropped")
+            return False
+        return True
+
+    def _collect(self):
+        while True:
+            self._handle(*self._results.get())
+
+    def poll(self) -> int:
+        """Handle every result waiting, without blocking; returns how many there were"""
+        handled = 0
+        while True:
+            try:
+                self._handle(*self._results.get_nowait())
+            except queue.Empty:
+                break
+            handled += 1
+        if handled and self.stats_path:
+            tmp = f"{self.stats_path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.stats(), f)
+            os.replace(tmp, self.stats_path)
+        return handled
+
+    def _handle(self, kind, payload):
+        if kind == "ready":
+            self.ready = True
+            print(f"✅ Shadow model loaded from {self.model_dir}")
+            return
+        if kind == "error":
+            with self._stats_lock:
+                self.errors += 1
+            SHADOW_REQUESTS.inc(outcome="error")
+            print(f"⚠️  Shadow model error: {payload}")
+            return
+
+        primary_seconds, candidate_seconds, counts, same = payload
+        SHADOW_REQUESTS.inc(outcome="compared")
+        SHADOW_SECONDS.observe(primary_seconds, model="primary")
+        SHADOW_SECONDS.observe(candidate_seconds, model="candidate")
+        SHADOW_DELTA.observe(candidate_seconds - primary_seconds)
+        for label, c in counts.items():
+            for found_by, n in c.items():
+                if n:
+                    SHADOW_ENTITIES.inc(n, label=label, found_by=found_by)
+        with self._stats_lock:
+            self.compared += 1
+            self.identical += int(same)
+            self._deltas_ms.append((candidate_seconds - primary_seconds) * 1000)
+            for label, c in counts.items():
+                totals = self._labels.setdefault(label, {"both": 0, "primary": 0, "candidate": 0})
+                for key, n in c.items():
+                    totals[key] += n
+
+    def close(self):
+        if self._owner == os.getpid():
+            try:
+                self._jobs.put_nowait(None)
+            except queue.Full:
+                self._process.terminate()
+
+    def stats(self) -> Dict:
+        """Agreement per label is an F1 of the candidate against the primary's entities"""
+        if self.stats_path and self._owner != os.getpid():
+            # A worker forked from serve.py's master, which collects the comparisons
+            try:
+                with open(self.stats_path) as f:
+                    stats = json.load(f)
+            except (OSError, ValueError):
+                stats = self._stats()
+        else:
+            stats = self._stats()
+        stats.update(sampled=self._sampled.value, dropped=self._dropped.value)
+        return stats
+
+    def _stats(self) -> Dict:
+        with self._stats_lock:
+            labels = {}
+            for label, c in sorted(self._labels.items()):
+                denominator = 2 * c["both"] + c["primary"] + c["candidate"]
+                labels[label] = dict(c, agreement=(2 * c["both"] / denominator) if denominator else 1.0)
+            deltas = sorted(self._deltas_ms)
+            return {
+                "model_dir": self.model_dir,
+                "ready": self.ready,
+                "sample_rate": self.sample_rate,
+                "compared": self.compared,
+                "errors": self.errors,
+                "identical_rate": self.identical / self.compared if self.compared else 0.0,
+                "labels": labels,
+                "latency_delta_ms": {
+                    "p50": percentile(deltas, 50),
+                    "p95": percentile(deltas, 95),
+                    "mean": sum(deltas) / len(deltas) if deltas else 0.0,
+                },
+            }
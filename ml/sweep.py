@@ -0,0 +1,202 @@
+"""
+Parallel hyperparameter sweep for train_v2.train_model
+Runs a grid (or a random sample of it) over iterations, dropout and batch
+size in a process pool, one trial per core. Each trial gets its own seed and
+output directory and is scored on the corpus dev split. Trials whose dev
+F-score falls clearly below the median of the others at the same checkpoint
+are cancelled early (median stopping rule).
+
+Usage:
+    python sweep.py
+    python sweep.py --iterations 30,50 --dropout 0.2,0.35,0.5 --batch-size 4,8,16
+    python sweep.py --random 8 --workers 4 --base blank:en
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+SWEEP_ROOT = Path(__file__).resolve().parent / "sweeps"
+
+
+def make_trials(iterations: List[int], dropouts: List[float], batch_sizes: List[int],
+                n_random: int = 0, seed: int = 0) -> List[Dict[str, Any]]:
+    """Every grid point, or n_random of them sampled without replacement"""
+    grid = [
+        {"iterations": it, "dropout": dr, "batch_size": bs}
+        for it, dr, bs in itertools.product(iterations, dropouts, batch_sizes)
+    ]
+    if n_random and n_random < len(grid):
+        grid = random.Random(seed).sample(grid, n_random)
+    return [dict(config, trial=i, seed=seed + i) for i, config in enumerate(grid)]
+
+
+class MedianStopper:
+    """
+    Cancel a trial when its dev F at a checkpoint is more than `margin` below
+    the median of what other trials scored at that checkpoint. Needs at least
+    `min_peers` other trials to have reported, so early trials always run.
+    Scores live in a Manager dict ("iteration:trial" -> dev F) so every
+    worker process sees them; each trial only ever writes its own keys.
+    """
+
+    def __init__(self, shared: Dict, trial: int, margin: float = 0.05, min_peers: int = 2):
+        self.shared = shared
+        self.trial = trial
+        self.margin = margin
+        self.min_peers = min_peers
+
+    def __call__(self, iteration: int, dev_f: float) -> bool:
+        prefix = f"{iteration}:"
+        own = f"{prefix}{self.trial}"
+        peers = [f for key, f in self.shared.items() if key.startswith(prefix) and key != own]
+        self.shared[own] = dev_f
+        if len(peers) < self.min_peers:
+            return False
+        return dev_f < statistics.median(peers) - self.margin
+
+
+def run_trial(config: Dict[str, Any], sweep_dir: str, base: str, eval_every: int,
+              shared: Dict, margin: float, corpus_dir: str = None) -> Dict[str, Any]:
+    """Train one configuration in this worker process; the log goes to trial_NN/train.log"""
+    from train_v2 import train_model
+
+    trial_dir = Path(sweep_dir) / f"trial_{config['trial']:02d}"
+    trial_dir.mkdir(parents=True, exist_ok=True)
+    (trial_dir / "config.json").write_text(json.dumps(config, indent=2))
+
+    stopper = MedianStopper(shared, config["trial"], margin=margin)
+    started = time.perf_counter()
+    log = io.StringIO()
+    error = None
+    result = None
+    try:
+        with contextlib.redirect_stdout(log):
+            result = train_model(
+                iterations=config["iterations"], dropout=config["dropout"],
+                batch_size=config["batch_size"], seed=config["seed"],
+                output_dir=trial_dir / "model", base=base,
+                eval_every=eval_every, on_eval=stopper, quick_check=False,
+                corpus_dir=corpus_dir,
+            )
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    (trial_dir / "train.log").write_text(log.getvalue())
+
+    row = dict(config)
+    row.update({
+        "wall_seconds": time.perf_counter() - started,
+        "status": "error" if error or result is None else ("cancelled" if result["cancelled"] else "done"),
+        "error": error,
+        "iterations_run": result["iterations"] if result else 0,
+        "best_loss": result["best_loss"] if result else None,
+        "dev": result["dev"] if result else None,
+        "model_dir": result["output_dir"] if result else None,
+    })
+    (trial_dir / "result.json").write_text(json.dumps(row, indent=2))
+    return row
+
+
+def _dev_f(row):
+    return row["dev"]["ents_f"] if row.get("dev") else -1.0
+
+
+def print_leaderboard(rows: List[Dict[str, Any]]):
+    print("\n🏆 LEADERBOARD (dev F)")
+    print(f"   {'#':>3} {'iters':>6} {'dropout':>8} {'batch':>6} {'dev F':>7} {'P':>6} {'R':>6} "
+          f"{'wall':>8}  status")
+    for row in rows:
+        dev = row["dev"] or {}
+        print(f"   {row['trial']:>3} {row['iterations_run']:>3}/{row['iterations']:<3}"
+              f"{row['dropout']:>7.2f} {row['batch_size']:>6} {dev.get('ents_f', 0):>7.3f} "
+              f"{dev.get('ents_p', 0):>6.3f} {dev.get('ents_r', 0):>6.3f} {row['wall_seconds']:>7.1f}s  "
+              f"{row['status']}{' - ' + row['error'] if row['error'] else ''}")
+
+
+def run_sweep(trials: List[Dict[str, Any]], sweep_dir: Path, base: str, workers: int,
+              eval_every: int, margin: float, corpus_dir: str = None) -> List[Dict[str, Any]]:
+    from corpus import build_corpus
+
+    # Build the corpus once up front so trials only read it
+    if corpus_dir is None:
+        build_corpus("training_data_v2", base=base)
+
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+    # One BLAS thread per trial, otherwise N trials fight over every core
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "BLIS_NUM_THREADS"):
+        os.environ.setdefault(var, "1")
+
+    rows = []
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        shared = manager.dict()
+        futures = {
+            pool.submit(run_trial, config, str(sweep_dir), base, eval_every, shared, margin, corpus_dir): config
+            for config in trials
+        }
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            print(f"   trial {row['trial']:02d} {row['status']:9} dev F={_dev_f(row):.3f} "
+                  f"({row['wall_seconds']:.0f}s) {json.dumps(futures[future])}")
+
+    rows.sort(key=_dev_f, reverse=True)
+    return rows
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for train_v2")
+    arg_parser.add_argument("--iterations", default="30,50")
+    arg_parser.add_argument("--dropout", default="0.2,0.35,0.5")
+    arg_parser.add_argument("--batch-size", default="4,8,16")
+    arg_parser.add_argument("--random", type=int, default=0,
+                            help="Sample this many grid points instead of the full grid")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--base", default="en_core_web_lg",
+                            help="Base model ('blank:en' for a quick blank pipeline)")
+    arg_parser.add_argument("--eval-every", type=int, default=5,
+                            help="Dev checkpoint interval for early cancellation (0 disables)")
+    arg_parser.add_argument("--margin", type=float, default=0.05,
+                            help="Cancel trials this far below the checkpoint median")
+    arg_parser.add_argument("--corpus", default=None,
+                            help="Corpus directory to train on (e.g. from generate_data.py)")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--out", default=None, help="Sweep directory (default sweeps/<timestamp>)")
+    args = arg_parser.parse_args()
+
+    trials = make_trials(
+        [int(v) for v in args.iterations.split(",")],
+        [float(v) for v in args.dropout.split(",")],
+        [int(v) for v in args.batch_size.split(",")],
+        n_random=args.random, seed=args.seed,
+    )
+    sweep_dir = Path(args.out) if args.out else SWEEP_ROOT / datetime.now().strftime("%Y%m%d_%H%M%S")
+    print(f"🔍 Sweeping {len(trials)} trials on {args.workers} workers -> {sweep_dir}")
+
+    started = time.perf_counter()
+    rows = run_sweep(trials, sweep_dir, args.base, args.workers, args.eval_every, args.margin,
+                     corpus_dir=str(Path(args.corpus).resolve()) if args.corpus else None)
+    print_leaderboard(rows)
+
+    leaderboard = {
+        "base": args.base,
+        "wall_seconds": time.perf_counter() - started,
+        "args": vars(args),
+        "trials": rows,
+    }
+    (sweep_dir / "leaderboard.json").write_text(json.dumps(leaderboard, indent=2))
+    print(f"\n✅ Leaderboard saved to '{sweep_dir / 'leaderboard.json'}'")
+    if rows and rows[0]["model_dir"]:
+        print(f"   Best model: {rows[0]['model_dir']}")
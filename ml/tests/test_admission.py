@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Rejected
+
+
+def _wait_in_background(controller, priority, stream=None, deadline=None):
+    """Start a waiting acquire(); returns (thread, outcome dict)"""
+    outcome = {}
+
+    def run():
+        try:
+            controller.acquire(priority, deadline, stream)
+            outcome["admitted"] = True
+            controller.release()
+        except Rejected as e:
+            outcome["reason"] = e.reason
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def _until_waiting(controller, n):
+    for _ in range(200):
+        if sum(controller.stats()["waiting"].values()) == n:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"expected {n} waiting")
+
+
+def test_newer_request_on_same_stream_supersedes_waiting_one():
+    controller = AdmissionController(max_running=1, max_queue=8)
+    controller.acquire("auto")
+    old, old_outcome = _wait_in_background(controller, "auto", stream="window")
+    _until_waiting(controller, 1)
+    new, new_outcome = _wait_in_background(controller, "auto", stream="window")
+    old.join(1)
+    assert old_outcome == {"reason": "superseded"}
+    controller.release()
+    new.join(1)
+    assert new_outcome == {"admitted": True}
+
+
+def test_auto_request_does_not_supersede_waiting_manual_scan():
+    controller = AdmissionController(max_running=1, max_queue=8)
+    controller.acquire("auto")
+    manual, manual_outcome = _wait_in_background(controller, "manual", stream="window")
+    _until_waiting(controller, 1)
+    auto, auto_outcome = _wait_in_background(controller, "auto", stream="window")
+    _until_waiting(controller, 2)
+    controller.release()
+    manual.join(1)
+    auto.join(1)
+    assert manual_outcome == {"admitted": True}
+    assert auto_outcome == {"admitted": True}
+
+
+def test_manual_request_supersedes_waiting_auto_scan():
+    controller = AdmissionController(max_running=1, max_queue=8)
+    controller.acquire("auto")
+    auto, auto_outcome = _wait_in_background(controller, "auto", stream="window")
+    _until_waiting(controller, 1)
+    manual, manual_outcome = _wait_in_background(controller, "manual", stream="window")
+    auto.join(1)
+    assert auto_outcome == {"reason": "superseded"}
+    controller.release()
+    manual.join(1)
+    assert manual_outcome == {"admitted": True}
+
+
+def test_full_queue_sheds_auto_and_manual_evicts_oldest_auto():
+    controller = AdmissionController(max_running=1, max_queue=1)
+    controller.acquire("auto")
+    waiting, waiting_outcome = _wait_in_background(controller, "auto")
+    _until_waiting(controller, 1)
+    with pytest.raises(Rejected) as rejected:
+        controller.acquire("auto")
+    assert rejected.value.status == 503
+    manual, manual_outcome = _wait_in_background(controller, "manual")
+    waiting.join(1)
+    assert waiting_outcome == {"reason": "shed"}
+    controller.release()
+    manual.join(1)
+    assert manual_outcome == {"admitted": True}
+
+
+def test_deadline_drops_waiting_request():
+    controller = AdmissionController(max_running=1, max_queue=8)
+    controller.acquire("auto")
+    with pytest.raises(Rejected) as rejected:
+        controller.acquire("auto", deadline=time.monotonic() + 0.02)
+    assert rejected.value.reason == "deadline"
+    controller.release()
+    assert controller.stats()["running"] == 0
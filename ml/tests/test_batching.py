@@ -0,0 +1,64 @@
+import pytest
+
+from batching import MicroBatcher
+
+
+def _upper_unless_bad(texts):
+    if "bad" in texts:
+        raise ValueError("can't parse 'bad'")
+    return [text.upper() for text in texts]
+
+
+def test_batch_failure_only_fails_the_bad_request():
+    calls = []
+
+    def process(texts):
+        calls.append(list(texts))
+        return _upper_unless_bad(texts)
+
+    # A long wait, so the three requests share one batch
+    batcher = MicroBatcher(process, max_wait_ms=1000, max_batch=3)
+    try:
+        futures = [batcher.submit(text) for text in ("a", "bad", "b")]
+        assert futures[0].result(5) == "A"
+        assert futures[2].result(5) == "B"
+        with pytest.raises(ValueError):
+            futures[1].result(5)
+    finally:
+        batcher.close()
+
+    assert calls == [["a", "bad", "b"], ["a"], ["bad"], ["b"]]
+    stats = batcher.stats()
+    assert (stats["requests"], stats["errors"], stats["batch_retries"]) == (2, 1, 1)
+
+
+def test_single_request_failure_is_not_retried():
+    calls = []
+
+    def process(texts):
+        calls.append(list(texts))
+        return _upper_unless_bad(texts)
+
+    batcher = MicroBatcher(process, max_wait_ms=1, max_batch=1)
+    try:
+        with pytest.raises(ValueError):
+            batcher.parse("bad", timeout=5)
+        assert batcher.parse("ok", timeout=5) == "OK"
+    finally:
+        batcher.close()
+
+    assert calls == [["bad"], ["ok"]]
+    assert batcher.stats()["batch_retries"] == 0
+
+
+def test_stop_joins_the_thread_and_submit_restarts_it():
+    batcher = MicroBatcher(_upper_unless_bad, max_wait_ms=1)
+    try:
+        assert batcher.parse("a", timeout=5) == "A"
+        thread = batcher._thread
+        batcher.stop(timeout=5)
+        assert not thread.is_alive()
+        assert batcher.parse("b", timeout=5) == "B"
+        assert batcher._thread is not thread
+    finally:
+        batcher.close()
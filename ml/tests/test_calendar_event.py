@@ -0,0 +1,34 @@
+import contextlib
+import io
+
+import pytest
+import spacy
+
+from hybrid_parser import HybridEventParser
+
+
+@pytest.fixture(scope="module")
+def parser(tmp_path_factory):
+    model_dir = tmp_path_factory.mktemp("model") / "blank"
+    spacy.blank("en").to_disk(model_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return HybridEventParser(str(model_dir), cache_size=0)
+
+
+@pytest.mark.parametrize("ner_time,expected", [
+    ("at 10am", "10am"),
+    ("At 10:00 AM", "10:00 AM"),
+    ("@ 3pm", "3pm"),
+    ("@3", "3"),
+    ("10am", "10am"),
+    ("afternoon", "afternoon"),
+])
+def test_event_time_drops_preposition(parser, ner_time, expected):
+    entities = {"EVENT": ["sync"], "DATE": ["tomorrow"], "TIME": [ner_time], "LOCATION": []}
+    event = parser._build_calendar_event(entities, "sync tomorrow")
+    assert event["time"] == expected
+
+
+def test_parse_event_time(parser):
+    event = parser.parse("Sync tomorrow at 10am on Zoom")["calendar_event"]
+    assert (event["date"], event["time"], event["location"]) == ("tomorrow", "10am", "Zoom")
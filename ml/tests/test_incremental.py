@@ -0,0 +1,83 @@
+import contextlib
+import importlib
+import io
+
+import pytest
+import spacy
+from spacy.language import Language
+from spacy.tokens import Span
+
+from incremental import IncrementalParser, parse_by_line
+from rules_component import add_rule_component
+
+# A window's text as the app re-sends it: lines edited, added, removed, moved and repeated
+EDITS = [
+    "Standup tomorrow at 9:30\nLunch on Friday at noon",
+    "Standup tomorrow at 9:30\nLunch on Friday at 12:30\nnew message",
+    "Standup tomorrow at 9:30\n\nLunch on Friday at 12:30\nCall 10am-12pm on Zoom",
+    "Call 10am-12pm on Zoom\nStandup tomorrow at 9:30",
+    "Call 10am-12pm on Zoom\nCall 10am-12pm on Zoom\nsee you at 3",
+    "",
+    "Dinner next Tuesday @ 7pm at Joe's",
+]
+
+
+@Language.component("first_token_event")
+def first_token_event(doc):
+    """Stands in for an NER that reads context: what it finds depends on where the doc starts"""
+    if len(doc) and not doc[0].is_space:
+        doc.ents = [Span(doc, 0, 1, label="EVENT")]
+    return doc
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp("model") / "rules"
+    nlp = spacy.blank("en")
+    nlp.add_pipe("first_token_event")
+    add_rule_component(nlp)
+    nlp.to_disk(path)
+    return path
+
+
+@pytest.fixture(scope="module")
+def client(model_dir):
+    """server.py on the rules model, with the result caches off so every request reaches the parser"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("EVENTSNIFFER_MODEL_DIR", str(model_dir))
+        mp.setenv("EVENTSNIFFER_CACHE_SIZE", "0")
+        mp.setenv("EVENTSNIFFER_DISK_CACHE", "")
+        mp.setenv("EVENTSNIFFER_MODEL_POLL_S", "0")
+        with contextlib.redirect_stdout(io.StringIO()):
+            server = importlib.import_module("server")
+            server = importlib.reload(server)
+            assert server.load_model()
+        yield server.app.test_client()
+
+
+def _entities(nlp, lines):
+    return [[{"text": e.text, "label": e.label_, "start": e.start_char, "end": e.end_char} for e in doc.ents]
+            for doc in nlp.pipe(lines)]
+
+
+def test_session_matches_parse_by_line(model_dir):
+    nlp = spacy.load(model_dir)
+    parse_many = lambda lines: _entities(nlp, lines)  # noqa: E731
+    incremental = IncrementalParser(parse_many)
+    for text in EDITS:
+        entities, _ = incremental.parse("window", text)
+        assert entities == parse_by_line(parse_many, [text])[0]
+        for ent in entities:
+            assert text[ent["start"]:ent["end"]] == ent["text"]
+
+
+def test_session_and_plain_parse_agree_across_edits(client):
+    reused = 0
+    for text in EDITS:
+        with contextlib.redirect_stdout(io.StringIO()):
+            session = client.post("/parse", json={"text": text, "session_id": "window"}).get_json()
+            plain = client.post("/parse", json={"text": text}).get_json()
+        assert session["entities"] == plain["entities"]
+        assert session["datetime"] == plain["datetime"]
+        reused += session["incremental"]["reused"]
+    assert reused > 0
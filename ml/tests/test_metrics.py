@@ -0,0 +1,69 @@
+import os
+
+from metrics import MetricsDir, Registry
+
+
+def _registry():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests", ["endpoint"])
+    seconds = registry.histogram("request_seconds", "Request time", buckets=(0.1, 1.0))
+    depth = {"value": 0}
+    registry.callback("queue_depth", "Waiting requests", lambda: depth["value"])
+    registry.callback("hits_total", "Cache hits", lambda: depth["value"] * 10, "counter")
+    return registry, requests, seconds, depth
+
+
+def _in_child(fn):
+    """Run fn in a forked process (its own pid, so its own metrics file) and return that pid"""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            fn()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    return pid
+
+
+def _values(text):
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if line and not line.startswith("#"))
+
+
+def test_processes_are_merged_and_exited_ones_archived(tmp_path):
+    registry, requests, seconds, depth = _registry()
+    metrics_dir = MetricsDir(str(tmp_path), registry)
+
+    def worker(n, latency):
+        def run():
+            requests.inc(n, endpoint="parse")
+            seconds.observe(latency)
+            depth["value"] = n
+            metrics_dir.write()
+        return run
+
+    first = _in_child(worker(2, 0.05))
+    second = _in_child(worker(3, 0.5))
+    requests.inc(endpoint="stats")
+    metrics_dir.write()
+
+    values = _values(metrics_dir.render())
+    assert values['requests_total{endpoint="parse"}'] == "5"
+    assert values['requests_total{endpoint="stats"}'] == "1"
+    assert values['request_seconds_bucket{le="0.1"}'] == "1"
+    assert values['request_seconds_bucket{le="1"}'] == "2"
+    assert values["request_seconds_count"] == "2"
+    assert values["hits_total"] == "50"
+    assert values[f'queue_depth{{process="{first}"}}'] == "2"
+    assert values[f'queue_depth{{process="{second}"}}'] == "3"
+
+    # A worker that exits keeps counting towards the totals, but its gauges go
+    metrics_dir.archive(first)
+    values = _values(metrics_dir.render())
+    assert values['requests_total{endpoint="parse"}'] == "5"
+    assert values["request_seconds_count"] == "2"
+    assert values["hits_total"] == "50"
+    assert f'queue_depth{{process="{first}"}}' not in values
+    assert not (tmp_path / f"metrics-{first}.json").exists()
+
+    metrics_dir.clear()
+    assert _values(metrics_dir.render()) == {}
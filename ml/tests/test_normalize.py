@@ -0,0 +1,69 @@
+import pytest
+
+from normalize import DateTimeNormalizer, reference_time
+
+# A Monday morning
+REFERENCE = reference_time("2025-01-06T09:00:00", "UTC")
+
+
+def _start(date_text, time_text):
+    return DateTimeNormalizer().resolve(date_text, time_text, REFERENCE)["start"]
+
+
+@pytest.mark.parametrize("date_text,time_text,expected", [
+    ("tonight", "at 8", "2025-01-06T20:00:00+00:00"),
+    (None, "tonight at 8", "2025-01-06T20:00:00+00:00"),
+    (None, "this evening at 9", "2025-01-06T21:00:00+00:00"),
+    (None, "9 tonight", "2025-01-06T21:00:00+00:00"),
+    ("tomorrow night", "8", "2025-01-07T20:00:00+00:00"),
+    ("Friday evening", "7:30", "2025-01-10T19:30:00+00:00"),
+    ("this evening", "at 10", "2025-01-06T22:00:00+00:00"),
+    (None, "morning at 6", "2025-01-06T06:00:00+00:00"),
+])
+def test_day_part_decides_am_pm(date_text, time_text, expected):
+    assert _start(date_text, time_text) == expected
+
+
+@pytest.mark.parametrize("date_text,time_text,expected", [
+    ("tomorrow", "at 3", "2025-01-07T15:00:00+00:00"),
+    ("tomorrow", "at 8", "2025-01-07T08:00:00+00:00"),
+    ("tomorrow", "8pm", "2025-01-07T20:00:00+00:00"),
+])
+def test_hours_without_day_part_keep_chat_defaults(date_text, time_text, expected):
+    assert _start(date_text, time_text) == expected
+
+
+@pytest.mark.parametrize("date_text,expected", [
+    ("12/5/99", "1999-12-05T00:00:00+00:00"),
+    ("12/5/30", "2030-12-05T00:00:00+00:00"),
+    ("1/2/74", "2074-01-02T00:00:00+00:00"),
+    ("1/2/75", "1975-01-02T00:00:00+00:00"),
+    ("12/5/2099", "2099-12-05T00:00:00+00:00"),
+])
+def test_two_digit_years_use_a_window_around_the_reference_year(date_text, expected):
+    assert _start(date_text, None) == expected
+
+
+@pytest.mark.parametrize("date_text,time_text", [
+    ("12/31/9999", None),
+    ("12/31/9999", "11pm"),
+])
+def test_dates_past_the_datetime_range_are_unresolved(date_text, time_text):
+    normalizer = DateTimeNormalizer()
+    assert normalizer.resolve(date_text, time_text, REFERENCE) is None
+    assert normalizer.stats()["unresolved"] == 1
+
+
+@pytest.mark.parametrize("reference,expected", [
+    ("2025-01-06T09:00:00", "2028-02-29T00:00:00+00:00"),
+    ("2028-01-06T09:00:00", "2028-02-29T00:00:00+00:00"),
+    ("2028-03-01T09:00:00", "2032-02-29T00:00:00+00:00"),
+    ("2097-01-01T09:00:00", "2104-02-29T00:00:00+00:00"),
+])
+def test_feb_29_rolls_to_the_next_leap_year(reference, expected):
+    result = DateTimeNormalizer().resolve("Feb 29", None, reference_time(reference, "UTC"))
+    assert result["start"] == expected
+
+
+def test_feb_29_with_a_year_must_be_a_leap_year():
+    assert DateTimeNormalizer().resolve("2/29/2025", None, REFERENCE) is None
@@ -0,0 +1,63 @@
+import contextlib
+import importlib
+import io
+
+import pytest
+import spacy
+
+from rules_component import add_rule_component
+
+TEXTS = ["Lunch on Friday at noon", "Standup tomorrow at 9:30\nCall 10am-12pm on Zoom", "Lunch on Friday at noon"]
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    """server.py on the rules model, with both result caches on"""
+    root = tmp_path_factory.mktemp("batch")
+    nlp = spacy.blank("en")
+    add_rule_component(nlp)
+    nlp.to_disk(root / "rules")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("EVENTSNIFFER_MODEL_DIR", str(root / "rules"))
+        mp.setenv("EVENTSNIFFER_CACHE_SIZE", "16")
+        mp.setenv("EVENTSNIFFER_DISK_CACHE", str(root / "parse_cache.sqlite"))
+        mp.setenv("EVENTSNIFFER_MODEL_POLL_S", "0")
+        with contextlib.redirect_stdout(io.StringIO()):
+            server = importlib.import_module("server")
+            server = importlib.reload(server)
+            assert server.load_model()
+        yield server
+
+
+def _post(client, path, body):
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = client.post(path, json=body)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_batch_reads_and_fills_the_parse_caches(server, monkeypatch):
+    client = server.app.test_client()
+    model = server.serving
+    parsed = []  # every line sent to the model
+    pipe = model.nlp.pipe
+    monkeypatch.setattr(model.nlp, "pipe", lambda lines, **kwargs: pipe(parsed.extend(lines) or lines, **kwargs))
+
+    # /parse first: the batch finds that text in the cache and parses the other once
+    single = _post(client, "/parse", {"text": TEXTS[1]})
+    parsed.clear()
+    batch = _post(client, "/parse_batch", {"texts": TEXTS, "bypass_prefilter": True})["results"]
+    assert batch[1]["entities"] == single["entities"]
+    assert batch[0]["entities"] == batch[2]["entities"]
+    assert parsed == [TEXTS[0]]
+
+    # Everything is cached now, in memory and on disk
+    parsed.clear()
+    again = _post(client, "/parse_batch", {"texts": TEXTS, "bypass_prefilter": True})["results"]
+    assert [r["entities"] for r in again] == [r["entities"] for r in batch]
+    assert parsed == []
+    model.cache.clear()
+    again = _post(client, "/parse_batch", {"texts": TEXTS, "bypass_prefilter": True})["results"]
+    assert [r["entities"] for r in again] == [r["entities"] for r in batch]
+    assert parsed == []
+    assert model.disk_cache.hits >= 2
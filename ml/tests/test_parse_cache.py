@@ -0,0 +1,68 @@
+import contextlib
+import io
+import itertools
+import os
+
+import parse_cache
+from parse_cache import DiskParseCache
+
+
+def _open(path, fingerprint, namespace="model", **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return DiskParseCache(path, fingerprint, namespace=namespace, **kwargs)
+
+
+def test_new_fingerprint_drops_only_its_namespace(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    old = _open(path, "v1")
+    other = _open(path, "x1", namespace="other")
+    old.put(old.key("Lunch at noon"), [{"label": "TIME"}])
+    other.put(other.key("Lunch at noon"), [{"label": "TIME"}])
+
+    new = _open(path, "v2")
+    assert new.invalidated == 1
+    assert new.get(new.key("Lunch at noon")) is None
+    assert old.get(old.key("Lunch at noon")) is None
+    assert other.get(other.key("Lunch at noon")) == [{"label": "TIME"}]
+
+    # Same fingerprint again (a restart): nothing is dropped
+    new.put(new.key("Lunch at noon"), [])
+    assert _open(path, "v2").invalidated == 0
+    assert new.get(new.key("Lunch at noon")) == []
+
+
+def test_least_recently_used_entries_go_first(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(parse_cache.time, "time", lambda: next(clock))
+    value = [{"text": "x" * 80}]
+    size = len('[{"text":""}]') + 80
+    cache = _open(tmp_path / "cache.sqlite", "v1", max_bytes=5 * size, touch_interval=0)
+    keys = [cache.key(f"text {i}") for i in range(10)]
+    for key in keys:
+        cache.put(key, value)
+    assert cache.get(keys[0]) == value  # now the most recently used
+
+    # 10 entries over a 5-entry budget: evict down to 90% of it, oldest access first
+    assert cache.enforce_size() == 6
+    assert [cache.get(key) is not None for key in keys] == [True] + [False] * 6 + [True] * 3
+    stats = cache.stats()
+    assert stats["entries"] == 4 and stats["bytes"] <= 0.9 * cache.max_bytes
+    assert stats["evictions"] == 6
+    assert cache.enforce_size() == 0
+
+
+def test_cache_opened_before_fork_works_in_the_child(tmp_path):
+    cache = _open(tmp_path / "cache.sqlite", "v1")
+    cache.put(cache.key("from parent"), ["parent"])
+
+    pid = os.fork()
+    if pid == 0:
+        # The child must open its own connection, not reuse the parent's
+        ok = cache.get(cache.key("from parent")) == ["parent"]
+        cache.put(cache.key("from child"), ["child"])
+        ok = ok and cache.errors == 0 and cache._local.pid == os.getpid()
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert cache.get(cache.key("from child")) == ["child"]
+    assert cache.errors == 0
@@ -0,0 +1,31 @@
+import pytest
+
+import training_data
+import training_data_v2
+from prefilter import PreFilter, measure
+from validate_model import VALIDATION_SUITE
+
+CORPORA = {
+    "validate_model.VALIDATION_SUITE": [(text, bool(expected)) for text, expected in VALIDATION_SUITE],
+    "training_data_v2.SIMPLE_DATA": [(text, bool(ents)) for text, ents in training_data_v2.SIMPLE_DATA],
+    "training_data.SIMPLE_DATA": [(text, bool(ents)) for text, ents in training_data.SIMPLE_DATA],
+}
+
+
+@pytest.fixture(scope="module")
+def gate():
+    return PreFilter()
+
+
+@pytest.mark.parametrize("name", CORPORA)
+def test_no_text_with_entities_is_skipped(gate, name):
+    row = measure(gate, {name: CORPORA[name]})[name]
+    assert row["positives"] > 0
+    assert row["missed_examples"] == []
+
+
+def test_should_parse_counts_skips(gate):
+    gate = PreFilter(gate.keywords)
+    assert gate.should_parse("Lunch on Friday at noon")
+    assert not gate.should_parse("ok thanks, sounds good")
+    assert gate.stats() == {"checked": 2, "skipped": 1, "skip_rate": 0.5}
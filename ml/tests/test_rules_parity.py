@@ -0,0 +1,60 @@
+import contextlib
+import io
+
+import pytest
+import spacy
+
+from hybrid_parser import HybridEventParser
+from rules_component import add_rule_component
+from training_data import SIMPLE_DATA as SIMPLE_DATA_V1
+from training_data_v2 import SIMPLE_DATA as SIMPLE_DATA_V2
+
+EXTRA_TEXTS = [
+    "Meeting @ 3pm",
+    "Meeting @3pm",
+    "Lunch at 12",
+    "Meet me at 3 on Zoom",
+    "Call 10am-12pm tomorrow",
+    "Standup 9:30am-10am",
+    "office hours mon 1-3p",
+    "Workshop from 2 to 4pm on Friday",
+    "Dinner at 7:30 pm at Joe's",
+    "Team lunch on Friday around noon, maybe 12:30",
+    "Review in 30 mins",
+]
+TEXTS = EXTRA_TEXTS + [text for text, _ in SIMPLE_DATA_V1 + SIMPLE_DATA_V2]
+
+
+@pytest.fixture(scope="module")
+def parsers(tmp_path_factory):
+    """The same blank model with and without the rules component, so every span comes from the rules"""
+    root = tmp_path_factory.mktemp("models")
+    nlp = spacy.blank("en")
+    nlp.to_disk(root / "regex")
+    add_rule_component(nlp)
+    nlp.to_disk(root / "ruler")
+    with contextlib.redirect_stdout(io.StringIO()):
+        return (HybridEventParser(str(root / "regex"), cache_size=0),
+                HybridEventParser(str(root / "ruler"), cache_size=0))
+
+
+def _spans(parser, text):
+    return [(span["text"], span["label"]) for span in parser.parse(text)["spans"]]
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_regex_and_ruler_agree(parsers, text):
+    regex, ruler = parsers
+    assert not regex.rules_in_pipeline and ruler.rules_in_pipeline
+    assert _spans(regex, text) == _spans(ruler, text)
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("Meeting @ 3pm", [("3pm", "TIME")]),
+    ("Lunch at 12", [("12", "TIME")]),
+    ("Call 10am-12pm tomorrow", [("10am-12pm", "TIME"), ("tomorrow", "DATE")]),
+    ("Dinner at 7:30 pm at Joe's", [("7:30 pm", "TIME"), ("at Joe's", "LOCATION")]),
+])
+def test_time_spans(parsers, text, expected):
+    for parser in parsers:
+        assert _spans(parser, text) == expected
@@ -2,13 +2,11 @@
 # --- THIS IS THE CORRECTED VERSION ---
 
 import spacy
-from spacy.tokens import DocBin
-from spacy.training import Example
 import random
 
-# **** THIS IS THE FIX ****
-# We are now importing the function, not the old variable
-from training_data import get_training_data
+# The training data is converted to cached DocBin shards by corpus.py
+# (this used to write an empty train.spacy)
+from corpus import build_corpus, read_manifest, iter_examples
 
 def train_model(iterations=30):
     print("Loading base model (en_core_web_lg)...")
@@ -19,39 +17,25 @@ def train_model(iterations=30):
     else:
         ner = nlp.get_pipe("ner")
 
-    # Load the data from our function
-    TRAIN_DATA = get_training_data()
+    print("Preparing training data...")
+    # No held-out split: this script trains on every example and only
+    # spot-checks a few texts at the end (train_v2.py scores a dev split)
+    corpus_dir = build_corpus("training_data", nlp=nlp, dev_fraction=0)
+    manifest = read_manifest(corpus_dir)
 
     # Add our custom labels (EVENT, DATE, TIME, LOCATION)
-    for _, annotations in TRAIN_DATA:
-        for ent in annotations.get("entities"):
-            ner.add_label(ent[2])
-
-    print("Preparing training data...")
-    
-    db = DocBin()
-    examples = []
-    
-    # **** THIS IS THE FIX ****
-    # We are now iterating over the correct data
-    for text, annotations in TRAIN_DATA:
-        try:
-            doc = nlp.make_doc(text)
-            example = Example.from_dict(doc, annotations)
-            examples.append(example)
-        except ValueError as e:
-            print(f"Error processing data: {e} - Skipping example: '{text}'")
+    for label in manifest["labels"]:
+        ner.add_label(label)
 
     # Check if we actually have examples
-    if not examples:
+    n_train = manifest["splits"]["train"]["docs"]
+    if not n_train:
         print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
         print("ERROR: No training data was loaded. Check 'training_data.py'.")
         print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
         return
 
-    print(f"Loaded {len(examples)} valid training examples.")
-        
-    db.to_disk("./train.spacy")
+    print(f"Loaded {n_train} valid training examples.")
     
     print(f"--- Starting training ({iterations} iterations) ---")
 
@@ -61,8 +45,9 @@ def train_model(iterations=30):
     with nlp.select_pipes(disable=unaffected_pipes):
         optimizer = nlp.initialize()
         
+        rng = random.Random()
         for itn in range(iterations):
-            random.shuffle(examples)
+            examples = iter_examples(nlp, corpus_dir, "train", shuffle=True, rng=rng)
             losses = {}
             
             for batch in spacy.util.minibatch(examples, size=8):
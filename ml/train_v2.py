@@ -4,34 +4,58 @@ Optimized for maximum accuracy
 """
 
 import spacy
-from spacy.training import Example
 import random
 from pathlib import Path
 
-# Import our enhanced training data
-import sys
-sys.path.insert(0, '/tmp')
-from training_data_v2 import get_training_data
+# Our enhanced training data, converted to cached DocBin shards (corpus.py)
+from corpus import build_corpus, read_manifest, iter_examples, load_base
+from rules_component import add_rule_component, RULES_PIPE_NAME
 
 
-def train_model(iterations=50, dropout=0.35):
+def dev_scores(nlp, corpus_dir):
+    """Entity P/R/F on the corpus dev split"""
+    scores = nlp.evaluate(list(iter_examples(nlp, corpus_dir, "dev")))
+    return {key: scores[key] or 0.0 for key in ("ents_p", "ents_r", "ents_f")}
+
+
+def train_model(iterations=50, dropout=0.35, batch_size=8, seed=None,
+                output_dir="model_output_v2", base="en_core_web_lg",
+                eval_every=0, on_eval=None, quick_check=True, corpus_dir=None):
     """
     Train NER model with optimized hyperparameters
     
     Args:
         iterations: Number of training iterations (more = better, up to a point)
         dropout: Regularization to prevent overfitting (0.3-0.5 range)
+        batch_size: Examples per update
+        seed: Fix spaCy/numpy/shuffle randomness for a reproducible run
+        output_dir: Where to save the trained pipeline
+        base: Base model name or path ('blank:en' for a blank pipeline)
+        eval_every: Score the dev split every N iterations and pass the F-score
+            to on_eval(iteration, dev_f); training stops if it returns True
+        quick_check: Run the example sentences through the saved model
+        corpus_dir: Train on this corpus (e.g. from generate_data.py) instead
+            of the cached training_data_v2 build
+
+    Returns:
+        Dict with best_loss, iterations run, dev scores, whether it was
+        cancelled, and the output directory (None when cancelled)
     """
     print("=" * 60)
     print("🚀 EventSniffer Model Training v2.0")
     print("=" * 60)
     
+    if seed is not None:
+        spacy.util.fix_random_seed(seed)
+    
     # Load base model
-    print("\n1️⃣ Loading base model (en_core_web_lg)...")
+    print(f"\n1️⃣ Loading base model ({base})...")
     try:
-        nlp = spacy.load("en_core_web_lg")
+        nlp = load_base(base)
         print("✅ Base model loaded")
     except OSError:
+        if base != "en_core_web_lg":
+            raise
         print("❌ en_core_web_lg not found. Installing...")
         import subprocess
         subprocess.run(["python", "-m", "spacy", "download", "en_core_web_lg"])
@@ -43,45 +67,35 @@ def train_model(iterations=50, dropout=0.35):
     else:
         ner = nlp.get_pipe("ner")
     
-    # Load training data
+    # Load training data (reuses the cached corpus if the data hasn't changed)
     print("\n2️⃣ Loading training data...")
-    TRAIN_DATA = get_training_data()
-    print(f"✅ Loaded {len(TRAIN_DATA)} training examples")
+    if corpus_dir is None:
+        corpus_dir = build_corpus("training_data_v2", nlp=nlp)
+    manifest = read_manifest(corpus_dir)
+    n_train = manifest["splits"]["train"]["docs"]
+    n_dev = manifest["splits"]["dev"]["docs"]
+    print(f"✅ {n_train} training / {n_dev} dev examples "
+          f"({len(manifest['skipped'])} skipped while building)")
+    
+    if not n_train:
+        print("❌ No valid examples! Check training_data_v2.py")
+        return None
     
     # Add labels
-    labels = set()
-    for _, annotations in TRAIN_DATA:
-        for ent in annotations.get("entities", []):
-            labels.add(ent[2])
-            ner.add_label(ent[2])
-    
-    print(f"✅ Labels: {', '.join(sorted(labels))}")
-    
-    # Create training examples
-    print("\n3️⃣ Preparing training examples...")
-    examples = []
-    for text, annotations in TRAIN_DATA:
-        try:
-            doc = nlp.make_doc(text)
-            example = Example.from_dict(doc, annotations)
-            examples.append(example)
-        except Exception as e:
-            print(f"⚠️  Skipping: '{text[:50]}...' - {e}")
-    
-    print(f"✅ Created {len(examples)} valid examples")
-    
-    if not examples:
-        print("❌ No valid examples! Check training_data_v2.py")
-        return
+    for label in manifest["labels"]:
+        ner.add_label(label)
+    
+    print(f"✅ Labels: {', '.join(manifest['labels'])}")
     
     # Training configuration
-    print(f"\n4️⃣ Training configuration:")
+    print(f"\n3️⃣ Training configuration:")
     print(f"   Iterations: {iterations}")
     print(f"   Dropout: {dropout}")
-    print(f"   Batch size: 8")
+    print(f"   Batch size: {batch_size}")
+    print(f"   Seed: {seed}")
     
     # Train
-    print("\n5️⃣ Starting training...")
+    print("\n4️⃣ Starting training...")
     print("-" * 60)
     
     # Disable other pipes during training
@@ -93,13 +107,17 @@ def train_model(iterations=50, dropout=0.35):
         best_loss = float('inf')
         patience = 10
         no_improvement = 0
+        cancelled = False
+        iterations_run = 0
         
+        rng = random.Random(seed)
         for itn in range(iterations):
-            random.shuffle(examples)
+            iterations_run = itn + 1
             losses = {}
             
-            # Train in batches
-            batches = spacy.util.minibatch(examples, size=8)
+            # Train in batches, streamed from the corpus shards
+            examples = iter_examples(nlp, corpus_dir, "train", shuffle=True, rng=rng)
+            batches = spacy.util.minibatch(examples, size=batch_size)
             for batch in batches:
                 nlp.update(
                     batch,
@@ -125,18 +143,49 @@ def train_model(iterations=50, dropout=0.35):
             if no_improvement >= patience and itn > 20:
                 print(f"\n⚠️  Early stopping at iteration {itn + 1} (no improvement for {patience} iterations)")
                 break
+            
+            # Periodic dev score, e.g. so a sweep can cancel losing trials
+            if on_eval and n_dev and eval_every and (itn + 1) % eval_every == 0 and itn + 1 < iterations:
+                if on_eval(itn + 1, dev_scores(nlp, corpus_dir)["ents_f"]):
+                    print(f"\n⚠️  Cancelled at iteration {itn + 1}")
+                    cancelled = True
+                    break
+    
+        # Held-out score on the dev split
+        scores = dev_scores(nlp, corpus_dir) if n_dev else None
+        if scores:
+            print(f"📊 Dev: P={scores['ents_p']:.2f} R={scores['ents_r']:.2f} F={scores['ents_f']:.2f}")
+    
+    result = {
+        "best_loss": float(best_loss),
+        "iterations": iterations_run,
+        "dev": scores,
+        "cancelled": cancelled,
+        "output_dir": None,
+    }
+    if cancelled:
+        return result
     
     print("-" * 60)
     print(f"✅ Training complete! Final loss: {best_loss:.4f}")
     
+    # Package the hybrid date/time/location rules into the pipeline, right
+    # after NER, so nlp.pipe produces the final entities in one pass
+    ruler = add_rule_component(nlp)
+    print(f"✅ Added '{RULES_PIPE_NAME}' component ({len(ruler.patterns)} rule patterns)")
+    
     # Save model
-    output_dir = Path("model_output_v2")
-    output_dir.mkdir(exist_ok=True)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
     nlp.to_disk(output_dir)
-    print(f"\n6️⃣ Model saved to '{output_dir}'")
+    print(f"\n5️⃣ Model saved to '{output_dir}'")
+    result["output_dir"] = str(output_dir)
+    
+    if not quick_check:
+        return result
     
     # Quick test
-    print("\n7️⃣ Quick validation:")
+    print("\n6️⃣ Quick validation:")
     print("-" * 60)
     
     test_texts = [
@@ -160,6 +209,7 @@ def train_model(iterations=50, dropout=0.35):
     print("🎉 DONE! Run validation with:")
     print(f"   python validate_model.py {output_dir}")
     print("=" * 60)
+    return result
 
 
 if __name__ == "__main__":
@@ -129,5 +129,9 @@ def get_training_data():
             
     return TRAIN_DATA
 
-# This line is just for compatibility if anything else was importing it.
-TRAIN_DATA = get_training_data()
\ No newline at end of file
+# This is just for compatibility if anything else was importing TRAIN_DATA.
+# It's built on first access, not at import time.
+def __getattr__(name):
+    if name == "TRAIN_DATA":
+        return get_training_data()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
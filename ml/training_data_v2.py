@@ -260,10 +260,16 @@ def get_training_data():
     return TRAIN_DATA
 
 
-# Export
-TRAIN_DATA = get_training_data()
+# Kept for old `from training_data_v2 import TRAIN_DATA` imports, but built on
+# first access instead of at import time (see corpus.py for the cached build)
+def __getattr__(name):
+    if name == "TRAIN_DATA":
+        return get_training_data()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
+    TRAIN_DATA = get_training_data()
     print(f"✅ Generated {len(TRAIN_DATA)} training examples")
     print(f"   Events: ~{sum(1 for _, a in TRAIN_DATA if any(e[2] == 'EVENT' for e in a['entities']))}")
     print(f"   Dates: ~{sum(1 for _, a in TRAIN_DATA if any(e[2] == 'DATE' for e in a['entities']))}")
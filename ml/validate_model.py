@@ -6,6 +6,7 @@ Tests model accuracy and identifies failure modes
 import spacy
 from typing import Dict, List, Tuple
 import json
+import compact_vectors  # noqa: F401 (lets spacy.load read export_model.py --half models)
 
 # Test suite with expected outputs
 VALIDATION_SUITE = [